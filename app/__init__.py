@@ -6,15 +6,29 @@ from flask_login import LoginManager
 from werkzeug.security import generate_password_hash
 from flask_login import login_user
 import os
+from app.database import engine_options, configure_engine
 
 app = Flask(__name__)
 app.jinja_env.undefined = StrictUndefined
 app.config.from_object(Config)
+app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
 db = SQLAlchemy(app)
 login = LoginManager(app)
 login.login_view = 'login'
 
-from app import views, models
+from app import views, models, cli
+
+if app.config['METRICS_ENABLED']:
+    from app.metrics import init_metrics
+    init_metrics(app, db)
+
+if app.config['QUERY_BUDGET_MODE'] != 'off':
+    from app.query_budget import init_query_budget
+    init_query_budget(app, db)
+
+if app.config['PROFILING_ENABLED']:
+    from app.profiling import init_profiling
+    init_profiling(app)
 
 @app.shell_context_processor
 def make_shell_context():
@@ -50,5 +64,16 @@ def create_sample_user():
 
 # Seed the database using the application context
 with app.app_context():
+    from app.migrations import upgrade_schema
+    configure_engine(db.engine, app.config)
     db.create_all()
-    create_sample_user()
\ No newline at end of file
+    upgrade_schema()
+    create_sample_user()
+
+# Check the sentiment lexicon is present without loading it, the analyzer itself is built on first use
+from app.domain import check_lexicon, warm_up_analyzer
+lexicon_error = check_lexicon(app.config['VADER_LEXICON_PATH'])
+if lexicon_error:
+    app.logger.error(lexicon_error)
+elif app.config['SENTIMENT_WARMUP'] and not warm_up_analyzer():
+    app.logger.warning("VADER lexicon could not be loaded; sentiment analysis will retry on first use.")
@@ -1,6 +1,14 @@
 
+import bisect
+import json
 import random
+import threading
+import time
+import urllib.parse
+import urllib.request
 from abc import ABC, abstractmethod
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
 from app.domain import MoodEntry
 
@@ -8,6 +16,8 @@ from app.domain import MoodEntry
 Focuses on getting API data as shown in class diagram whilst conforming to an adapter pattern
 """
 
+WEATHER_OPTIONS = ["Sunny", "Rainy", "Cloudy", "Stormy", "Snowy", "Windy"]
+
 class MoodEntryAdapter(ABC):
     @abstractmethod
     def fetch_mood_entry(self) -> MoodEntry:
@@ -52,7 +62,7 @@ class ExternalAPI:
         self.api_id = api_id
         self.api_name = api_name
         self.api_key = api_key
-        self.weather_options = ["Sunny", "Rainy", "Cloudy", "Stormy", "Snowy", "Windy"]
+        self.weather_options = list(WEATHER_OPTIONS)
 
     def fetch_weather_data(self):
         # Randomly pick one of the 6 weather options
@@ -88,8 +98,312 @@ class ExternalAPIAdapter(MoodEntryAdapter):
         mood_entry = MoodEntry(
             user_id=wearable_data["user_id"],
             date=datetime.now().date(),
-            smartwatch_data=f"HR: {wearable_data['heart_rate']}, Steps: {wearable_data['step_count']},SQ: {wearable_data['sleep_quality']}",
+            heart_rate=wearable_data["heart_rate"],
+            step_count=wearable_data["step_count"],
+            sleep_quality=wearable_data["sleep_quality"],
             weather=weather,
 
         )
-        return mood_entry
\ No newline at end of file
+        return mood_entry
+
+
+"""
+Same interface as ExternalAPI, but fetching from real HTTP providers that answer with JSON: the weather provider with
+{"weather": "..."} and the wearable provider (queried with ?user_id=) with the fields of fetch_wearable_data.
+timeout bounds each HTTP call, so a stalled provider cannot hold a worker thread forever.
+"""
+class HTTPExternalAPI(ExternalAPI):
+    def __init__(self, api_id: int, api_name: str, api_key: str, weather_url: str, wearable_url: str,
+                 timeout: float = 5.0):
+        super().__init__(api_id, api_name, api_key)
+        self.weather_url = weather_url
+        self.wearable_url = wearable_url
+        self.timeout = timeout
+
+    def _get_json(self, url: str, **params):
+        if params:
+            url += ("&" if "?" in url else "?") + urllib.parse.urlencode(params)
+        request = urllib.request.Request(url, headers={"Authorization": f"Bearer {self.api_key}"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.load(response)
+
+    def fetch_weather_data(self):
+        return self._get_json(self.weather_url)["weather"]
+
+    def fetch_wearable_data(self, user_id: int):
+        data = self._get_json(self.wearable_url, user_id=user_id)
+        return {
+            "user_id": user_id,
+            "heart_rate": data.get("heart_rate"),
+            "step_count": data.get("step_count"),
+            "sleep_quality": data.get("sleep_quality"),
+        }
+
+
+"""
+Weather shared by everyone at a location, cached per (location, time bucket): the bucket is ttl seconds wide, so a
+cached value is at most ttl old and everyone moves to the next bucket's value together. Lookups that miss while the
+same key is already being fetched wait for that fetch instead of starting their own (single flight), so a burst of
+requests at a bucket boundary makes one provider call. Failed fetches are not cached.
+"""
+class WeatherCache:
+    def __init__(self, ttl: float = 600, clock=time.time):
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._values = {}     # (location, bucket) -> weather, for the current bucket only
+        self._in_flight = {}  # (location, bucket) -> Future of the fetch under way
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0  # misses that waited for another caller's fetch
+        self.errors = 0
+
+    def get(self, location: str, fetch):
+        """Cached weather for location, calling fetch() if the current bucket has none yet."""
+        bucket = int(self.clock() // self.ttl)
+        key = (location, bucket)
+        with self._lock:
+            if key in self._values:
+                self.hits += 1
+                return self._values[key]
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            value = fetch()
+        except BaseException as error:
+            with self._lock:
+                self.errors += 1
+                del self._in_flight[key]
+            future.set_exception(error)
+            raise
+        with self._lock:
+            # values from earlier buckets will never be read again
+            self._values = {cached: v for cached, v in self._values.items() if cached[1] >= bucket}
+            self._values[key] = value
+            del self._in_flight[key]
+        future.set_result(value)
+        return value
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of lookups answered without a fetch of their own."""
+        lookups = self.hits + self.misses + self.coalesced
+        return (self.hits + self.coalesced) / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced, "errors": self.errors,
+                    "hit_rate": self.hit_rate, "ttl": self.ttl}
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self.hits = self.misses = self.coalesced = self.errors = 0
+
+
+"""
+An ExternalAPI whose weather comes through a shared WeatherCache, so it can be used wherever the API it wraps is
+(ExternalAPIAdapter, external_api_sources). Wearable data is per user and is passed straight through.
+"""
+class CachedWeatherAPI:
+    def __init__(self, external_api: ExternalAPI, cache: WeatherCache, location: str):
+        self.external_api = external_api
+        self.cache = cache
+        self.location = location
+
+    def fetch_weather_data(self):
+        return self.cache.get(self.location, self.external_api.fetch_weather_data)
+
+    def fetch_wearable_data(self, user_id: int):
+        return self.external_api.fetch_wearable_data(user_id)
+
+
+"""
+Latency of one external source, counted into fixed buckets (upper bounds in seconds, cumulative like Prometheus
+histograms) along with calls that timed out or failed. Timed-out calls are not observed, as they never finished.
+app.metrics uses it for the app's own timings too, with buckets to suit what is measured.
+"""
+class LatencyHistogram:
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets=None):
+        self.buckets = tuple(buckets or self.BUCKETS)
+        self._lock = threading.Lock()
+        self.bucket_counts = [0] * (len(self.buckets) + 1)  # the last bucket is +Inf
+        self.count = 0
+        self.total_seconds = 0.0
+        self.timeouts = 0
+        self.errors = 0
+
+    def observe(self, seconds: float):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.bucket_counts[index] += 1
+            self.count += 1
+            self.total_seconds += seconds
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def quantile(self, q: float):
+        """Upper bound of the bucket holding the q-th quantile of observed latencies, or None if none observed."""
+        with self._lock:
+            counts, count = list(self.bucket_counts), self.count
+        if not count:
+            return None
+        running = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            running += bucket_count
+            if running >= q * count:
+                return bound
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative, running = {}, 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), self.bucket_counts):
+                running += bucket_count
+                cumulative[bound] = running
+            return {"buckets": cumulative, "count": self.count, "sum": self.total_seconds,
+                    "timeouts": self.timeouts, "errors": self.errors}
+
+
+# One external source for ConcurrentAPIAdapter: fetch(user_id) returns its data, waited on for at most timeout seconds.
+# key(user_id) is what its last known value is kept under; by default the user, but weather is the same for everyone
+# at a location.
+DataSource = namedtuple('DataSource', ['name', 'fetch', 'timeout', 'key'], defaults=[None])
+
+# Histogram per source name, shared by all adapters
+source_latency = {}
+_source_latency_lock = threading.Lock()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def latency_histogram(name: str) -> LatencyHistogram:
+    with _source_latency_lock:
+        return source_latency.setdefault(name, LatencyHistogram())
+
+
+def external_api_executor(max_workers: int = 8) -> ThreadPoolExecutor:
+    """Thread pool shared by every ConcurrentAPIAdapter, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="external-api")
+        return _executor
+
+
+def external_api_sources(external_api: ExternalAPI, weather_timeout: float, wearable_timeout: float,
+                         location: str = None) -> list:
+    return [
+        DataSource("weather", lambda user_id: external_api.fetch_weather_data(), weather_timeout,
+                   key=lambda user_id: location),
+        DataSource("wearable", external_api.fetch_wearable_data, wearable_timeout),
+    ]
+
+
+"""
+The last value each source returned, for ConcurrentAPIAdapter to fall back on when the source is slow or failing, kept
+by (source name, source key). Values older than max_age seconds are not used, and only the maxsize most recently used
+keys are kept, so it does not grow with every user who has ever asked for a prediction. Each worker process has its
+own.
+"""
+class LastKnownValues:
+    def __init__(self, maxsize: int = 10000, max_age: float = 3 * 3600, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.max_age = max_age
+        self.clock = clock
+        self._values = OrderedDict()  # key -> (time stored, value), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """The last value stored under key, or None if there is none or it is older than max_age."""
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if self.clock() - stored_at > self.max_age:
+                del self._values[key]
+                return None
+            self._values.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._values[key] = (self.clock(), value)
+            self._values.move_to_end(key)
+            while len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+
+    def __len__(self):
+        return len(self._values)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+"""
+Fetches every source at once on a shared thread pool, instead of one after another on the request thread, so a
+request waits for the slowest source rather than the sum of them, and never longer than that source's timeout.
+A source that times out or fails gives the last value it returned for its key, this user's or location's, from
+last_known (None if there is none); the call itself is left to finish in the background. Each source's latency is
+recorded in source_latency.
+"""
+class ConcurrentAPIAdapter(MoodEntryAdapter):
+    def __init__(self, sources: list, user_id: int, executor: ThreadPoolExecutor = None,
+                 last_known: LastKnownValues = None):
+        self.sources = sources
+        self.user_id = user_id
+        self.executor = executor or external_api_executor()
+        self.last_known = LastKnownValues() if last_known is None else last_known
+
+    def _timed_fetch(self, source: DataSource):
+        started = time.perf_counter()
+        value = source.fetch(self.user_id)
+        latency_histogram(source.name).observe(time.perf_counter() - started)
+        return value
+
+    def fetch_all(self) -> dict:
+        """Returns {source name: value}, falling back to the last known value for slow or failing sources."""
+        started = time.monotonic()
+        futures = {source: self.executor.submit(self._timed_fetch, source) for source in self.sources}
+        values = {}
+        for source, future in futures.items():
+            key = (source.name, source.key(self.user_id) if source.key else self.user_id)
+            try:
+                values[source.name] = future.result(timeout=max(0.0, started + source.timeout - time.monotonic()))
+                self.last_known.put(key, values[source.name])
+            except FutureTimeoutError:
+                latency_histogram(source.name).record_timeout()
+                values[source.name] = self.last_known.get(key)
+            except Exception:
+                latency_histogram(source.name).record_error()
+                values[source.name] = self.last_known.get(key)
+        return values
+
+    def fetch_mood_entry(self) -> MoodEntry:
+        values = self.fetch_all()
+        wearable_data = values.get("wearable") or {}
+        return MoodEntry(
+            user_id=self.user_id,
+            date=datetime.now().date(),
+            heart_rate=wearable_data.get("heart_rate"),
+            step_count=wearable_data.get("step_count"),
+            sleep_quality=wearable_data.get("sleep_quality"),
+            weather=values.get("weather"),
+        )
@@ -0,0 +1,189 @@
+"""
+Maintenance commands run through the flask CLI, for example `flask backfill-sentiment`.
+These are for jobs that touch many rows at once and so should not run inside a web request.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import click
+import sqlalchemy as sa
+from app import app, db
+from app.models import Mood_DB
+from app.domain import SentimentAnalysis, warm_up_analyzer, rebuild_all_negative_streaks
+from app.controller import PredictionModel, DistressAlert
+from app.export import EXPORT_FORMATS, export_moods
+from app.profiling import PROFILE_HEADER, make_profile_token
+
+
+def read_watermark(path: str) -> int:
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def write_watermark(path: str, last_id: int):
+    # write then rename so an interrupted run never leaves a half-written watermark behind
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(str(last_id))
+    os.replace(tmp_path, path)
+
+
+def score_texts(texts, executor=None, workers: int = 1) -> list:
+    """
+    Scores texts with SentimentAnalysis.score_many, split into one batch per worker process when an executor is given.
+    """
+    if executor is None or len(texts) < 2:
+        return SentimentAnalysis.score_many(texts)
+    batch_size = -(-len(texts) // workers)
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    scores = []
+    for batch_scores in executor.map(SentimentAnalysis.score_many, batches):
+        scores.extend(batch_scores)
+    return scores
+
+
+"""
+Recomputes sentiment_score for every row that has journal text, for use after the sentiment engine or lexicon changes.
+Rows are read in id order, chunk_size at a time, using the last id of the previous chunk as the start of the next
+(keyset chunks rather than one long-lived cursor, as SQLite cannot hold a read cursor open while the same file is being
+written). Each chunk is scored across a process pool, written back with one bulk UPDATE and committed, and the last id
+is saved as a watermark so an interrupted run picks up where it stopped. The watermark is removed once a run completes.
+"""
+@app.cli.command('backfill-sentiment')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows read, scored and committed at a time.')
+@click.option('--workers', default=os.cpu_count() or 1, show_default=True,
+              help='Scoring processes. Use 1 to score in this process.')
+@click.option('--restart', is_flag=True, help='Ignore a saved watermark and start from the first row.')
+def backfill_sentiment(chunk_size, workers, restart):
+    """Recompute Mood_DB.sentiment_score from the stored journal text."""
+    watermark_path = app.config['SENTIMENT_BACKFILL_WATERMARK']
+    last_id = 0 if restart else read_watermark(watermark_path)
+    if last_id:
+        click.echo(f"Resuming after row id {last_id}.")
+
+    chunk_query = (
+        sa.select(Mood_DB.id, Mood_DB.journal_text)
+        .where(Mood_DB.journal_text.is_not(None), Mood_DB.id > sa.bindparam('last_id'))
+        .order_by(Mood_DB.id)
+        .limit(chunk_size)
+    )
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=warm_up_analyzer) if workers > 1 else None
+    total = 0
+    started = time.perf_counter()
+    try:
+        while True:
+            rows = db.session.execute(chunk_query, {'last_id': last_id}).all()
+            if not rows:
+                break
+            scores = score_texts([row.journal_text for row in rows], executor, workers)
+            db.session.execute(
+                sa.update(Mood_DB),
+                [{'id': row.id, 'sentiment_score': score} for row, score in zip(rows, scores)]
+            )
+            db.session.commit()
+            last_id = rows[-1].id
+            write_watermark(watermark_path, last_id)
+            total += len(rows)
+            elapsed = time.perf_counter() - started
+            click.echo(f"{total} rows rescored (up to id {last_id}), {total / elapsed:.0f} rows/s")
+    finally:
+        if executor:
+            executor.shutdown()
+
+    if os.path.exists(watermark_path):
+        os.remove(watermark_path)
+    elapsed = time.perf_counter() - started
+    click.echo(f"Backfill complete: {total} rows in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} rows/s).")
+    # new scores can start or break negative streaks
+    if total:
+        click.echo(f"Rebuilt negative streaks for {rebuild_all_negative_streaks()} users.")
+
+
+"""
+Folds rows added since the last run into the saved PredictionModel. Meant to be run on a schedule (e.g. nightly),
+so /predict only ever loads an already trained model.
+"""
+@app.cli.command('train-model')
+@click.option('--full', is_flag=True, help='Discard the saved model and retrain on every row.')
+def train_model(full):
+    """Incrementally train the mood PredictionModel."""
+    model = PredictionModel() if full else PredictionModel.load()
+    started = time.perf_counter()
+    new_entries = model.train()
+    click.echo(f"Folded in {new_entries} new entries ({model.entry_count} in total) "
+               f"in {time.perf_counter() - started:.1f}s.")
+
+
+"""
+Recomputes every user's MoodStreak from their Mood_DB history. Streaks are normally kept up to date as entries are
+stored; this is for after bulk changes made outside the app, or the first deployment of the streak table.
+"""
+@app.cli.command('rebuild-streaks')
+def rebuild_streaks():
+    """Recompute the negative-entry streaks used by the distress alert."""
+    started = time.perf_counter()
+    users = rebuild_all_negative_streaks()
+    click.echo(f"Rebuilt negative streaks for {users} users in {time.perf_counter() - started:.1f}s.")
+
+
+"""
+Nightly cohort-wide distress scan: records every user whose last 7 entries are negative in the cohort_alert table.
+"""
+@app.cli.command('distress-scan')
+@click.option('--date', 'scan_date', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Scan as of this date (default today).')
+def distress_scan(scan_date):
+    """Find all at-risk users in one query and record them as CohortAlerts."""
+    started = time.perf_counter()
+    found = DistressAlert.scan_cohort(scan_date.date() if scan_date else None)
+    click.echo(f"{found} users at risk, scanned in {time.perf_counter() - started:.1f}s.")
+
+
+"""
+Writes mood history to a file (or stdout with -) as CSV or NDJSON, either one user's or the whole cohort's for research.
+Rows are streamed from the database batch by batch, so a dump of every entry uses no more memory than a small one.
+"""
+@app.cli.command('export-moods')
+@click.argument('output', default='-')
+@click.option('--format', 'export_format', type=click.Choice(list(EXPORT_FORMATS)), default='csv', show_default=True)
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip the output.')
+@click.option('--user-id', type=int, help='Export only this user.')
+@click.option('--all-users', is_flag=True, help='Export every user.')
+@click.option('--batch-size', default=lambda: app.config['EXPORT_BATCH_SIZE'], type=int,
+              help='Rows fetched and written at a time.')
+def export_moods_command(output, export_format, compress, user_id, all_users, batch_size):
+    """Stream Mood_DB history to OUTPUT as CSV or NDJSON."""
+    if (user_id is None) == (not all_users):
+        raise click.UsageError("Give exactly one of --user-id or --all-users.")
+    started = time.perf_counter()
+    written = 0
+    with click.open_file(output, 'wb') as f:
+        for chunk in export_moods(export_format, user_id=user_id, compress=compress, batch_size=batch_size):
+            data = chunk if compress else chunk.encode()
+            f.write(data)
+            written += len(data)
+    click.echo(f"Exported {written} bytes in {time.perf_counter() - started:.1f}s.", err=True)
+
+
+"""
+Prints a token that has requests profiled while PROFILING_ENABLED is on (see app/profiling.py). It is signed with
+PROFILING_SECRET, so only someone with access to the server can make one, and expires after PROFILING_TOKEN_MAX_AGE
+seconds.
+"""
+@app.cli.command('profile-token')
+@click.option('--endpoint', help='Only profile requests to this endpoint (e.g. predict).')
+def profile_token(endpoint):
+    """Print a signed token for profiling requests."""
+    if endpoint is not None and endpoint not in app.view_functions:
+        raise click.BadParameter(f"no such endpoint {endpoint!r}", param_hint='--endpoint')
+    if not app.config['PROFILING_SECRET']:
+        raise click.ClickException("Set PROFILING_SECRET (the same value for the app and this command) first.")
+    if not app.config['PROFILING_ENABLED']:
+        click.echo("PROFILING_ENABLED is off, so the app will ignore this token until it is turned on.", err=True)
+    click.echo(make_profile_token(app, endpoint))
+    click.echo(f"Send it as the {PROFILE_HEADER} header or the ?profile= query parameter, within "
+               f"{app.config['PROFILING_TOKEN_MAX_AGE']}s. Profiles are written to {app.config['PROFILING_DIRECTORY']}.",
+               err=True)
@@ -1,18 +1,24 @@
+import hashlib
+import json
+import os
+import threading
+from collections import namedtuple
+from types import MappingProxyType
 from flask import flash
-from app import db
-from app.models import Mood_DB
-from datetime import datetime
-from app.adapter import ExternalAPI, ExternalAPIAdapter
+from markupsafe import Markup
+import sqlalchemy as sa
+from app import app, db
+from app.models import Mood_DB, MoodStreak, CohortAlert, WearableDay
+from datetime import date, datetime, timedelta
+from app.adapter import ExternalAPI, ExternalAPIAdapter, HTTPExternalAPI, ConcurrentAPIAdapter, external_api_sources, \
+    external_api_executor, WeatherCache, CachedWeatherAPI, LastKnownValues
 import random
-from app.domain import MoodEntry
+import numpy as np
+from app.domain import MoodEntry, NEGATIVE_MOODS, is_negative_entry, update_negative_streak
+from app.features import MOOD_LIST, FEATURE_NAMES, feature_query, build_feature_matrix, mood_labels
+from app.metrics import timer
 
 
-
-MOOD_LIST = [
-    "Happy", "Sad", "Angry", "Excited", "Calm", "Anxious",
-    "Content", "Stressed", "Bored", "Energetic", "Melancholic", "Optimistic"
-]
-
 """domain classes"""
 
 
@@ -40,32 +46,211 @@ class UserMonthlyReport:
 
 """
 Added is_trained in order to avoid retraining the model each time.
-Prototype is not too concerned about the functionality of the model, for example we do not use synthetic data 
-for a month and retrain each month and we randomise the predicted emotion.
 Otherwise the class functionality remains the same and entries.
+
+The model is a Gaussian naive Bayes classifier over the features built in app.features: it predicts the mood a user
+will log on a day from their previous entry and that day's wearable, weather and timetable data.
+It only keeps per-mood counts, sums and sums of squares of each feature, so training is incremental: train() folds
+in completed days after high_water_mark (the last day already trained on) and never rescans old history.
+Past rows edited after being trained on are not revisited; use `flask train-model --full` to retrain from scratch.
+The trained state is saved to PREDICTION_MODEL_PATH and shared by requests through get_prediction_model(),
+which reloads it only when the file changes (e.g. after `flask train-model`).
+Prediction is one vectorised computation for any number of users (predict_many).
 """
 class PredictionModel:
-    def __init__(self):
+    # Added to each feature's variance, as a fraction of that feature's variance over all moods, so that a feature
+    # which never varied for one mood (e.g. a weather that was never seen) does not dominate the prediction.
+    VAR_SMOOTHING = 1e-2
+    # Rows are read and folded in batches of this size so training memory does not grow with the table
+    TRAIN_BATCH_SIZE = 50000
+
+    def __init__(self, path: str = None):
+        self.path = path or app.config['PREDICTION_MODEL_PATH']
         self.is_trained = False
-        self.data = None
+        self.high_water_mark = None
+        n_moods, n_features = len(MOOD_LIST), len(FEATURE_NAMES)
+        self.class_counts = np.zeros(n_moods)
+        self.feature_counts = np.zeros((n_moods, n_features))
+        self.feature_sums = np.zeros((n_moods, n_features))
+        self.feature_squares = np.zeros((n_moods, n_features))
+
+    @property
+    def entry_count(self) -> int:
+        return int(self.class_counts.sum())
+
+    @property
+    def mood_counts(self) -> dict:
+        return {mood: int(count) for mood, count in zip(MOOD_LIST, self.class_counts) if count}
+
+    @classmethod
+    def load(cls, path: str = None) -> "PredictionModel":
+        """Returns the saved model, or an untrained one if nothing usable (or compatible) has been saved yet."""
+        model = cls(path)
+        try:
+            with open(model.path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return model
+        if state.get("features") != FEATURE_NAMES or state.get("moods") != MOOD_LIST:
+            return model
+        model.is_trained = state["is_trained"]
+        model.high_water_mark = state["high_water_mark"] and date.fromisoformat(state["high_water_mark"])
+        model.class_counts = np.array(state["class_counts"], dtype=float)
+        model.feature_counts = np.array(state["feature_counts"], dtype=float)
+        model.feature_sums = np.array(state["feature_sums"], dtype=float)
+        model.feature_squares = np.array(state["feature_squares"], dtype=float)
+        return model
+
+    def save(self):
+        state = {
+            "is_trained": self.is_trained,
+            "high_water_mark": self.high_water_mark and self.high_water_mark.isoformat(),
+            "moods": MOOD_LIST,
+            "features": FEATURE_NAMES,
+            "class_counts": self.class_counts.tolist(),
+            "feature_counts": self.feature_counts.tolist(),
+            "feature_sums": self.feature_sums.tolist(),
+            "feature_squares": self.feature_squares.tolist(),
+        }
+        # write then rename so a request never reads a half-written model
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
 
-    def train(self):
-        self.data = Mood_DB.query.all()
+    def train(self, until: date = None) -> int:
+        """
+        Folds in the logged moods of every day after high_water_mark and before until (default today, which is
+        still in progress), saves the model and returns how many entries were added.
+        """
+        until = until or datetime.now().date()
+        where = sa.and_(Mood_DB.date < until, Mood_DB.mood.in_(MOOD_LIST))
+        if self.high_water_mark:
+            where = sa.and_(where, Mood_DB.date > self.high_water_mark)
+        result = db.session.execute(feature_query(where).execution_options(yield_per=self.TRAIN_BATCH_SIZE))
+        new_entries = 0
+        for rows in result.partitions():
+            self.fold(build_feature_matrix(rows), mood_labels(rows))
+            new_entries += len(rows)
+        self.high_water_mark = until - timedelta(days=1)
         self.is_trained = True
-        print("PredictionModel: Training completed on provided data.")
-        print(f"PredictionModel: Training on {len(self.data)} entries.")
+        self.save()
+        print(f"PredictionModel: Training completed, folded in {new_entries} new entries.")
+        print(f"PredictionModel: Trained on {self.entry_count} entries.")
+        return new_entries
+
+    def fold(self, features: np.ndarray, labels: np.ndarray):
+        """Adds labelled feature rows (labels index MOOD_LIST, -1 is skipped) to the per-mood statistics."""
+        known = labels >= 0
+        features, labels = features[known], labels[known]
+        one_hot_labels = np.zeros((len(labels), len(MOOD_LIST)))
+        one_hot_labels[np.arange(len(labels)), labels] = 1
+        present = ~np.isnan(features)
+        values = np.where(present, features, 0.0)
+        self.class_counts += one_hot_labels.sum(axis=0)
+        self.feature_counts += one_hot_labels.T @ present
+        self.feature_sums += one_hot_labels.T @ values
+        self.feature_squares += one_hot_labels.T @ (values * values)
+
+    def _class_parameters(self):
+        total_counts = self.feature_counts.sum(axis=0)
+        overall_mean = self.feature_sums.sum(axis=0) / np.maximum(total_counts, 1)
+        overall_var = self.feature_squares.sum(axis=0) / np.maximum(total_counts, 1) - overall_mean ** 2
+        smoothing = self.VAR_SMOOTHING * np.maximum(overall_var, 0) + 1e-6
+        seen = self.feature_counts > 0
+        counts = np.maximum(self.feature_counts, 1)
+        mean = np.where(seen, self.feature_sums / counts, overall_mean)
+        var = np.where(seen, self.feature_squares / counts - mean ** 2, overall_var)
+        var = np.maximum(var, 0) + smoothing
+        log_prior = np.log((self.class_counts + 1) / (self.class_counts.sum() + len(MOOD_LIST)))
+        return mean, var, log_prior
+
+    def predict_features(self, features: np.ndarray) -> np.ndarray:
+        """
+        Returns the index into MOOD_LIST of the most likely mood for each feature row.
+        The Gaussian log-likelihood is expanded into matrix products so no (rows x moods x features) array is built,
+        and NaN features simply drop out of the sum.
+        """
+        mean, var, log_prior = self._class_parameters()
+        present = ~np.isnan(features)
+        values = np.where(present, features, 0.0)
+        log_likelihood = -0.5 * (
+            present @ np.log(2 * np.pi * var).T
+            + (values * values) @ (1 / var).T
+            - 2 * values @ (mean / var).T
+            + present @ (mean * mean / var).T
+        )
+        return np.argmax(log_likelihood + log_prior, axis=1)
 
-    def predict(self) -> str:
+    def predict_many(self, user_ids=None, day: date = None) -> dict:
+        """
+        Predicts the mood of each user from their Mood_DB row for day (default today), in one query and one
+        vectorised computation. user_ids=None predicts for every user with a row that day.
+        """
+        day = day or datetime.now().date()
+        where = Mood_DB.date == day
+        if user_ids is not None:
+            where = sa.and_(where, Mood_DB.user_id.in_(list(user_ids)))
+        rows = db.session.execute(feature_query(where)).all()
+        predictions = self.predict_features(build_feature_matrix(rows))
+        return {row.user_id: MOOD_LIST[i] for row, i in zip(rows, predictions)}
+
+    def predict(self, user_id: int, day: date = None) -> str:
         if not self.is_trained:
             flash("Model not trained", "warning")
             return "Neutral"
-        possible_predictions = MOOD_LIST
-        return random.choice(possible_predictions)
+        # with no logged moods to learn from yet, fall back to the prototype's random prediction
+        if not self.entry_count:
+            return random.choice(MOOD_LIST)
+        predictions = self.predict_many([user_id], day)
+        if user_id not in predictions:
+            return MOOD_LIST[int(np.argmax(self.class_counts))]
+        return predictions[user_id]
 
     def regression_imputation(self):
         return
 
 
+_prediction_model = None
+_prediction_model_mtime = None
+_prediction_model_lock = threading.Lock()
+
+
+def prediction_model_version():
+    """Modification time of the saved model, which changes whenever it is retrained; None if none is saved yet."""
+    try:
+        return os.stat(app.config['PREDICTION_MODEL_PATH']).st_mtime_ns
+    except OSError:
+        return None
+
+
+def get_prediction_model() -> PredictionModel:
+    """
+    Returns the shared trained model, loading it from disk when the saved file has changed since it was last read.
+    Only if no trained model has ever been saved is it trained here.
+    """
+    global _prediction_model, _prediction_model_mtime
+    path = app.config['PREDICTION_MODEL_PATH']
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime = None
+    with _prediction_model_lock:
+        if _prediction_model is None or mtime != _prediction_model_mtime:
+            _prediction_model = PredictionModel.load(path)
+            if not _prediction_model.is_trained:
+                _prediction_model.train()
+            _prediction_model_mtime = os.stat(path).st_mtime_ns
+        return _prediction_model
+
+
+def user_with_emergency_contact(user_id: int):
+    """The user with their emergency contact loaded in the same query (rather than lazily on first access)."""
+    from app.models import User
+    return db.session.scalar(
+        sa.select(User).options(sa.orm.joinedload(User.emergency_contact)).where(User.id == user_id))
+
+
 """
 Ensures FR6 is achieved 
 """
@@ -88,8 +273,7 @@ class SupportService:
         """
         Returns a brief description of the support service including the user's emergency contact.
         """
-        from app.models import User
-        user = User.query.get(self.user_id)
+        user = user_with_emergency_contact(self.user_id)
         if not user or not user.emergency_contact:
             return "No emergency contact info available."
         ec = user.emergency_contact
@@ -104,164 +288,107 @@ class SupportService:
         return message
 
 
+"""
+The recommendation catalog (description, tips and links for each mood) is content rather than code, so it lives in
+RECOMMENDATIONS_PATH and is loaded once into read-only mappings shared by every request. get_recommendation_catalog
+reloads it when the file changes, so content can be updated without restarting the app.
+The HTML shown for a mood only depends on the catalog, so each mood's fragment is rendered once per catalog version.
+"""
+RecommendationCatalog = namedtuple('RecommendationCatalog', ['version', 'moods', 'fallback'])
+
+
+def _freeze(value):
+    # dicts become read-only mappings and lists tuples, so shared catalog content cannot be changed by a caller
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def load_recommendation_catalog(path: str) -> RecommendationCatalog:
+    with open(path, 'rb') as f:
+        content = f.read()
+    data = json.loads(content)
+    return RecommendationCatalog(
+        version=hashlib.blake2b(content, digest_size=8).hexdigest(),
+        moods=_freeze(data['moods']),
+        fallback=_freeze(data['fallback']),
+    )
+
+
+_recommendation_catalog = None
+_recommendation_catalog_mtime = None
+_recommendation_fragments = {}
+_recommendation_lock = threading.Lock()
+
+
+def get_recommendation_catalog() -> RecommendationCatalog:
+    """
+    Returns the shared catalog, reloading it when RECOMMENDATIONS_PATH has changed since it was last read.
+    A file that cannot be read (missing while it is swapped, or half written) keeps the last catalog in use, and is
+    tried again on the next call; only the first load raises.
+    """
+    global _recommendation_catalog, _recommendation_catalog_mtime
+    path = app.config['RECOMMENDATIONS_PATH']
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError as error:
+        if _recommendation_catalog is None:
+            raise
+        app.logger.warning("Keeping the loaded recommendation catalog, %s is unavailable: %s", path, error)
+        return _recommendation_catalog
+    with _recommendation_lock:
+        if _recommendation_catalog is None or mtime != _recommendation_catalog_mtime:
+            try:
+                catalog = load_recommendation_catalog(path)
+            except (OSError, ValueError, KeyError, TypeError) as error:
+                if _recommendation_catalog is None:
+                    raise
+                app.logger.warning("Keeping the loaded recommendation catalog, %s could not be read: %r", path, error)
+                return _recommendation_catalog
+            if _recommendation_catalog is None or catalog.version != _recommendation_catalog.version:
+                # fragments of older versions will never be asked for again
+                _recommendation_fragments.clear()
+            _recommendation_catalog, _recommendation_catalog_mtime = catalog, mtime
+        return _recommendation_catalog
+
+
+def render_recommendation_fragment(mood: str) -> Markup:
+    """HTML for a mood's recommendations (templates/_recommendation.html), rendered once per catalog version."""
+    catalog = get_recommendation_catalog()
+    key = (catalog.version, mood)
+    fragment = _recommendation_fragments.get(key)
+    if fragment is None:
+        suggestions = catalog.moods.get(mood, catalog.fallback)
+        fragment = Markup(app.jinja_env.get_template('_recommendation.html').render(suggestions=suggestions))
+        with _recommendation_lock:
+            # the catalog may have been reloaded while rendering; an old version's fragment would never be cleared
+            if _recommendation_catalog is not None and _recommendation_catalog.version == catalog.version:
+                _recommendation_fragments[key] = fragment
+    return fragment
+
+
 """
 Class remains the same except suggestions is not a list it is a dictionary.
 for the purpose of the prototype links and descriptions have been gathered using chat gpt.
+The suggestions are the shared catalog from app/data/recommendations.json rather than a copy built per instance.
 """
 class RecommendationSystem:
     def __init__(self, user_id):
         self.user_id = user_id
-        # A dictionary that maps each mood to a structured recommendation.
+        # A mapping from each mood to a structured recommendation.
         # "links" might point to yoga, breathing exercises, etc.
-        self.suggestions = {
-            "Happy": {
-                "description": "You’re in a good mood! Keep up the positive energy.",
-                "tips": [
-                    "Keep a gratitude journal to reflect on positive events.",
-                    "Share your joy with someone—send a message to a friend."
-                ],
-                "links": [
-                    {"name": "Yoga Journal", "url": "https://www.yogajournal.com/"},
-                    {"name": "Headspace Mindfulness", "url": "https://www.headspace.com/mindfulness"}
-                ]
-            },
-            "Sad": {
-                "description": "It’s normal to feel down sometimes. Here are ways to cope:",
-                "tips": [
-                    "Try a gentle yoga flow to lift your spirits.",
-                    "Reach out to a trusted friend or counselor."
-                ],
-                "links": [
-                    {"name": "Yoga Blues", "url": "https://www.yogajournal.com/poses/yoga-for-depression/"},
-                    {"name": "Breathing exercises",
-                     "url": "https://www.healthline.com/health/breathing-exercise-for-anxiety"}
-                ]
-            },
-            "Angry": {
-                "description": "Anger can be overwhelming, but you can manage it healthily.",
-                "tips": [
-                    "Practice a breathing exercise for 5 minutes to calm down.",
-                    "Channel your energy into something constructive, like a workout."
-                ],
-                "links": [
-                    {"name": "Box Breathing Technique", "url": "https://www.healthline.com/health/box-breathing"},
-                    {"name": "Managing Anger Tips",
-                     "url": "https://www.verywellmind.com/tips-for-managing-anger-4158310"}
-                ]
-            },
-            "Excited": {
-                "description": "You’re bursting with energy! Make the most of it.",
-                "tips": [
-                    "Plan or start a fun project you’ve been putting off.",
-                    "Write down your goals to harness this excitement productively."
-                ],
-                "links": [
-                    {"name": "Goal Setting Tools", "url": "https://www.mindtools.com/a4wo118/goal-setting"},
-                    {"name": "Motivational Video", "url": "https://www.youtube.com/watch?v=9kzQ9ZgZCRg"}
-                ]
-            },
-            "Calm": {
-                "description": "Enjoy your calm state. Here are some ideas to maintain it:",
-                "tips": [
-                    "Try a short meditation session to reinforce your peace.",
-                    "Listen to relaxing music or a guided mindfulness session."
-                ],
-                "links": [
-                    {"name": "Calm App", "url": "https://www.calm.com/"},
-                    {"name": "Headspace", "url": "https://www.headspace.com/"}
-                ]
-            },
-            "Anxious": {
-                "description": "Anxiety can be tough. Consider these ways to find relief:",
-                "tips": [
-                    "Try mindful breathing exercises for 5–10 minutes.",
-                    "Talk to someone supportive or write down your worries."
-                ],
-                "links": [
-                    {"name": "Breathing Exercise",
-                     "url": "https://www.healthline.com/health/breathing-exercise-for-anxiety"},
-                    {"name": "Anxiety UK", "url": "https://www.anxietyuk.org.uk/"}
-                ]
-            },
-            "Content": {
-                "description": "You’re feeling content. Keep doing what works!",
-                "tips": [
-                    "Enjoy a quiet moment to reflect on your achievements.",
-                    "Share your sense of well-being with someone who matters to you."
-                ],
-                "links": [
-                    {"name": "Contentment Info", "url": "https://www.verywellmind.com/what-is-contentment-4771990"},
-                    {"name": "Gratitude Apps", "url": "https://positivepsychology.com/gratitude-apps/"}
-                ]
-            },
-            "Stressed": {
-                "description": "Feeling stressed? Try these techniques to unwind:",
-                "tips": [
-                    "Practice a short yoga session to relax tense muscles.",
-                    "Take a 10-minute break and do a quick breathing exercise."
-                ],
-                "links": [
-                    {"name": "Yoga for Stress", "url": "https://www.yogajournal.com/poses/yoga-for-stress/"},
-                    {"name": "Breathing Meditation", "url": "https://www.mindful.org/breathing-meditation-2/"}
-                ]
-            },
-            "Bored": {
-                "description": "Boredom can be an opportunity to explore new things:",
-                "tips": [
-                    "Pick up a new hobby, or revisit an old interest.",
-                    "Try a quick workout or a new recipe to spark excitement."
-                ],
-                "links": [
-                    {"name": "Productive Ideas",
-                     "url": "https://www.lifehack.org/articles/lifestyle/15-productive-things-bored.html"},
-                    {"name": "Yoga with Adriene", "url": "https://www.youtube.com/user/yogawithadriene"}
-                ]
-            },
-            "Energetic": {
-                "description": "You have lots of energy! Channel it wisely:",
-                "tips": [
-                    "Go for a run or do a high-intensity workout.",
-                    "Use this energy to tackle challenging tasks on your to-do list."
-                ],
-                "links": [
-                    {"name": "Runner's World UK", "url": "https://www.runnersworld.com/uk/"},
-                    {"name": "High-Intensity Workout", "url": "https://www.youtube.com/watch?v=ml6cT4AZdqI"}
-                ]
-            },
-            "Melancholic": {
-                "description": "You’re feeling melancholic. Here are gentle suggestions:",
-                "tips": [
-                    "Listen to soothing music or try journaling your thoughts.",
-                    "Give yourself space to process emotions, and seek help if needed."
-                ],
-                "links": [
-                    {"name": "Managing Sadness", "url": "https://www.verywellmind.com/ways-to-manage-sadness-3144938"},
-                    {"name": "BetterHelp", "url": "https://www.betterhelp.com/"}
-                ]
-            },
-            "Optimistic": {
-                "description": "You’re feeling optimistic! Keep the positive outlook going.",
-                "tips": [
-                    "Share your optimism with friends or family.",
-                    "Plan a fun activity that aligns with your goals."
-                ],
-                "links": [
-                    {"name": "Learned Optimism", "url": "https://positivepsychology.com/learned-optimism/"},
-                    {"name": "Optimistic Inspiration", "url": "https://www.youtube.com/watch?v=Uxl3IGXa3MY"}
-                ]
-            }
-        }
+        catalog = get_recommendation_catalog()
+        self.suggestions = catalog.moods
+        self.fallback = catalog.fallback
 
     def generate_recommendations(self, mood: str) -> dict:
         """
-        Returns a dictionary with 'description', 'tips', and 'links'
+        Returns a mapping with 'description', 'tips', and 'links'
         for the given mood. If the mood is not found, returns a default fallback.
         """
-        return self.suggestions.get(mood, {
-            "description": "No specific recommendations found for this mood.",
-            "tips": [],
-            "links": []
-        })
+        return self.suggestions.get(mood, self.fallback)
 
 
 """
@@ -277,9 +404,25 @@ class DistressAlert:
         if not current_mood_record:
             raise ValueError('Invalid current mood record.')
 
+        # the user's MoodStreak answers this with one lookup; the 7-entry query is only needed when it cannot
+        negative_streak = self.negative_streak_before(current_mood_record)
+        if negative_streak is not None:
+            return negative_streak >= 7
         previous_entries = self.retrieve_previous_7_entries(current_mood_record)
         return self.check_for_negative_entries(previous_entries)
 
+    #Returns how many consecutive negative entries come before the record, or None if the MoodStreak cannot tell
+    #(no streak stored yet, or the record is older than the user's latest entry)
+    def negative_streak_before(self, current_mood_record):
+        streak = db.session.get(MoodStreak, self.user_id)
+        if streak is None or streak.last_entry_date is None:
+            return None
+        if current_mood_record.date == streak.last_entry_date:
+            return streak.negative_days_before
+        if current_mood_record.date > streak.last_entry_date:
+            return streak.negative_days
+        return None
+
     #Retrieves a maximum of 7 of the most recent entries
     def retrieve_previous_7_entries(self, current_mood_record):
         return (
@@ -298,8 +441,7 @@ class DistressAlert:
         if len(previous_entries) == 7:
             # returns true if there are 7 previous sentiment scores all below 0 or mood entered for the past 7 entries are negative
             distress_triggered = all(
-                (entry.sentiment_score is not None and entry.sentiment_score < 0) or
-                (entry.mood.lower() in ["Sad", "Angry", "Anxious", "Stressed", "Bored", "Melancholic"])
+                is_negative_entry(entry.mood, entry.sentiment_score)
                 for entry in previous_entries
             )
             return distress_triggered
@@ -307,8 +449,7 @@ class DistressAlert:
 
     #Gets information about emergency support
     def contactEmergencySupport(self):
-        from app.models import User
-        user = User.query.get(self.user_id)
+        user = user_with_emergency_contact(self.user_id)
         if not user:
             flash(f"[DistressAlert] No user found with ID {self.user_id}.", "warning")
             return
@@ -322,6 +463,43 @@ class DistressAlert:
             "warning"
         )
 
+    @staticmethod
+    def scan_cohort(scan_date: date = None) -> int:
+        """
+        Finds every user whose last 7 entries up to scan_date (default today) are all negative, in one query, and
+        records them in CohortAlert (replacing any earlier results for that date). Returns the number of users found.
+        ROW_NUMBER() numbers each user's entries newest first, using the (user_id, date) index for the ordering;
+        a user is at risk when positions 1-7 exist and are all negative. Commits.
+        """
+        scan_date = scan_date or datetime.now().date()
+        negative = sa.case(
+            (sa.or_(Mood_DB.sentiment_score < 0, Mood_DB.mood.in_(NEGATIVE_MOODS)), 1),
+            else_=0
+        )
+        ranked = (
+            sa.select(
+                Mood_DB.user_id,
+                Mood_DB.date,
+                negative.label("negative"),
+                sa.func.row_number().over(partition_by=Mood_DB.user_id, order_by=Mood_DB.date.desc()).label("position"),
+            )
+            .where(Mood_DB.date <= scan_date)
+            .subquery()
+        )
+        at_risk = (
+            sa.select(ranked.c.user_id, sa.literal(scan_date, sa.Date), sa.func.max(ranked.c.date),
+                      sa.literal(datetime.now(), sa.DateTime))
+            .where(ranked.c.position <= 7)
+            .group_by(ranked.c.user_id)
+            .having(sa.func.count() == 7, sa.func.sum(ranked.c.negative) == 7)
+        )
+        db.session.execute(sa.delete(CohortAlert).where(CohortAlert.scan_date == scan_date))
+        result = db.session.execute(
+            sa.insert(CohortAlert).from_select(["user_id", "scan_date", "last_entry_date", "created_at"], at_risk)
+        )
+        db.session.commit()
+        return result.rowcount
+
 
 """controller functions"""
 
@@ -396,39 +574,61 @@ def process_recommendation(user, predicted_mood):
     else:
         support_contact, uni_wellbeing = retrieve_support(user)
 
-    # Return a dictionary containing the main message, the suggestions, and any support info
+    # Return a dictionary containing the main message, the suggestions (also as cached HTML), and any support info
     return {
         "message": message,
         "suggestions": suggestions,
+        "suggestions_html": render_recommendation_fragment(predicted_mood),
         "support_contact": support_contact,
         "Uni_wellbeing": uni_wellbeing
     }
 
+"""
+Latest day each user is known to have a Mood_DB entry for, so the 6pm gate in views.require_mood_logging asks the
+database at most once per user per day. Only "has an entry" is remembered: entries are never removed, so that cannot
+go stale, while "no entry yet" could be made wrong by a write in another process. process_log_mood records the day
+as soon as it writes.
+"""
+logged_mood_days = {}
+
+
+def has_logged_mood(user_id: int, day: date) -> bool:
+    if logged_mood_days.get(user_id) == day:
+        return True
+    logged = db.session.scalar(
+        sa.select(Mood_DB.id).where(Mood_DB.user_id == user_id, Mood_DB.date == day).limit(1)) is not None
+    if logged:
+        logged_mood_days[user_id] = day
+    return logged
+
+
 def process_log_mood(choice, user):
     """Processes mood selection and returns the Mood_DB record."""
     from app.models import Mood_DB
     today = datetime.now().date()
+    # read before anything is committed, which would expire user and cost a query to read it again
+    user_id = user.id
     #collects first entry of data in database that of the current day
-    mood_record = Mood_DB.query.filter_by(user_id=user.id, date=today).first()
+    mood_record = Mood_DB.query.filter_by(user_id=user_id, date=today).first()
     #if today's mood record exists simply just add the mood to the database
     if mood_record:
         mood_record.mood = choice
+        update_negative_streak(mood_record)
         # we commit this to the database here as instruction in the first sequence diagram in assignment 1
         db.session.commit()
 
     #otherwise create a new mood record for today with the selected mood
     else:
         mood_record = Mood_DB(
-            user_id=user.id,
+            user_id=user_id,
             date=today,
             mood=choice
         )
         #We create a domain-level MoodEntry object to encapsulate the mood data and handle additional data
-        mood_entry = MoodEntry(user_id=user.id, date=today, mood=choice)
-        #add it to the database like done in sequence diagram
-        mood_entry.storeEntry()
-        # Reload the record from the DB
-        mood_record = Mood_DB.query.filter_by(user_id=user.id, date=today).first()
+        mood_entry = MoodEntry(user_id=user_id, date=today, mood=choice)
+        #add it to the database like done in sequence diagram; storeEntry returns the stored record
+        mood_record = mood_entry.storeEntry()
+    logged_mood_days[user_id] = today
     return mood_record
 
 def process_journal(mood_id, journal_text, user):
@@ -462,6 +662,35 @@ def process_journal(mood_id, journal_text, user):
     #returns the mood entry object and None as a success message
     return mood_entry, None
 
+# Weather for every user's prediction, shared across requests (see adapter.WeatherCache)
+weather_cache = WeatherCache(ttl=app.config['WEATHER_CACHE_TTL'])
+# What each source last returned, per user (per location for weather), for when a source is slow or failing
+last_known_values = LastKnownValues(maxsize=app.config['EXTERNAL_API_LAST_KNOWN_SIZE'],
+                                    max_age=app.config['EXTERNAL_API_LAST_KNOWN_MAX_AGE'])
+
+
+def make_external_adapter(user_id: int) -> ConcurrentAPIAdapter:
+    """Adapter over the configured external providers (simulated unless WEATHER_API_URL and WEARABLE_API_URL are set)."""
+    config = app.config
+    if config['WEATHER_API_URL'] and config['WEARABLE_API_URL']:
+        external_api = HTTPExternalAPI(api_id=2, api_name="OpenWeather", api_key="ABC123",
+                                       weather_url=config['WEATHER_API_URL'], wearable_url=config['WEARABLE_API_URL'],
+                                       timeout=max(config['WEATHER_API_TIMEOUT'], config['WEARABLE_API_TIMEOUT']))
+    else:
+        external_api = ExternalAPI(api_id=2, api_name="OpenWeather", api_key="ABC123")
+    external_api = CachedWeatherAPI(external_api, weather_cache, config['WEATHER_LOCATION'])
+    sources = external_api_sources(external_api, config['WEATHER_API_TIMEOUT'], config['WEARABLE_API_TIMEOUT'],
+                                   location=config['WEATHER_LOCATION'])
+    return ConcurrentAPIAdapter(sources, user_id, executor=external_api_executor(config['EXTERNAL_API_WORKERS']),
+                                last_known=last_known_values)
+
+
+def has_wearable_samples(user_id: int, day: date) -> bool:
+    return db.session.scalar(
+        sa.select(WearableDay.id).where(WearableDay.user_id == user_id, WearableDay.date == day)
+    ) is not None
+
+
 def process_prediction(user):
     """Processes the prediction flow and returns the predicted mood."""
     from app.models import Mood_DB
@@ -470,41 +699,67 @@ def process_prediction(user):
     #find the record of today's date in the database
     mood_record = Mood_DB.query.filter_by(user_id=user.id, date=today).first()
 
-    #create an external api object
-    external_api = ExternalAPI(api_id=2, api_name="OpenWeather", api_key="ABC123")
-    adapter = ExternalAPIAdapter(external_api, user_id=user.id)
+    #create an adapter over the external api, which fetches weather and wearable data concurrently
+    adapter = make_external_adapter(user.id)
     #fetch the data
     external_data = adapter.fetch_mood_entry()
-    extra_smartwatch = external_data.smartwatch_data
 
     # Generate timetable information using a monthly report.
     monthly_report = UserMonthlyReport()
     #retrieve monthly report data (e.g., hours of exercise, lectures, work, deadlines).
     report_data = monthly_report.submitReport()
-    timetable = (
-        f"Exercise H: {report_data['exerciseHours']}, Lecture H: {report_data['lectureHours']},"
-        f"Work H: {report_data['workHours']}, Num Deadlines: {report_data['deadlines']}"
-    )
     # If there's no mood record for today, create one and populate fields with external data and timetable.
     if not mood_record:
-        mood_record = Mood_DB(
-            user_id=user.id,
-            date=today,
-            smartwatch_data=extra_smartwatch,
-            weather=external_data.weather,
-            timetable=timetable
-        )
+        mood_record = Mood_DB(user_id=user.id, date=today)
         db.session.add(mood_record)
-    else:
-        #update record with the data
-        mood_record.weather = external_data.weather
-        mood_record.smartwatch_data = extra_smartwatch
-        mood_record.timetable = timetable
+    #update record with the data; a source that timed out or failed with no last known value gives None, which must
+    #not clear a reading already stored for today
+    fields = ['weather']
+    # once the user's wearable uploads its own samples (app.ingest), their daily summary is used instead
+    if not has_wearable_samples(user.id, today):
+        fields += ['heart_rate', 'step_count', 'sleep_quality']
+    for field in fields:
+        value = getattr(external_data, field)
+        if value is not None:
+            setattr(mood_record, field, value)
+    mood_record.exercise_hours = report_data['exerciseHours']
+    mood_record.lecture_hours = report_data['lectureHours']
+    mood_record.work_hours = report_data['workHours']
+    mood_record.deadlines = report_data['deadlines']
+    update_negative_streak(mood_record)
     #commit all changes to the database
     db.session.commit()
 
-    # Train and predict using the model.
-    model = PredictionModel()
-    model.train()
-    predicted_mood = model.predict()
-    return predicted_mood
\ No newline at end of file
+    # Predict using the shared model, which is trained ahead of time rather than on every request.
+    with timer("prediction"):
+        model = get_prediction_model()
+        predicted_mood = model.predict(user.id, today)
+    return predicted_mood
+
+
+def get_history_page(user_id: int, before: date = None, after: date = None, page_size: int = 30):
+    """
+    Returns one page of a user's Mood_DB history, newest first, with the cursors for the neighbouring pages:
+    (entries, older_cursor, newer_cursor). A cursor is the date to pass as before/after, or None if there is no such page.
+    Pages are found by keyset on (user_id, date) rather than OFFSET, so every page is an index range read of
+    page_size + 1 rows however long the history is; the extra row only tells whether another page exists.
+    """
+    query = Mood_DB.query.filter(Mood_DB.user_id == user_id)
+    if after is not None:
+        # newer page: read forwards from the cursor, then flip back to newest first
+        rows = query.filter(Mood_DB.date > after).order_by(Mood_DB.date.asc()).limit(page_size + 1).all()
+        has_newer = len(rows) > page_size
+        entries = list(reversed(rows[:page_size]))
+        has_older = True
+    else:
+        if before is not None:
+            query = query.filter(Mood_DB.date < before)
+        rows = query.order_by(Mood_DB.date.desc()).limit(page_size + 1).all()
+        has_older = len(rows) > page_size
+        entries = rows[:page_size]
+        has_newer = before is not None
+    if not entries:
+        return entries, None, None
+    older_cursor = entries[-1].date if has_older else None
+    newer_cursor = entries[0].date if has_newer else None
+    return entries, older_cursor, newer_cursor
@@ -0,0 +1,68 @@
+"""
+Engine profiles, chosen per deployment with DATABASE_PROFILE (see config.py):
+- sqlite: a SQLite file shared by several workers. Every connection is switched to WAL, so readers no longer block the
+  writer, with synchronous=NORMAL (safe in WAL, and far fewer fsyncs), a busy_timeout so a writer waits for the lock
+  rather than failing with "database is locked", and a larger page cache and memory-mapped reads. Foreign keys are
+  enforced, which SQLite otherwise skips, so a SQLite deployment refuses the same rows a server database would.
+- server: a database server (PostgreSQL, MySQL) reached through a pool of connections per worker, checked before use
+  so connections dropped by the server are replaced, and recycled before the server's idle timeout.
+- default: SQLAlchemy's own settings.
+"""
+import sqlalchemy as sa
+
+ENGINE_PROFILES = ("default", "sqlite", "server")
+
+
+def engine_options(config) -> dict:
+    """create_engine() options for the configured profile (SQLALCHEMY_ENGINE_OPTIONS)."""
+    profile = config['DATABASE_PROFILE']
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown DATABASE_PROFILE {profile!r}, expected one of {', '.join(ENGINE_PROFILES)}")
+    if profile == "server":
+        return {
+            "pool_size": config['DATABASE_POOL_SIZE'],
+            "max_overflow": config['DATABASE_MAX_OVERFLOW'],
+            "pool_timeout": config['DATABASE_POOL_TIMEOUT'],
+            "pool_recycle": config['DATABASE_POOL_RECYCLE'],
+            "pool_pre_ping": True,
+        }
+    return {}
+
+
+def sqlite_pragmas(config) -> dict:
+    return {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": config['SQLITE_BUSY_TIMEOUT_MS'],
+        "cache_size": -config['SQLITE_CACHE_SIZE_KIB'],  # negative: KiB rather than pages
+        "mmap_size": config['SQLITE_MMAP_SIZE'],
+        "foreign_keys": "ON",
+    }
+
+
+def configure_engine(engine, config):
+    """Sets up an engine created with engine_options, e.g. the SQLite profile's pragmas on each new connection."""
+    if config['DATABASE_PROFILE'] != "sqlite" or engine.dialect.name != "sqlite":
+        return
+    pragmas = sqlite_pragmas(config)
+
+    @sa.event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def lock_for_write(session):
+    """
+    Takes the database's write lock for the rest of session's transaction, where SELECT ... FOR UPDATE cannot: SQLite
+    ignores FOR UPDATE, and its driver only begins a transaction at the first write, so rows read before that could be
+    changed by another writer in between. BEGIN IMMEDIATE makes other writers wait (up to the busy timeout) instead.
+    Does nothing on other databases, or once this transaction has written (SQLite then already holds the lock).
+    """
+    connection = session.connection()
+    if connection.dialect.name != "sqlite":
+        return
+    if not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
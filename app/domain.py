@@ -1,13 +1,17 @@
 """
 introduced this file to ensure no circular import between app.controller and app.adapter
 """
+import atexit
+import hashlib
+import itertools
+import json
+import os
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from app import db
-from app.models import Mood_DB
-
-import nltk
-nltk.download('vader_lexicon')
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
+from app import app, db
+import sqlalchemy as sa
+from app.models import Mood_DB, MoodStreak
 
 class MoodEntry:
     """
@@ -15,40 +19,41 @@ class MoodEntry:
     in the database and perform sentiment analysis.
     Restructured from class diagram in terms of inputs, however the functions remain the same.
     """
+    # Fields copied onto the Mood_DB row by storeEntry when they have a value
+    STORED_FIELDS = (
+        "mood", "sentiment_score", "journal_text", "heart_rate", "step_count", "sleep_quality", "weather",
+        "exercise_hours", "lecture_hours", "work_hours", "deadlines",
+    )
+
     def __init__(self, user_id: int = 1, date=None, mood: str = "NA",
-                 smartwatch_data: str = None, weather: str = None, timetable: str = None):
+                 heart_rate: int = None, step_count: int = None, sleep_quality: float = None,
+                 weather: str = None, exercise_hours: int = None, lecture_hours: int = None,
+                 work_hours: int = None, deadlines: int = None):
         self.user_id = user_id
         self.date = date or datetime.now().date()
         self.mood = mood
-        self.smartwatch_data = smartwatch_data
+        # wearable readings and timetable hours are kept as numbers (previously packed into strings)
+        self.heart_rate = heart_rate
+        self.step_count = step_count
+        self.sleep_quality = sleep_quality
         self.weather = weather
-        self.timetable = timetable
+        self.exercise_hours = exercise_hours
+        self.lecture_hours = lecture_hours
+        self.work_hours = work_hours
+        self.deadlines = deadlines
         self.sentiment_score = None  # To be set after analysis
+        self.journal_text = None  # Kept so the score can be recomputed if the sentiment engine changes
 
     def storeEntry(self) -> Mood_DB:
         record = Mood_DB.query.filter_by(user_id=self.user_id, date=self.date).first()
-        if record:
-            if self.mood is not None:
-                record.mood = self.mood
-            if self.sentiment_score is not None:
-                record.sentiment_score = self.sentiment_score
-            if self.smartwatch_data is not None:
-                record.smartwatch_data = self.smartwatch_data
-            if self.weather is not None:
-                record.weather = self.weather
-            if self.timetable is not None:
-                record.timetable = self.timetable
-        else:
-            record = Mood_DB(
-                user_id=self.user_id,
-                date=self.date,
-                mood=self.mood,
-                sentiment_score=self.sentiment_score,
-                smartwatch_data=self.smartwatch_data,
-                weather=self.weather,
-                timetable=self.timetable
-            )
+        if not record:
+            record = Mood_DB(user_id=self.user_id, date=self.date)
             db.session.add(record)
+        for field in self.STORED_FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                setattr(record, field, value)
+        update_negative_streak(record)
         db.session.commit()
         return record
 
@@ -58,15 +63,241 @@ class MoodEntry:
      MoodEntry having a dependency on Sentiment Analysis for this function to work.
     """
     def analyzeSentiment(self, text: str):
-        analysis = SentimentAnalysis(moodEntryID=0, text=text)
-        analysis.performAnalysis()
-        self.sentiment_score = analysis.getScore()
+        self.sentiment_score = SentimentAnalysis.score_many([text])[0]
+        self.journal_text = text
         existing_record = Mood_DB.query.filter_by(user_id=self.user_id, date=self.date).first()
         if existing_record:
             existing_record.sentiment_score = self.sentiment_score
+            existing_record.journal_text = self.journal_text
+            update_negative_streak(existing_record)
             db.session.commit()
 
 
+"""
+An entry counts as negative if its journal sentiment is below zero or the logged mood is one of the negative moods.
+Shared by DistressAlert and the MoodStreak bookkeeping below so both agree on what "negative" means.
+"""
+NEGATIVE_MOODS = ["Sad", "Angry", "Anxious", "Stressed", "Bored", "Melancholic"]
+
+
+def is_negative_entry(mood, sentiment_score) -> bool:
+    return (sentiment_score is not None and sentiment_score < 0) or mood in NEGATIVE_MOODS
+
+
+def streak_from_entries(entries):
+    """
+    Works out (last_entry_date, last_entry_negative, negative_days_before) from a user's entries, newest first.
+    Stops reading at the first non-negative entry after the latest one.
+    """
+    entries = iter(entries)
+    latest = next(entries, None)
+    if latest is None:
+        return None, False, 0
+    negative_before = 0
+    for entry in entries:
+        if not is_negative_entry(entry.mood, entry.sentiment_score):
+            break
+        negative_before += 1
+    return latest.date, is_negative_entry(latest.mood, latest.sentiment_score), negative_before
+
+
+def rebuild_negative_streak(user_id: int) -> MoodStreak:
+    """Recounts one user's MoodStreak from their history. Does not commit."""
+    entries = db.session.execute(
+        sa.select(Mood_DB.date, Mood_DB.mood, Mood_DB.sentiment_score)
+        .where(Mood_DB.user_id == user_id)
+        .order_by(Mood_DB.date.desc())
+    )
+    streak = db.session.get(MoodStreak, user_id)
+    if streak is None:
+        streak = MoodStreak(user_id=user_id)
+        db.session.add(streak)
+    streak.last_entry_date, streak.last_entry_negative, streak.negative_days_before = streak_from_entries(entries)
+    return streak
+
+
+def rebuild_all_negative_streaks(batch_size: int = 10000) -> int:
+    """
+    Recounts every user's MoodStreak in one ordered pass over Mood_DB, replacing the stored streaks, and commits.
+    Returns the number of users.
+    """
+    db.session.execute(sa.delete(MoodStreak))
+    entries = db.session.execute(
+        sa.select(Mood_DB.user_id, Mood_DB.date, Mood_DB.mood, Mood_DB.sentiment_score)
+        .order_by(Mood_DB.user_id, Mood_DB.date.desc())
+        .execution_options(yield_per=batch_size)
+    )
+    streaks, users = [], 0
+    for user_id, user_entries in itertools.groupby(entries, key=lambda entry: entry.user_id):
+        last_date, last_negative, negative_before = streak_from_entries(user_entries)
+        streaks.append({"user_id": user_id, "last_entry_date": last_date,
+                        "last_entry_negative": last_negative, "negative_days_before": negative_before})
+        users += 1
+        if len(streaks) == batch_size:
+            db.session.execute(sa.insert(MoodStreak), streaks)
+            streaks = []
+    if streaks:
+        db.session.execute(sa.insert(MoodStreak), streaks)
+    db.session.commit()
+    return users
+
+
+def update_negative_streak(record: Mood_DB):
+    """
+    Brings the user's MoodStreak up to date after record has been added or changed. Call it before committing so the
+    entry and the streak are saved in the same transaction. Changing the newest entry, or adding a newer one, is O(1);
+    changing an older entry (or a user with no streak yet) recounts from history.
+    """
+    streak = db.session.get(MoodStreak, record.user_id)
+    if streak is None or streak.last_entry_date is None or record.date < streak.last_entry_date:
+        db.session.flush()
+        rebuild_negative_streak(record.user_id)
+        return
+    negative = is_negative_entry(record.mood, record.sentiment_score)
+    if record.date > streak.last_entry_date:
+        streak.negative_days_before = streak.negative_days
+        streak.last_entry_date = record.date
+    streak.last_entry_negative = negative
+
+
+"""
+A single analyzer is shared by the whole process. Building one parses the full VADER lexicon, so it is done once,
+the first time sentiment is needed, rather than on every journal submission.
+The lexicon is read from VADER_LEXICON_PATH (a copy ships in app/data) instead of being downloaded through NLTK,
+so start-up never touches the network. polarity_scores only reads the lexicon, so the shared instance is safe
+to use from several request threads.
+"""
+_analyzer = None
+_analyzer_lock = threading.Lock()
+
+
+def get_analyzer():
+    global _analyzer
+    if _analyzer is None:
+        with _analyzer_lock:
+            # re-check inside the lock in case another thread loaded it while we waited
+            if _analyzer is None:
+                # imported here so that importing the app does not pull in NLTK
+                from nltk.sentiment.vader import SentimentIntensityAnalyzer
+                _analyzer = SentimentIntensityAnalyzer(lexicon_file=os.path.abspath(app.config['VADER_LEXICON_PATH']))
+    return _analyzer
+
+
+def warm_up_analyzer() -> bool:
+    """
+    Loads the shared analyzer ahead of the first request. Returns False if the lexicon cannot be loaded,
+    in which case loading is retried the next time sentiment is needed.
+    """
+    try:
+        get_analyzer()
+    except (LookupError, OSError, ValueError):
+        return False
+    return True
+
+
+def check_lexicon(path: str):
+    """
+    Start-up self-test for the sentiment lexicon. Only the first entry is parsed so the check stays cheap;
+    the full lexicon is still loaded lazily. Returns None if the file looks usable, otherwise an error message.
+    """
+    try:
+        with open(path, encoding='utf-8') as lexicon:
+            first_line = lexicon.readline()
+    except OSError as e:
+        return f"VADER lexicon not readable at {path}: {e}"
+    try:
+        word, measure = first_line.strip().split('\t')[0:2]
+        float(measure)
+    except ValueError:
+        return f"VADER lexicon at {path} is not in the expected word<TAB>score format."
+    return None
+
+
+"""
+Scores are cached by a hash of the normalised text and SENTIMENT_ANALYZER_VERSION, since many journal entries are short
+and repeated ("tired", "ok day"). Bump the version whenever the lexicon or scoring changes: old keys then never match,
+and a persisted cache written under another version is discarded when it is loaded.
+Only surrounding and repeated whitespace is normalised, not case, because VADER scores capitalised words differently.
+"""
+SENTIMENT_ANALYZER_VERSION = "vader-3.3.2"
+
+
+class SentimentCache:
+    def __init__(self, maxsize: int = 10000, path: str = None, version: str = SENTIMENT_ANALYZER_VERSION):
+        self.maxsize = maxsize
+        self.path = path
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+        self._loaded = path is None
+
+    def key(self, text: str) -> str:
+        normalised = " ".join(text.split())
+        return hashlib.blake2b(f"{self.version}\0{normalised}".encode('utf-8'), digest_size=16).hexdigest()
+
+    def get(self, key: str):
+        """Returns (True, score) on a hit and (False, None) on a miss."""
+        self._load()
+        with self._lock:
+            if key in self._scores:
+                self._scores.move_to_end(key)
+                self.hits += 1
+                return True, self._scores[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key: str, score: float):
+        with self._lock:
+            self._scores[key] = score
+            self._scores.move_to_end(key)
+            while len(self._scores) > self.maxsize:
+                self._scores.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._scores), "maxsize": self.maxsize}
+
+    def clear(self):
+        with self._lock:
+            self._scores.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _load(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    saved = json.load(f)
+            except (OSError, ValueError):
+                return
+            if saved.get("version") != self.version:
+                return
+            for key, score in saved.get("scores", [])[-self.maxsize:]:
+                self._scores[key] = score
+
+    def save(self):
+        """Writes the cache to disk, least recently used first, if persistence is configured."""
+        if self.path is None or not self._loaded:
+            return
+        with self._lock:
+            data = {"version": self.version, "scores": list(self._scores.items())}
+        # one temporary file per process, as every worker saves from atexit and they may shut down together
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+
+sentiment_cache = SentimentCache(maxsize=app.config['SENTIMENT_CACHE_SIZE'], path=app.config['SENTIMENT_CACHE_PATH'])
+atexit.register(sentiment_cache.save)
+
+
 """
 Added text from class diagram
 otherwise same as class diagram
@@ -79,12 +310,41 @@ class SentimentAnalysis:
         self.text = text
 
     def performAnalysis(self):
-        if not self.text:
-            self._sentimentScore = None
-        else:
-            sia = SentimentIntensityAnalyzer()
-            scores = sia.polarity_scores(self.text)
-            self._sentimentScore = scores['compound']
+        self._sentimentScore = self.score_many([self.text])[0]
 
     def getScore(self) -> float:
         return self._sentimentScore
+
+    @staticmethod
+    def score_many(texts) -> list:
+        """
+        Scores a batch of texts with the shared analyzer and returns their compound scores in the same order.
+        Texts already in the cache, or repeated within the batch, are only scored once. Empty texts score None.
+        """
+        texts = list(texts)
+        scores = [None] * len(texts)
+        pending = {}
+        for i, text in enumerate(texts):
+            if not text:
+                continue
+            key = sentiment_cache.key(text)
+            if key in pending:
+                # a repeat of a text already being scored is not another cache lookup (or miss)
+                pending[key].append(i)
+                continue
+            found, score = sentiment_cache.get(key)
+            if found:
+                scores[i] = score
+            else:
+                pending[key] = [i]
+        if pending:
+            # imported here as app.metrics uses app.adapter, which imports this module
+            from app.metrics import timer
+            sia = get_analyzer()
+            with timer("sentiment_analysis"):
+                for key, positions in pending.items():
+                    score = sia.polarity_scores(texts[positions[0]])['compound']
+                    sentiment_cache.put(key, score)
+                    for i in positions:
+                        scores[i] = score
+        return scores
@@ -0,0 +1,97 @@
+"""
+Exports Mood_DB history as CSV or NDJSON, for the /export download and `flask export-moods`.
+Rows are read through a streaming cursor (yield_per) and each batch is formatted and handed on as soon as it is read,
+so memory use depends on the batch size, not on how many rows are exported. Optionally the output is gzipped as it goes.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date
+import sqlalchemy as sa
+from app import db
+from app.models import Mood_DB
+
+EXPORT_COLUMNS = [
+    "user_id", "date", "mood", "sentiment_score", "journal_text", "weather",
+    "heart_rate", "step_count", "sleep_quality",
+    "exercise_hours", "lecture_hours", "work_hours", "deadlines",
+]
+# the free-text columns; spreadsheets run a cell starting with one of FORMULA_PREFIXES as a formula
+TEXT_COLUMNS = [EXPORT_COLUMNS.index(column) for column in ("mood", "journal_text", "weather")]
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def export_query(user_id: int = None):
+    """Select of the exported columns, one user's entries (or everyone's), in (user_id, date) index order."""
+    query = sa.select(*(getattr(Mood_DB, column) for column in EXPORT_COLUMNS)).order_by(Mood_DB.user_id, Mood_DB.date)
+    if user_id is not None:
+        query = query.where(Mood_DB.user_id == user_id)
+    return query
+
+
+def iter_row_batches(user_id: int = None, batch_size: int = 1000):
+    """Yields lists of at most batch_size rows from export_query, fetched from the cursor one batch at a time."""
+    result = db.session.execute(export_query(user_id).execution_options(yield_per=batch_size))
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+
+def csv_safe_row(row):
+    """
+    The row with each text value that a spreadsheet would run as a formula prefixed with ', which shows it as text.
+    Journal text is written by students, and cohort exports are opened in spreadsheets.
+    """
+    if not any(isinstance(row[i], str) and row[i].startswith(FORMULA_PREFIXES) for i in TEXT_COLUMNS):
+        return row
+    return ["'" + value if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) else value for value in row]
+
+
+def format_csv(batches):
+    """Yields the CSV header, then one string of CSV lines per batch, with formula-like text made safe (csv_safe_row)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in batches:
+        writer.writerows(map(csv_safe_row, batch))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # the header alone, if there were no rows
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def format_ndjson(batches):
+    """Yields one string of JSON lines per batch, one object per row with dates as ISO strings."""
+    encode = json.JSONEncoder(default=date.isoformat).encode
+    for batch in batches:
+        yield "".join(encode(dict(zip(EXPORT_COLUMNS, row))) + "\n" for row in batch)
+
+
+def gzip_chunks(chunks):
+    """Gzips a stream of strings as it goes, yielding compressed bytes."""
+    compressor = zlib.compressobj(wbits=31)  # 16 + 15: gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_moods(export_format: str = "csv", user_id: int = None, compress: bool = False, batch_size: int = 1000):
+    """
+    Generator of the whole export: str chunks, or bytes if compress is set. user_id None exports every user.
+    Nothing is read from the database until the first chunk is asked for.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {export_format!r}, expected one of {', '.join(EXPORT_FORMATS)}")
+    formatter = format_csv if export_format == "csv" else format_ndjson
+    chunks = formatter(iter_row_batches(user_id, batch_size))
+    return gzip_chunks(chunks) if compress else chunks
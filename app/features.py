@@ -0,0 +1,86 @@
+"""
+Turns Mood_DB rows into the numeric feature matrix used by PredictionModel.
+A row is described by the mood and sentiment of the user's previous entry, that day's wearable readings, the weather
+and the timetable. Rows are fetched with one query and converted column by column into a NumPy array, so building
+features for a whole cohort is a single pass rather than per-user queries.
+Missing values are left as NaN; the model ignores them instead of guessing.
+"""
+import numpy as np
+import sqlalchemy as sa
+from app.models import Mood_DB
+from app.adapter import WEATHER_OPTIONS
+
+MOOD_LIST = [
+    "Happy", "Sad", "Angry", "Excited", "Calm", "Anxious",
+    "Content", "Stressed", "Bored", "Energetic", "Melancholic", "Optimistic"
+]
+
+SMARTWATCH_FIELDS = ["heart_rate", "step_count", "sleep_quality"]
+TIMETABLE_FIELDS = ["exercise_hours", "lecture_hours", "work_hours", "deadlines"]
+FEATURE_NAMES = (
+    [f"previous_mood={mood}" for mood in MOOD_LIST]
+    + ["previous_sentiment"]
+    + SMARTWATCH_FIELDS
+    + [f"weather={weather}" for weather in WEATHER_OPTIONS]
+    + TIMETABLE_FIELDS
+)
+
+
+def feature_query(where):
+    """
+    Select of the columns needed for features, for the Mood_DB rows matching where. The previous entry's mood and
+    sentiment are correlated subqueries, which are answered from the (user_id, date) unique index.
+    """
+    previous = sa.orm.aliased(Mood_DB)
+
+    def previous_entry(column):
+        return (
+            sa.select(column)
+            .where(previous.user_id == Mood_DB.user_id, previous.date < Mood_DB.date)
+            .order_by(previous.date.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+
+    return sa.select(
+        Mood_DB.user_id,
+        Mood_DB.date,
+        Mood_DB.mood,
+        previous_entry(previous.mood).label("previous_mood"),
+        previous_entry(previous.sentiment_score).label("previous_sentiment"),
+        *(getattr(Mood_DB, field) for field in SMARTWATCH_FIELDS),
+        Mood_DB.weather,
+        *(getattr(Mood_DB, field) for field in TIMETABLE_FIELDS),
+    ).where(where)
+
+
+def _one_hot(values: np.ndarray, categories: list) -> np.ndarray:
+    matrix = (values[:, None] == np.array(categories, dtype=object)[None, :]).astype(float)
+    # no value at all is missing information rather than "none of these"
+    matrix[values == None] = np.nan  # noqa: E711, elementwise comparison on an object array
+    return matrix
+
+
+def _numeric(columns: dict, fields: list) -> np.ndarray:
+    # None (no reading) becomes NaN
+    return np.column_stack([columns[field].astype(float) for field in fields])
+
+
+def build_feature_matrix(rows) -> np.ndarray:
+    """Converts rows from feature_query into an (n_rows, len(FEATURE_NAMES)) float array."""
+    if not rows:
+        return np.empty((0, len(FEATURE_NAMES)))
+    columns = {name: np.array(values, dtype=object) for name, values in zip(rows[0]._fields, zip(*rows))}
+    return np.hstack([
+        _one_hot(columns["previous_mood"], MOOD_LIST),
+        _numeric(columns, ["previous_sentiment"]),
+        _numeric(columns, SMARTWATCH_FIELDS),
+        _one_hot(columns["weather"], WEATHER_OPTIONS),
+        _numeric(columns, TIMETABLE_FIELDS),
+    ])
+
+
+def mood_labels(rows) -> np.ndarray:
+    """Index into MOOD_LIST of each row's logged mood, or -1 if it is not one of the twelve moods."""
+    index = {mood: i for i, mood in enumerate(MOOD_LIST)}
+    return np.array([index.get(row.mood, -1) for row in rows], dtype=int)
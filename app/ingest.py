@@ -0,0 +1,154 @@
+"""
+Bulk ingestion of the 5-minute wearable samples devices upload to /api/wearable/samples.
+A whole upload is validated in one pass before the database is touched. Samples from the future, or older than
+WEARABLE_MAX_AGE_DAYS, are rejected, so a device cannot create entries (and streaks, and training data) for days long
+past. Valid samples are merged into the packed block of each day they cover (WearableDay, see app.timeseries); slots
+already stored are kept, so re-uploads are skipped. The daily summary in Mood_DB (average heart rate, total steps, average sleep quality) is recomputed from the
+merged blocks. Everything is one short transaction per upload, so many devices can upload at once: the blocks are
+locked while they are merged (FOR UPDATE, or the write lock on SQLite), and an upload that loses a race to create the
+same day's block is retried.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+import sqlalchemy as sa
+from app import app, db
+from app.database import lock_for_write
+from app.models import Mood_DB, WearableDay
+from app.domain import update_negative_streak
+from app.timeseries import SAMPLE_INTERVAL_MINUTES, empty_day, decode_day, encode_day, merge_samples, summarise_series
+
+# field -> (type, lowest, highest) accepted for one 5-minute sample
+SAMPLE_FIELDS = {
+    "heart_rate": (int, 20, 250),
+    "steps": (int, 0, 5000),
+    "sleep_quality": (float, 0.0, 10.0),
+}
+# times an upload is retried after losing a race with another upload creating the same day
+INGEST_ATTEMPTS = 3
+
+
+def parse_sample(sample, now: datetime, oldest: datetime) -> dict:
+    """Checks one uploaded sample and returns it as a row of its readings. Raises ValueError."""
+    if not isinstance(sample, dict):
+        raise ValueError("sample must be an object")
+    try:
+        recorded_at = datetime.fromisoformat(sample["recorded_at"])
+    except KeyError:
+        raise ValueError("recorded_at is required")
+    except (TypeError, ValueError):
+        raise ValueError("recorded_at must be an ISO 8601 date and time")
+    if recorded_at.tzinfo is not None:
+        # stored in server local time, like Mood_DB dates
+        recorded_at = recorded_at.astimezone().replace(tzinfo=None)
+    if recorded_at > now + timedelta(minutes=SAMPLE_INTERVAL_MINUTES):
+        raise ValueError("recorded_at is in the future")
+    if recorded_at < oldest:
+        raise ValueError(f"recorded_at is more than {(now - oldest).days} days ago")
+    # samples are per 5-minute slot, so a slot uploaded twice with slightly different times is still one sample
+    row = {"recorded_at": recorded_at.replace(minute=recorded_at.minute - recorded_at.minute % SAMPLE_INTERVAL_MINUTES,
+                                              second=0, microsecond=0)}
+    for field, (kind, lowest, highest) in SAMPLE_FIELDS.items():
+        value = sample.get(field)
+        if value is not None:
+            if isinstance(value, bool) or not isinstance(value, (int, float) if kind is float else int):
+                raise ValueError(f"{field} must be {'a number' if kind is float else 'an integer'}")
+            if not lowest <= value <= highest:
+                raise ValueError(f"{field} must be between {lowest} and {highest}")
+        row[field] = value
+    if all(row[field] is None for field in SAMPLE_FIELDS):
+        raise ValueError("sample has no readings")
+    return row
+
+
+def validate_samples(samples: list, now: datetime = None, max_age_days: int = None):
+    """
+    Returns (rows, rejected): the valid samples as rows, one per 5-minute slot (the last upload of a slot wins), and
+    [{"index": i, "error": message}] for the invalid ones. Samples more than max_age_days (default
+    WEARABLE_MAX_AGE_DAYS) old are invalid.
+    """
+    now = now or datetime.now()
+    if max_age_days is None:
+        max_age_days = app.config['WEARABLE_MAX_AGE_DAYS']
+    oldest = now - timedelta(days=max_age_days)
+    rows, rejected = {}, []
+    for index, sample in enumerate(samples):
+        try:
+            row = parse_sample(sample, now, oldest)
+        except ValueError as error:
+            rejected.append({"index": index, "error": str(error)})
+            continue
+        rows[row["recorded_at"]] = row
+    return list(rows.values()), rejected
+
+
+def store_samples(user_id: int, rows: list) -> dict:
+    """
+    Merges rows into the user's blocks for the days they fall on, creating blocks as needed.
+    Returns {day: (arrays of the merged day, number of samples newly stored)}.
+    """
+    rows_by_day = defaultdict(list)
+    for row in rows:
+        rows_by_day[row["recorded_at"].date()].append(row)
+    # locked until commit, so concurrent uploads for a day wait for each other rather than overwrite each other
+    lock_for_write(db.session)
+    blocks = {block.date: block for block in WearableDay.query.filter(
+        WearableDay.user_id == user_id, WearableDay.date.in_(list(rows_by_day))).with_for_update()}
+    stored = {}
+    for day, day_rows in sorted(rows_by_day.items()):
+        block = blocks.get(day)
+        series = decode_day(block.samples) if block else empty_day()
+        added = merge_samples(series, day_rows)
+        if added:
+            if block is None:
+                block = WearableDay(user_id=user_id, date=day)
+                db.session.add(block)
+            block.samples = encode_day(series, compress=app.config['WEARABLE_COMPRESS_BLOCKS'])
+        stored[day] = (series, added)
+    return stored
+
+
+def summarise_days(user_id: int, series_by_day: dict) -> dict:
+    """
+    Sets the wearable columns of the user's Mood_DB row for each day from that day's arrays, creating the row if
+    needed. Returns {day: (heart_rate, step_count, sleep_quality)}.
+    """
+    summaries = {day: summarise_series(series) for day, series in series_by_day.items()}
+    records = {record.date: record for record in Mood_DB.query.filter(Mood_DB.user_id == user_id,
+                                                                       Mood_DB.date.in_(list(summaries)))}
+    for day, (heart_rate, step_count, sleep_quality) in sorted(summaries.items()):
+        record = records.get(day)
+        is_new = record is None
+        if is_new:
+            record = Mood_DB(user_id=user_id, date=day)
+            db.session.add(record)
+        record.heart_rate, record.step_count, record.sleep_quality = heart_rate, step_count, sleep_quality
+        if is_new:
+            # a new day's row is a new entry for the distress streak
+            update_negative_streak(record)
+    return summaries
+
+
+def ingest_samples(user_id: int, samples: list) -> dict:
+    """Validates, stores and summarises one upload, and commits. Returns counts and the rejected samples."""
+    rows, rejected = validate_samples(samples)
+    for attempt in range(INGEST_ATTEMPTS):
+        try:
+            stored = store_samples(user_id, rows)
+            inserted = sum(added for _, added in stored.values())
+            changed = {day: series for day, (series, added) in stored.items() if added}
+            if changed:
+                summarise_days(user_id, changed)
+            db.session.commit()
+            break
+        except sa.exc.IntegrityError:
+            # another upload created one of these days' blocks (or Mood_DB rows) first; merge into it instead
+            db.session.rollback()
+            if attempt == INGEST_ATTEMPTS - 1:
+                raise
+    return {
+        "accepted": len(rows),
+        "stored": inserted,
+        "duplicates": len(rows) - inserted,
+        "rejected": rejected,
+        "days": [day.isoformat() for day in sorted(stored)],
+    }
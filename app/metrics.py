@@ -0,0 +1,205 @@
+"""
+Opt-in instrumentation (METRICS_ENABLED), served in Prometheus text format from /metrics.
+When enabled, Flask's request signals time every request by endpoint and SQLAlchemy's cursor events time every SQL
+statement by kind (SELECT, INSERT, ...), counted per endpoint; code that wants a section timed wraps it in timer(name)
+(sentiment analysis and prediction do). The caches and the external API latencies, which keep their own counts, are
+read when /metrics is scraped, only by scrapers sending METRICS_TOKEN as a bearer token: the endpoints, SQL and timings
+say a lot about the app's internals, so without METRICS_TOKEN /metrics refuses everyone. Recording is a clock read and
+a bucket increment under a lock, so it can stay on in production. Nothing is registered when it is disabled, and
+timer() is then a no-op.
+"""
+import hmac
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+import sqlalchemy as sa
+from flask import Response, abort, current_app, g, has_request_context, request, request_finished, request_started
+from app.adapter import LatencyHistogram
+
+# request and section timings use LatencyHistogram's buckets; SQL statements are mostly far quicker
+SQL_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+STATEMENTS_PER_REQUEST_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Metrics:
+    """Everything recorded since start-up. Histograms are created on first use, one per label set."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)      # (endpoint, method, status) -> count
+        self.request_latency = {}             # (endpoint, method) -> LatencyHistogram
+        self.request_statements = {}          # endpoint -> LatencyHistogram of statements per request
+        self.sql_statements = defaultdict(int)  # (endpoint, operation) -> count
+        self.sql_latency = {}                 # operation -> LatencyHistogram
+        self.sections = {}                    # timer name -> LatencyHistogram
+
+    def histogram(self, family: dict, key, buckets=None) -> LatencyHistogram:
+        histogram = family.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = family.setdefault(key, LatencyHistogram(buckets))
+        return histogram
+
+    def count(self, family: defaultdict, key):
+        with self._lock:
+            family[key] += 1
+
+    def copy(self) -> dict:
+        """Copies of the families, safe to read while requests keep recording."""
+        with self._lock:
+            return {name: dict(family) for name, family in vars(self).items() if isinstance(family, dict)}
+
+    def clear(self):
+        self.__init__()
+
+
+metrics = Metrics()
+enabled = False
+
+
+class SectionTimer:
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        metrics.histogram(metrics.sections, self.name).observe(time.perf_counter() - self.started)
+
+
+def timer(name: str):
+    """Context manager timing a section of code as name, when metrics are enabled."""
+    return SectionTimer(name) if enabled else nullcontext()
+
+
+def request_endpoint() -> str:
+    return (request.endpoint or "unmatched") if has_request_context() else "background"
+
+
+def on_request_started(sender, **extra):
+    g.metrics_started = time.perf_counter()
+    g.metrics_statements = 0
+
+
+def on_request_finished(sender, response, **extra):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return
+    endpoint = request_endpoint()
+    metrics.histogram(metrics.request_latency, (endpoint, request.method)).observe(time.perf_counter() - started)
+    metrics.histogram(metrics.request_statements, endpoint, STATEMENTS_PER_REQUEST_BUCKETS).observe(
+        g.pop('metrics_statements', 0))
+    metrics.count(metrics.requests, (endpoint, request.method, response.status_code))
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['metrics_started'].pop()
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    metrics.histogram(metrics.sql_latency, operation, SQL_BUCKETS).observe(elapsed)
+    metrics.count(metrics.sql_statements, (request_endpoint(), operation))
+    if has_request_context() and 'metrics_statements' in g:
+        g.metrics_statements += 1
+
+
+def handle_error(exception_context):
+    # a failed statement never reaches after_cursor_execute
+    started = exception_context.connection.info.get('metrics_started') if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def labels(**values) -> str:
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in values.items()) + "}" if values else ""
+
+
+def histogram_lines(name: str, histograms: dict, label_names) -> list:
+    lines = []
+    for key, histogram in sorted(histograms.items(), key=lambda item: str(item[0])):
+        label_values = dict(zip(label_names, key if isinstance(key, tuple) else (key,)))
+        snapshot = histogram.snapshot()
+        for bound, count in snapshot["buckets"].items():
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{labels(**label_values, le=le)} {count}")
+        lines.append(f"{name}_sum{labels(**label_values)} {snapshot['sum']}")
+        lines.append(f"{name}_count{labels(**label_values)} {snapshot['count']}")
+    return lines
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    from app.adapter import source_latency
+    from app.controller import weather_cache
+    from app.domain import sentiment_cache
+
+    recorded, sources = metrics.copy(), dict(source_latency)
+    families = [
+        ("unimind_requests_total", "counter", "Requests handled, by endpoint, method and status.",
+         [f"unimind_requests_total{labels(endpoint=e, method=m, status=s)} {n}"
+          for (e, m, s), n in sorted(recorded['requests'].items(), key=str)]),
+        ("unimind_request_duration_seconds", "histogram", "Time to handle a request, by endpoint and method.",
+         histogram_lines("unimind_request_duration_seconds", recorded['request_latency'], ("endpoint", "method"))),
+        ("unimind_request_sql_statements", "histogram", "SQL statements sent while handling a request.",
+         histogram_lines("unimind_request_sql_statements", recorded['request_statements'], ("endpoint",))),
+        ("unimind_sql_statements_total", "counter", "SQL statements executed, by endpoint and kind.",
+         [f"unimind_sql_statements_total{labels(endpoint=e, operation=o)} {n}"
+          for (e, o), n in sorted(recorded['sql_statements'].items())]),
+        ("unimind_sql_duration_seconds", "histogram", "Time to execute a SQL statement, by kind.",
+         histogram_lines("unimind_sql_duration_seconds", recorded['sql_latency'], ("operation",))),
+        ("unimind_section_duration_seconds", "histogram",
+         "Time spent in timed sections (sentiment analysis, prediction).",
+         histogram_lines("unimind_section_duration_seconds", recorded['sections'], ("section",))),
+        ("unimind_external_api_duration_seconds", "histogram", "Latency of each external data source.",
+         histogram_lines("unimind_external_api_duration_seconds", sources, ("source",))),
+        ("unimind_external_api_failures_total", "counter", "External data source calls that timed out or failed.",
+         [line for source, histogram in sorted(sources.items()) for line in (
+             f"unimind_external_api_failures_total{labels(source=source, reason='timeout')} {histogram.timeouts}",
+             f"unimind_external_api_failures_total{labels(source=source, reason='error')} {histogram.errors}")]),
+    ]
+    sentiment, weather = sentiment_cache.stats(), weather_cache.stats()
+    families += [
+        ("unimind_cache_lookups_total", "counter", "Cache lookups, by cache and result.",
+         [f"unimind_cache_lookups_total{labels(cache='sentiment', result='hit')} {sentiment['hits']}",
+          f"unimind_cache_lookups_total{labels(cache='sentiment', result='miss')} {sentiment['misses']}",
+          f"unimind_cache_lookups_total{labels(cache='weather', result='hit')} {weather['hits']}",
+          f"unimind_cache_lookups_total{labels(cache='weather', result='miss')} {weather['misses']}",
+          f"unimind_cache_lookups_total{labels(cache='weather', result='coalesced')} {weather['coalesced']}"]),
+        ("unimind_cache_entries", "gauge", "Entries held by the sentiment score cache.",
+         [f"unimind_cache_entries{labels(cache='sentiment')} {sentiment['size']}"]),
+    ]
+    lines = []
+    for name, kind, help_text, samples in families:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", *samples]
+    return "\n".join(lines) + "\n"
+
+
+def init_metrics(app, db):
+    """Turns instrumentation on for app and its database and adds the /metrics route. Call before the first request."""
+    global enabled
+    enabled = True
+    if not app.config['METRICS_TOKEN']:
+        app.logger.warning("METRICS_TOKEN is not set, so /metrics will refuse every scrape")
+    request_started.connect(on_request_started, app)
+    request_finished.connect(on_request_finished, app)
+    with app.app_context():
+        sa.event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        sa.event.listen(db.engine, "after_cursor_execute", after_cursor_execute)
+        sa.event.listen(db.engine, "handle_error", handle_error)
+    app.add_url_rule('/metrics', endpoint='metrics', view_func=metrics_view)
+
+
+def metrics_view():
+    # scrapers send the token as a bearer token; with none configured nobody may read the metrics
+    token = current_app.config['METRICS_TOKEN']
+    if not token or not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        abort(403)
+    return Response(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
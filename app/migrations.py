@@ -0,0 +1,90 @@
+"""
+Keeps existing databases in step with the models.
+db.create_all only creates tables that are missing, so a column or index added to a model after the database
+was first created would never appear. upgrade_schema adds those, and runs on every start-up.
+When adding a column needs existing rows to be filled in, the function that does it is listed in DATA_MIGRATIONS
+and runs once, straight after the column is added.
+"""
+import re
+import sqlalchemy as sa
+from app import db
+from app.models import Mood_DB, bump_mood_data_versions
+
+# The formats Mood_DB.smartwatch_data and Mood_DB.timetable were written in before the typed columns existed
+SMARTWATCH_PATTERN = re.compile(r"HR:\s*(\d+),\s*Steps:\s*(\d+),\s*SQ:\s*([\d.]+)")
+TIMETABLE_PATTERN = re.compile(r"Exercise H:\s*(\d+),\s*Lecture H:\s*(\d+),\s*Work H:\s*(\d+),\s*Num Deadlines:\s*(\d+)")
+
+
+def parse_legacy_text_columns(connection, chunk_size: int = 5000) -> int:
+    """
+    Fills the typed wearable and timetable columns of Mood_DB from the old smartwatch_data and timetable strings.
+    Rows are read in id order, chunk_size at a time, and written back with one executemany UPDATE per chunk.
+    Returns the number of rows updated.
+    """
+    table = Mood_DB.__table__
+    select_chunk = (
+        sa.select(table.c.id, table.c.smartwatch_data, table.c.timetable)
+        .where(table.c.id > sa.bindparam('last_id'),
+               sa.or_(table.c.smartwatch_data.is_not(None), table.c.timetable.is_not(None)))
+        .order_by(table.c.id)
+        .limit(chunk_size)
+    )
+    # the remaining keys of each parameter dict become the SET clause
+    update_row = table.update().where(table.c.id == sa.bindparam('row_id'))
+    last_id, updated = 0, 0
+    while True:
+        rows = connection.execute(select_chunk, {'last_id': last_id}).all()
+        if not rows:
+            if updated:
+                bump_mood_data_versions(connection)
+            return updated
+        parameters = []
+        for row in rows:
+            wearable = SMARTWATCH_PATTERN.search(row.smartwatch_data or "")
+            timetable = TIMETABLE_PATTERN.search(row.timetable or "")
+            if not wearable and not timetable:
+                continue
+            heart_rate, step_count, sleep_quality = wearable.groups() if wearable else (None, None, None)
+            exercise, lecture, work, deadlines = timetable.groups() if timetable else (None, None, None, None)
+            parameters.append({
+                'row_id': row.id,
+                'heart_rate': heart_rate and int(heart_rate),
+                'step_count': step_count and int(step_count),
+                'sleep_quality': sleep_quality and float(sleep_quality),
+                'exercise_hours': exercise and int(exercise),
+                'lecture_hours': lecture and int(lecture),
+                'work_hours': work and int(work),
+                'deadlines': deadlines and int(deadlines),
+            })
+        if parameters:
+            connection.execute(update_row, parameters)
+            updated += len(parameters)
+        last_id = rows[-1].id
+
+
+# (table name, column name) -> function run once with the connection when that column is first added
+DATA_MIGRATIONS = {
+    ('mood_db', 'heart_rate'): parse_legacy_text_columns,
+}
+
+
+def upgrade_schema():
+    inspector = sa.inspect(db.engine)
+    preparer = db.engine.dialect.identifier_preparer
+    with db.engine.begin() as connection:
+        added = []
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_ddl = sa.schema.CreateColumn(column).compile(dialect=db.engine.dialect)
+                connection.execute(sa.text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {column_ddl}"))
+                added.append((table.name, column.name))
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+        for key in added:
+            if key in DATA_MIGRATIONS:
+                DATA_MIGRATIONS[key](connection)
@@ -4,7 +4,7 @@ import sqlalchemy.orm as so
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db, login
-from datetime import datetime
+from datetime import datetime, timezone
 
 
 """
@@ -20,6 +20,10 @@ class User(UserMixin, db.Model):
     time_zone: so.Mapped[str] = so.mapped_column(sa.String(20), nullable=False, default="GMT")
     diagnostics: so.Mapped[Optional[str]] = so.mapped_column(sa.String(256))
     password_hash: so.Mapped[Optional[str]] = so.mapped_column(sa.String(256))
+    # Bumped whenever any of the user's Mood_DB rows change (see bump_mood_data_versions below), so pages built from
+    # them can be revalidated from this row alone. data_updated_at is UTC.
+    data_version: so.Mapped[int] = so.mapped_column(default=0, server_default='0')
+    data_updated_at: so.Mapped[Optional[datetime]] = so.mapped_column(sa.DateTime)
 
     def __repr__(self):
         return f'User(id={self.id}, username={self.username}, email={self.email})'
@@ -54,18 +58,159 @@ class EmergencyContact(db.Model):
 # Existing MoodEntry model for daily data logging
 class Mood_DB(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, default=1)  # For prototype, assume a single user
-    date = db.Column(db.Date, default=lambda: datetime.now().date())  # Only the date portion
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), default=1)  # For prototype, assume a single user
+    date = db.Column(db.Date, default=lambda: datetime.now().date(), index=True)  # Only the date portion
     mood = db.Column(db.String(20), nullable=True)
     sentiment_score = db.Column(db.Float, nullable=True)
-    smartwatch_data = db.Column(db.String(50), nullable=True)
+    journal_text = db.Column(db.String(200), nullable=True)  # FR3 caps journal entries at 200 characters
     weather = db.Column(db.String(50), nullable=True)
+    # Wearable readings for the day
+    heart_rate = db.Column(db.Integer, nullable=True)  # average beats per minute
+    step_count = db.Column(db.Integer, nullable=True)
+    sleep_quality = db.Column(db.Float, nullable=True)
+    # Timetable from the monthly report
+    exercise_hours = db.Column(db.Integer, nullable=True)
+    lecture_hours = db.Column(db.Integer, nullable=True)
+    work_hours = db.Column(db.Integer, nullable=True)
+    deadlines = db.Column(db.Integer, nullable=True)
+    # Legacy text versions of the columns above ("HR: x, Steps: y,SQ: z" and "Exercise H: ..."). No longer written;
+    # older rows are parsed into the typed columns by app.migrations.parse_legacy_text_columns.
+    smartwatch_data = db.Column(db.String(50), nullable=True)
     timetable = db.Column(db.String(50), nullable=True)
 
+    # Also serves every query that filters on user_id alone (e.g. the /data listing, ordered by date), so there is no
+    # separate user_id index. tests/test_query_plans.py checks the hot queries keep using it.
     __table_args__ = (db.UniqueConstraint('user_id', 'date', name='unique_user_date'),)
 
     def __repr__(self):
         return f"<MoodEntry {self.date} - {self.mood}>"
 
 
+"""
+Running count of each user's consecutive negative entries, kept up to date whenever a mood or sentiment score is
+stored (see app.domain.update_negative_streak) so the distress check is a primary-key lookup instead of a query over
+the last 7 entries. Entries are counted, not calendar days, matching DistressAlert.
+negative_days_before is the streak up to, but not including, the entry on last_entry_date; keeping it separate means
+today's entry can change (mood at 6pm, journal afterwards) without losing the count before it.
+"""
+class MoodStreak(db.Model):
+    user_id = db.Column(db.Integer, primary_key=True)
+    last_entry_date = db.Column(db.Date, nullable=True)
+    last_entry_negative = db.Column(db.Boolean, nullable=False, default=False)
+    negative_days_before = db.Column(db.Integer, nullable=False, default=0)
+
+    @property
+    def negative_days(self) -> int:
+        """Consecutive negative entries up to and including the latest one."""
+        return self.negative_days_before + 1 if self.last_entry_negative else 0
+
+    def __repr__(self):
+        return f"<MoodStreak user {self.user_id}: {self.negative_days} negative up to {self.last_entry_date}>"
+
+
+"""
+Users found at risk by the nightly cohort-wide distress scan (DistressAlert.scan_cohort), one row per user per scan
+date, for the wellbeing team to follow up.
+"""
+class CohortAlert(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    scan_date = db.Column(db.Date, nullable=False, index=True)
+    last_entry_date = db.Column(db.Date, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'scan_date', name='unique_user_scan_date'),)
+
+    def __repr__(self):
+        return f"<CohortAlert user {self.user_id} on {self.scan_date}>"
+
+
+"""
+Wearable readings uploaded by devices every 5 minutes through the /api/wearable/samples endpoint (app.ingest), one row
+per user per day. samples is that day's readings packed into one binary block of fixed-width arrays (see
+app.timeseries), rather than a row per sample. Mood_DB keeps the daily summary computed from them.
+"""
+class WearableDay(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    samples = db.Column(db.LargeBinary, nullable=False)
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'date', name='unique_user_wearable_day'),)
+
+    def __repr__(self):
+        return f"<WearableDay user {self.user_id} on {self.date}>"
+
+
+"""
+Keeps User.data_version and data_updated_at in step with Mood_DB. Rows changed through the ORM bump their own users'
+versions when flushed; bulk INSERT/UPDATE/DELETE statements on Mood_DB bump the users whose rows they touch, found from
+an INSERT's rows, from the ids of a bulk UPDATE/DELETE by primary key, or from a statement's WHERE clause before it
+runs, and every user only when none of those tell. Code writing to mood_db through a plain connection calls
+bump_mood_data_versions itself.
+"""
+def bump_mood_data_versions(connection, user_ids=None):
+    """Bumps the data version of the given users, or of every user if user_ids is None."""
+    statement = sa.update(User.__table__).values(
+        data_version=User.__table__.c.data_version + 1,
+        data_updated_at=datetime.now(timezone.utc).replace(tzinfo=None),
+    )
+    if user_ids is not None:
+        if not user_ids:
+            return
+        statement = statement.where(User.__table__.c.id.in_(user_ids))
+    connection.execute(statement)
+
+
+@sa.event.listens_for(so.Session, 'after_flush')
+def _bump_after_flush(session, flush_context):
+    # new, dirty and deleted still describe what was just flushed
+    changed = [obj for obj in session.new | session.deleted if isinstance(obj, Mood_DB)]
+    changed += [obj for obj in session.dirty if isinstance(obj, Mood_DB) and session.is_modified(obj)]
+    user_ids = {obj.user_id for obj in changed}
+    if user_ids:
+        bump_mood_data_versions(session.connection(), user_ids)
+
+
+def _bulk_statement_user_ids(orm_execute_state):
+    """
+    The users whose Mood_DB rows a bulk statement is about to change (so called before it runs, while deleted rows are
+    still there), or None when that cannot be told.
+    """
+    table = Mood_DB.__table__
+    parameters = orm_execute_state.parameters
+    rows = parameters if isinstance(parameters, list) else [parameters] if parameters else []
+    if orm_execute_state.is_insert:
+        # 1 is the Mood_DB.user_id default
+        return {row.get('user_id', 1) for row in rows} if rows else None
+    connection = orm_execute_state.session.connection()
+    if isinstance(parameters, list):
+        # a bulk UPDATE/DELETE by primary key, one parameter set per row
+        if not all('id' in row for row in rows):
+            return None
+        ids = [row['id'] for row in rows]
+        user_ids = set()
+        for start in range(0, len(ids), 500):
+            user_ids.update(connection.scalars(
+                sa.select(table.c.user_id).where(table.c.id.in_(ids[start:start + 500])).distinct()))
+        # rows moved to another user change that user's history too
+        return user_ids | {row['user_id'] for row in rows if 'user_id' in row}
+    statement = orm_execute_state.statement
+    changed_columns = {getattr(column, 'key', column) for column in getattr(statement, '_values', None) or {}}
+    if statement.whereclause is None or 'user_id' in changed_columns:
+        return None
+    return set(connection.scalars(
+        sa.select(table.c.user_id).where(statement.whereclause).distinct(), parameters or {}))
+
 
+@sa.event.listens_for(so.Session, 'do_orm_execute')
+def _bump_after_bulk_statement(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not Mood_DB:
+        return
+    user_ids = _bulk_statement_user_ids(orm_execute_state)
+    result = orm_execute_state.invoke_statement()
+    bump_mood_data_versions(orm_execute_state.session.connection(), user_ids)
+    return result
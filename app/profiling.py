@@ -0,0 +1,117 @@
+"""
+Opt-in profiling of single requests (PROFILING_ENABLED), for finding where the time goes when one endpoint is slow in
+production. A request is profiled when it carries a profiling token, in the X-Profile header or the ?profile= query
+parameter, or when it is picked at random at PROFILING_SAMPLE_RATE. Tokens are signed with PROFILING_SECRET (not the
+SECRET_KEY, which has a default anyone can read in this repository) and expire after PROFILING_TOKEN_MAX_AGE seconds,
+so only an administrator able to run `flask profile-token` on the server can make one; a token may be limited to one
+endpoint. Without PROFILING_SECRET every token is refused. The request runs under cProfile, from before the login and
+prompt checks to the finished response (a streamed body is not included), and the stats are written to
+PROFILING_DIRECTORY as <time>-<endpoint>-<method>-<status>-<duration>ms.prof, for pstats or snakeviz. Only the newest
+PROFILING_MAX_FILES are kept. Nothing is registered when it is disabled.
+"""
+import cProfile
+import os
+import random
+import time
+from datetime import datetime
+from flask import g, request, request_finished, request_started, request_tearing_down
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY_PARAMETER = "profile"
+TOKEN_SALT = "unimind-request-profile"
+
+
+def token_serializer(app) -> URLSafeTimedSerializer:
+    return URLSafeTimedSerializer(app.config['PROFILING_SECRET'], salt=TOKEN_SALT)
+
+
+def make_profile_token(app, endpoint: str = None) -> str:
+    """
+    A token that has requests profiled (only those to endpoint, if given) for PROFILING_TOKEN_MAX_AGE seconds.
+    Raises ValueError when PROFILING_SECRET is not set.
+    """
+    if not app.config['PROFILING_SECRET']:
+        raise ValueError("PROFILING_SECRET must be set to make profiling tokens")
+    return token_serializer(app).dumps({"endpoint": endpoint})
+
+
+def token_allows(app, token: str, endpoint: str) -> bool:
+    if not app.config['PROFILING_SECRET']:
+        return False
+    try:
+        # an expired token raises SignatureExpired, a kind of BadSignature
+        claims = token_serializer(app).loads(token, max_age=app.config['PROFILING_TOKEN_MAX_AGE'])
+    except BadSignature:
+        return False
+    return claims.get("endpoint") in (None, endpoint)
+
+
+def should_profile(app) -> bool:
+    token = request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_QUERY_PARAMETER)
+    if token:
+        if token_allows(app, token, request.endpoint):
+            return True
+        app.logger.warning("Ignoring a profiling token that is invalid, expired or for another endpoint: %s %s",
+                           request.method, request.path)
+    rate = app.config['PROFILING_SAMPLE_RATE']
+    return rate > 0 and random.random() < rate
+
+
+def on_request_started(sender, **extra):
+    if not should_profile(sender):
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # another profiler is already running (newer Pythons allow only one per process)
+        sender.logger.warning("Not profiling %s %s: another profiler is running", request.method, request.path)
+        return
+    g.profiler = profiler
+    g.profile_started = time.perf_counter()
+
+
+def on_request_finished(sender, response, **extra):
+    finish_profile(sender, response.status_code)
+
+
+def on_request_tearing_down(sender, exc=None, **extra):
+    # a request that raised never reaches request_finished
+    finish_profile(sender, "error")
+
+
+def finish_profile(app, outcome):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return
+    profiler.disable()
+    elapsed_ms = (time.perf_counter() - g.pop('profile_started')) * 1000
+    directory = app.config['PROFILING_DIRECTORY']
+    os.makedirs(directory, exist_ok=True)
+    name = (f"{datetime.now():%Y%m%d-%H%M%S-%f}-{request.endpoint or 'unmatched'}-{request.method}-{outcome}-"
+            f"{elapsed_ms:.0f}ms.prof")
+    path = os.path.join(directory, name)
+    profiler.dump_stats(path)
+    app.logger.info("Profiled %s %s (%.0fms) to %s", request.method, request.path, elapsed_ms, path)
+    remove_old_profiles(directory, app.config['PROFILING_MAX_FILES'])
+
+
+def remove_old_profiles(directory: str, keep: int):
+    """Deletes all but the newest keep .prof files in directory (their names start with the time they were made)."""
+    names = sorted(name for name in os.listdir(directory) if name.endswith(".prof"))
+    for name in names[:max(len(names) - keep, 0)]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            # another worker removed it first
+            pass
+
+
+def init_profiling(app):
+    """Turns per-request profiling on for app. Call before the first request."""
+    if not app.config['PROFILING_SECRET']:
+        app.logger.warning("PROFILING_SECRET is not set, so profiling tokens will be refused")
+    request_started.connect(on_request_started, app)
+    request_finished.connect(on_request_finished, app)
+    request_tearing_down.connect(on_request_tearing_down, app)
@@ -0,0 +1,108 @@
+"""
+Debug/test check on the SQL each request sends (QUERY_BUDGET_MODE, off by default).
+Every statement a request executes is recorded with the line of app code that caused it. When the request finishes:
+- a route declared with @query_budget(n) that sent more than n statements is reported, as 'warn' (logged) or 'raise'
+  (QueryBudgetExceeded, which fails the test);
+- the same statement sent twice with the same parameters, and relationships loaded lazily (the N+1 pattern, e.g.
+  user.emergency_contact after User.query.get), are logged as warnings either way.
+Finding the call site walks the stack on every statement, so this is for development and tests, not production.
+"""
+import os
+import sys
+from collections import Counter
+from flask import current_app, g, has_request_context, request, request_finished, request_started
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+
+QUERY_BUDGET_MODES = ("off", "warn", "raise")
+APP_DIRECTORY = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(max_statements: int):
+    """Declares the most SQL statements one request to the decorated view may send. Put it right under @app.route."""
+    def decorator(view):
+        view.query_budget = max_statements
+        return view
+    return decorator
+
+
+def call_site() -> str:
+    """'app/module.py:line in function' of the innermost app code on the stack, outside this module."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_DIRECTORY) and filename != __file__:
+            return f"app/{filename[len(APP_DIRECTORY):]}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "outside app code"
+
+
+def on_request_started(sender, **extra):
+    g.query_log = []
+    g.lazy_loads = []
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'query_log' in g:
+        g.query_log.append((statement, repr(parameters), call_site()))
+
+
+def do_orm_execute(orm_execute_state):
+    if not (orm_execute_state.is_select and has_request_context() and 'lazy_loads' in g):
+        return
+    if orm_execute_state.lazy_loaded_from is not None:
+        path = orm_execute_state.loader_strategy_path
+        relationship = path[-1].key if path else "?"
+        g.lazy_loads.append((f"{orm_execute_state.lazy_loaded_from.class_.__name__}.{relationship}", call_site()))
+
+
+def request_report(query_log, lazy_loads, budget) -> list:
+    """Lines describing what went wrong in a request, the first saying whether it was over budget."""
+    lines = []
+    if budget is not None and len(query_log) > budget:
+        lines.append(f"{len(query_log)} SQL statements, over the budget of {budget}:")
+        lines += [f"  {site}: {' '.join(statement.split())[:120]}" for statement, _, site in query_log]
+    repeated = Counter((statement, parameters) for statement, parameters, _ in query_log)
+    for (statement, parameters), count in repeated.items():
+        if count > 1:
+            sites = sorted({site for s, p, site in query_log if (s, p) == (statement, parameters)})
+            lines.append(f"repeated {count} times: {' '.join(statement.split())[:120]} {parameters[:80]} "
+                         f"from {', '.join(sites)}")
+    for relationship, site in lazy_loads:
+        lines.append(f"lazy load of {relationship} from {site}")
+    return lines
+
+
+def on_request_finished(sender, response, **extra):
+    query_log, lazy_loads = g.pop('query_log', None), g.pop('lazy_loads', [])
+    if query_log is None:
+        return
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', None)
+    lines = request_report(query_log, lazy_loads, budget)
+    if not lines:
+        return
+    message = f"{request.method} {request.path} ({request.endpoint}): " + "\n".join(lines)
+    over_budget = budget is not None and len(query_log) > budget
+    if over_budget and current_app.config['QUERY_BUDGET_MODE'] == "raise":
+        raise QueryBudgetExceeded(message)
+    current_app.logger.warning(message)
+
+
+def init_query_budget(app, db):
+    """Turns the check on for app and its database. Call before the first request."""
+    if app.config['QUERY_BUDGET_MODE'] not in QUERY_BUDGET_MODES:
+        raise ValueError(f"Unknown QUERY_BUDGET_MODE {app.config['QUERY_BUDGET_MODE']!r}, "
+                         f"expected one of {', '.join(QUERY_BUDGET_MODES)}")
+    if app.config['QUERY_BUDGET_MODE'] == "raise":
+        # so a request over budget fails the test that made it, rather than becoming a 500 page
+        app.config['PROPAGATE_EXCEPTIONS'] = True
+    request_started.connect(on_request_started, app)
+    request_finished.connect(on_request_finished, app)
+    with app.app_context():
+        sa.event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    sa.event.listen(so.Session, "do_orm_execute", do_orm_execute)
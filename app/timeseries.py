@@ -0,0 +1,111 @@
+"""
+Packed storage of a user's wearable samples for one day (see models.WearableDay).
+A day is 288 five-minute slots, and each WearableData reading is kept as a fixed-width array with one value per slot:
+heart rate as uint8 bpm, steps as uint16, sleep quality as uint8 tenths. An empty slot holds the field's MISSING value.
+Each array is stored as the differences between neighbouring slots (which wrap around within the type, so decoding is
+an exact cumulative sum), which makes steady readings runs of small numbers that zlib compresses well. A block is
+about 1.2 KB uncompressed, a few hundred bytes compressed, against one database row per sample otherwise.
+Blocks are decoded with np.frombuffer over a memoryview of the stored bytes, so nothing is copied before the sum.
+"""
+import struct
+import zlib
+from datetime import datetime, timedelta
+import numpy as np
+
+SAMPLE_INTERVAL_MINUTES = 5
+SLOTS_PER_DAY = 24 * 60 // SAMPLE_INTERVAL_MINUTES
+# field -> (array type, stored units per unit, value of an empty slot), in block order
+BLOCK_FIELDS = {
+    "heart_rate": (np.dtype("u1"), 1, 0),
+    "steps": (np.dtype("<u2"), 1, 0xFFFF),
+    "sleep_quality": (np.dtype("u1"), 10, 0xFF),
+}
+# version, flags
+BLOCK_HEADER = struct.Struct("<BB")
+BLOCK_VERSION = 1
+FLAG_COMPRESSED = 1
+
+
+def empty_day() -> dict:
+    """Arrays for a day with no samples: field -> SLOTS_PER_DAY empty values."""
+    return {field: np.full(SLOTS_PER_DAY, missing, dtype=dtype) for field, (dtype, _, missing) in BLOCK_FIELDS.items()}
+
+
+def slot_of(recorded_at: datetime) -> int:
+    return (recorded_at.hour * 60 + recorded_at.minute) // SAMPLE_INTERVAL_MINUTES
+
+
+def filled_slots(series: dict) -> np.ndarray:
+    """Boolean array of the slots holding a sample (any field not empty)."""
+    filled = np.zeros(SLOTS_PER_DAY, dtype=bool)
+    for field, (_, _, missing) in BLOCK_FIELDS.items():
+        filled |= series[field] != missing
+    return filled
+
+
+def encode_day(series: dict, compress: bool = True) -> bytes:
+    """Packs a day's arrays into a block, zlib-compressed if compress is set and it makes the block smaller."""
+    body = b"".join(np.diff(series[field], prepend=dtype.type(0)).astype(dtype, copy=False).tobytes()
+                    for field, (dtype, _, _) in BLOCK_FIELDS.items())
+    flags = 0
+    if compress:
+        compressed = zlib.compress(body)
+        if len(compressed) < len(body):
+            body, flags = compressed, FLAG_COMPRESSED
+    return BLOCK_HEADER.pack(BLOCK_VERSION, flags) + body
+
+
+def decode_day(block: bytes) -> dict:
+    """Unpacks a block from encode_day into field -> array of SLOTS_PER_DAY values (in stored units)."""
+    view = memoryview(block)
+    version, flags = BLOCK_HEADER.unpack_from(view)
+    if version != BLOCK_VERSION:
+        raise ValueError(f"Unknown wearable block version {version}")
+    body = view[BLOCK_HEADER.size:]
+    if flags & FLAG_COMPRESSED:
+        body = memoryview(zlib.decompress(body))
+    series, offset = {}, 0
+    for field, (dtype, _, _) in BLOCK_FIELDS.items():
+        deltas = np.frombuffer(body, dtype=dtype, count=SLOTS_PER_DAY, offset=offset)
+        series[field] = np.cumsum(deltas, dtype=dtype)
+        offset += deltas.nbytes
+    return series
+
+
+def merge_samples(series: dict, rows: list) -> int:
+    """
+    Writes sample rows (from ingest.validate_samples, all for this day) into the empty slots of series, in place.
+    Slots that already hold a sample are left as they are. Returns how many slots were filled.
+    """
+    slots = np.fromiter((slot_of(row["recorded_at"]) for row in rows), dtype=np.intp, count=len(rows))
+    new = ~filled_slots(series)[slots]
+    for field, (dtype, scale, missing) in BLOCK_FIELDS.items():
+        values = np.array([missing if row[field] is None else round(row[field] * scale) for row in rows], dtype=dtype)
+        series[field][slots[new]] = values[new]
+    return int(np.count_nonzero(new))
+
+
+def summarise_series(series: dict) -> tuple:
+    """(average heart rate, total steps, average sleep quality) of a day, each None if the day has no such readings."""
+    summary = []
+    for field, (_, scale, missing) in BLOCK_FIELDS.items():
+        values = series[field][series[field] != missing]
+        if not values.size:
+            summary.append(None)
+        elif field == "steps":
+            summary.append(int(values.sum(dtype=np.int64)))
+        else:
+            summary.append(round(float(values.mean()) / scale, 1 if scale > 1 else None))
+    return tuple(summary)
+
+
+def iter_samples(series: dict, day):
+    """Yields the day's samples as dicts like those uploaded: recorded_at, heart_rate, steps, sleep_quality."""
+    start = datetime.combine(day, datetime.min.time())
+    columns = {field: series[field].tolist() for field in BLOCK_FIELDS}
+    for slot in np.flatnonzero(filled_slots(series)).tolist():
+        sample = {"recorded_at": start + timedelta(minutes=slot * SAMPLE_INTERVAL_MINUTES)}
+        for field, (_, scale, missing) in BLOCK_FIELDS.items():
+            value = columns[field][slot]
+            sample[field] = None if value == missing else (value / scale if scale > 1 else value)
+        yield sample
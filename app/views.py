@@ -1,24 +1,40 @@
-from flask import render_template, redirect, url_for, flash, request, session
+from flask import render_template, redirect, url_for, flash, request, session, abort, Response, stream_with_context, \
+    make_response, jsonify
 from flask_login import current_user, login_user, login_required
 from app import app, db
 from app.models import User, Mood_DB
 from app.forms import ChooseForm, JournalForm
-from app.controller import process_log_mood, process_journal, process_prediction, DistressAlert, process_recommendation
+from app.controller import process_log_mood, process_journal, process_prediction, DistressAlert, process_recommendation, \
+    get_history_page, has_logged_mood, prediction_model_version, get_recommendation_catalog
+from app.export import EXPORT_FORMATS, export_moods
+from app.ingest import ingest_samples
+from app.query_budget import query_budget
 import sqlalchemy as sa
-from datetime import datetime
+from datetime import date, datetime, time, timezone
+import hashlib
 
 """
+Each route declares with @query_budget the most SQL statements one request may send, including logging the user in;
+it is checked when QUERY_BUDGET_MODE is on (see app/query_budget.py).
 For the prototype, we do not include a login feature. As such we have created a user elsewhere (using hardcoded values)
 and will automatically login this user upon running the app.
+The before_request gates below look at the session only (Flask-Login keeps the user's id in it), so they cost no
+database queries once the user is logged in; static files, unmatched URLs (error pages) and the /metrics scrape skip
+them entirely.
 """
+GATE_EXEMPT_ENDPOINTS = {None, 'static', 'metrics'}
+
 @app.before_request
 def auto_login_sample_user():
-    if not current_user.is_authenticated:
-        sample_user = db.session.scalar(sa.select(User).limit(1))
-        if sample_user:
-            login_user(sample_user)
+    if request.endpoint in GATE_EXEMPT_ENDPOINTS or '_user_id' in session:
+        return
+    # the sample user is the first one created; without an order a server database may return any user
+    sample_user = db.session.scalar(sa.select(User).order_by(User.id).limit(1))
+    if sample_user:
+        login_user(sample_user)
 
 @app.route('/')
+@query_budget(2)
 def home():
     return render_template('home.html', title="Home")
 
@@ -26,6 +42,7 @@ def home():
 Simulates it being 6pm for a mood logging to occur
 """
 @app.route('/simulate_6pm')
+@query_budget(2)
 @login_required
 def simulate_6pm():
     session['simulate_6pm'] = True
@@ -36,6 +53,7 @@ def simulate_6pm():
 Simulates it being 8am for a mood prediction to occur
 """
 @app.route('/simulate_8am')
+@query_budget(2)
 @login_required
 def simulate_8am():
     session['simulate_8am'] = True
@@ -44,31 +62,35 @@ def simulate_8am():
 
 """
 Upon loading the app, we check if its past 6pm or past 8am in order to provide a prediction or a mood log.
+Whether today's mood is logged is remembered per user by the controller, and whether the prediction was shown is kept
+in the session, so neither normally needs a query.
 """
+MOOD_LOGGING_TIME = time(18)
+PREDICTION_TIME = time(8)
+# the wearable upload API is used by devices, not people, so it is not held back by the prompts either
+PROMPT_EXEMPT_ENDPOINTS = GATE_EXEMPT_ENDPOINTS | {'wearable_samples'}
+
 @app.before_request
 def require_mood_logging():
-    if current_user.is_authenticated:
-        cutoff_time = datetime.strptime("18:00", "%H:%M").time()
-        current_time = datetime.now().time()
-        eight_am = datetime.strptime("08:00", "%H:%M").time()
-        today = datetime.now().date()
-        #check if past 6pm
-        if current_time >= cutoff_time:
-            today = datetime.now().date()
-            mood_entry = Mood_DB.query.filter_by(user_id=current_user.id, date=today).first()
-            #check if mood has been logged today already
-            if not mood_entry and request.endpoint != 'log_mood':
-                flash("Please log your mood after 6pm to continue using the app.", "warning")
-                return redirect(url_for('log_mood'))
-        #check if past 8am and if prediction has already been shown
-        if current_time >= eight_am and session.get('prediction_shown') != str(today):
-            if request.endpoint != 'predict':
-                return redirect(url_for('predict'))
+    user_id = session.get('_user_id')
+    if request.endpoint in PROMPT_EXEMPT_ENDPOINTS or user_id is None:
+        return
+    now = datetime.now()
+    today = now.date()
+    #check if past 6pm and if mood has been logged today already
+    if now.time() >= MOOD_LOGGING_TIME and request.endpoint != 'log_mood' and not has_logged_mood(int(user_id), today):
+        flash("Please log your mood after 6pm to continue using the app.", "warning")
+        return redirect(url_for('log_mood'))
+    #check if past 8am and if prediction has already been shown
+    if now.time() >= PREDICTION_TIME and session.get('prediction_shown') != str(today):
+        if request.endpoint != 'predict':
+            return redirect(url_for('predict'))
 
 """
 form for logging mood and redirects to journal after completion 
 """
 @app.route('/log_mood', methods=['GET', 'POST'])
+@query_budget(10)
 @login_required
 def log_mood():
     form = ChooseForm()
@@ -89,6 +111,7 @@ Note the activity diagram 3.2.1 in assignment 1 is incorrect as we do not view a
 at this stage . This is not specified in the functional requirements and was incorrectly added to the activity diagram.
 """
 @app.route('/journal', methods=['GET', 'POST'])
+@query_budget(14)
 @login_required
 def journal():
     mood_id = session.get('mood_id')
@@ -132,6 +155,7 @@ def journal():
 Route for distress page, using contact emergency support.
 """
 @app.route('/distress')
+@query_budget(6)
 @login_required
 def distress():
     alert = DistressAlert(user_id=current_user.id, message="Multiple negative mood entries detected!")
@@ -142,33 +166,125 @@ def distress():
         alert.contactEmergencySupport()
     return render_template('distress.html', title="Distress")
 
+"""
+/data and /predict are polled by dashboards, so they answer conditional GETs. Their ETag is built from the user's
+data_version (bumped whenever any of their Mood_DB rows change) plus anything else the page depends on, and is checked
+before the page's own queries run: an unchanged page costs only the current_user lookup and is never rendered.
+"""
+def page_etag(versions) -> str:
+    return hashlib.blake2b(repr((current_user.id, current_user.data_version) + versions).encode(),
+                           digest_size=16).hexdigest()
+
+
+def conditional_page(render, *versions, last_modified=None):
+    etag = page_etag(versions)
+    if request.if_none_match:
+        unchanged = request.if_none_match.contains(etag)
+    else:
+        unchanged = last_modified is not None and request.if_modified_since is not None \
+                    and last_modified.replace(microsecond=0) <= request.if_modified_since
+    if unchanged:
+        response = Response(status=304)
+    else:
+        response = make_response(render())
+        # rendering can itself store data (e.g. /predict saves today's readings); the page shows the result
+        etag = page_etag(versions)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # pages are per user: browsers may keep them but must check back every time
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response
+
+
+def data_last_modified():
+    updated = current_user.data_updated_at
+    return updated.replace(tzinfo=timezone.utc) if updated else None
+
 """
 For prototype allows us to view all the data in the database.
+Shown a page at a time (DATA_PAGE_SIZE entries), moving with ?before=<date> for older entries and ?after=<date> for
+newer ones, so the page costs the same however long the user's history is.
 """
 @app.route('/data')
+@query_budget(4)
 @login_required
 def data():
-    all_entries = Mood_DB.query.filter_by(user_id=current_user.id).order_by(Mood_DB.date.desc()).all()
-    return render_template('data.html', title="All Mood Entries", entries=all_entries)
+    before = request.args.get('before', type=date.fromisoformat)
+    after = request.args.get('after', type=date.fromisoformat)
+    page_size = app.config['DATA_PAGE_SIZE']
+
+    def render():
+        entries, older_cursor, newer_cursor = get_history_page(
+            current_user.id, before=before, after=after, page_size=page_size)
+        return render_template('data.html', title="All Mood Entries", entries=entries,
+                               older_cursor=older_cursor, newer_cursor=newer_cursor)
+
+    return conditional_page(render, before, after, page_size, last_modified=data_last_modified())
+
+"""
+Downloads the user's whole mood history as CSV (default) or NDJSON with ?format=, gzipped with ?gzip=1.
+The response is streamed from the database a batch at a time, so it never holds the full history in memory.
+"""
+@app.route('/export')
+@query_budget(3)
+@login_required
+def export():
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        abort(400)
+    compress = request.args.get('gzip', '0') not in ('0', '')
+    filename = f"mood_history.{export_format}" + (".gz" if compress else "")
+    chunks = export_moods(export_format, user_id=current_user.id, compress=compress,
+                          batch_size=app.config['EXPORT_BATCH_SIZE'])
+    return Response(stream_with_context(chunks),
+                    mimetype='application/gzip' if compress else EXPORT_FORMATS[export_format],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+"""
+Devices upload wearable samples here in bulk, as JSON {"samples": [{"recorded_at": ..., "heart_rate": ...,
+"steps": ..., "sleep_quality": ...}, ...]}, up to WEARABLE_MAX_SAMPLES per request. Invalid samples are reported
+back by index rather than failing the whole upload. See app/ingest.py.
+"""
+@app.route('/api/wearable/samples', methods=['POST'])
+@query_budget(16)
+@login_required
+def wearable_samples():
+    body = request.get_json(silent=True)
+    samples = body.get('samples') if isinstance(body, dict) else None
+    if not isinstance(samples, list):
+        return jsonify(error='Expected a JSON object with a "samples" list.'), 400
+    if len(samples) > app.config['WEARABLE_MAX_SAMPLES']:
+        return jsonify(error=f"At most {app.config['WEARABLE_MAX_SAMPLES']} samples per upload."), 413
+    return jsonify(ingest_samples(current_user.id, samples))
 
 """
 Route for prediction. Using controller function.
+The prediction is for today, from the user's data, the trained model and the recommendation catalog, so the page is
+unchanged (304) until one of those changes.
 """
 @app.route('/predict')
+@query_budget(18)
 @login_required
 def predict():
-    # Delegate prediction logic to the controller.
-    predicted_mood = process_prediction(current_user)
-    recommendation_result = process_recommendation(current_user, predicted_mood)
-    if recommendation_result['support_contact']:
-        flash(recommendation_result['support_contact'],"info")
-
-    if recommendation_result['Uni_wellbeing']:
-        flash(recommendation_result['Uni_wellbeing'],'info')
-
-    session['prediction_shown'] = str(datetime.now().date())
-    return render_template('predict.html', title="Prediction", predicted_mood=predicted_mood,
-                           recommendation=recommendation_result)
+    today = datetime.now().date()
+
+    def render():
+        # Delegate prediction logic to the controller.
+        predicted_mood = process_prediction(current_user)
+        recommendation_result = process_recommendation(current_user, predicted_mood)
+        if recommendation_result['support_contact']:
+            flash(recommendation_result['support_contact'],"info")
+
+        if recommendation_result['Uni_wellbeing']:
+            flash(recommendation_result['Uni_wellbeing'],'info')
+
+        return render_template('predict.html', title="Prediction", predicted_mood=predicted_mood,
+                               recommendation=recommendation_result)
+
+    session['prediction_shown'] = str(today)
+    return conditional_page(render, today, prediction_model_version(), get_recommendation_catalog().version)
 
 # Error handlers remain unchanged.
 @app.errorhandler(403)
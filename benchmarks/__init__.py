@@ -0,0 +1,5 @@
+"""
+Benchmarks for the performance-sensitive parts of the app. Each module is run on its own, for example
+    python -m benchmarks.bench_prediction --users 100000
+and works on a throwaway database, never app/data/data.sqlite.
+"""
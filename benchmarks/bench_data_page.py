@@ -0,0 +1,74 @@
+"""
+Times the /data history page against the length of the user's history, to show it stays flat.
+For each history size a fresh user is given that many days of entries, and the first page, a page from the middle
+(?before=) and a page from near the end are requested through the test client. The time and the peak memory
+allocated (tracemalloc) while rendering each page are reported:
+
+    python -m benchmarks.bench_data_page --sizes 100 1000 10000 50000
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from benchmarks.seed import use_database
+
+
+def measure(client, url: str, repeat: int):
+    timings, peaks = [], []
+    for _ in range(repeat):
+        tracemalloc.start()
+        started = time.perf_counter()
+        response = client.get(url)
+        timings.append(time.perf_counter() - started)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        assert response.status_code == 200, (url, response.status_code)
+    return min(timings), max(peaks), len(response.data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    use_database()
+    import sqlalchemy as sa
+    from app import app, db
+    from app.models import User, Mood_DB
+    from benchmarks.seed import synthetic_rows
+
+    today = datetime.now().date()
+    page_size = app.config['DATA_PAGE_SIZE']
+    print(f"page size {page_size}")
+    print(f"{'history':>8} {'page':>7} {'best ms':>8} {'peak KiB':>9} {'bytes':>8}")
+    for size in args.sizes:
+        # seed in its own app context: requests made inside one would share its g, and so its logged-in user
+        with app.app_context():
+            user = User(username=f"bench{size}", email=f"bench{size}@example.com")
+            user.set_password("bench")
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+            rows = list(synthetic_rows(1, size, today))
+            for row in rows:
+                row["user_id"] = user_id
+            db.session.execute(sa.insert(Mood_DB), rows)
+            db.session.commit()
+
+        with app.test_client() as client:
+            with client.session_transaction() as session:
+                session['_user_id'] = str(user_id)
+                session['prediction_shown'] = str(today)
+            pages = {
+                "first": "/data",
+                "middle": f"/data?before={today - timedelta(days=size // 2)}",
+                "last": f"/data?before={today - timedelta(days=size - page_size)}",
+            }
+            for name, url in pages.items():
+                best, peak, length = measure(client, url, args.repeat)
+                print(f"{size:>8} {name:>7} {best * 1000:>8.1f} {peak / 1024:>9.0f} {length:>8}")
+
+
+if __name__ == "__main__":
+    main()
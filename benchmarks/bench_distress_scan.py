@@ -0,0 +1,62 @@
+"""
+Times the nightly cohort-wide distress scan (DistressAlert.scan_cohort) on synthetic history.
+The target size is 50k users with a year of entries each:
+
+    python -m benchmarks.bench_distress_scan --users 50000 --days 365
+
+Seeding that much data takes several minutes; pass --database to keep the file and --skip-seed to reuse it.
+Reports the rows scanned, the time per scan and the process's peak memory (resident set size) before and after the
+scans, i.e. what seeding took and what the scan adds on top.
+"""
+import argparse
+import resource
+import time
+from datetime import datetime
+from benchmarks.seed import use_database, seed_mood_history
+
+
+def peak_rss_mib() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--database", help="SQLite file to use (default: a temporary file)")
+    parser.add_argument("--skip-seed", action="store_true", help="reuse the history already in --database")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.skip_seed and not args.database:
+        parser.error("--skip-seed needs --database")
+    use_database(args.database, fresh=not args.skip_seed)
+    import sqlalchemy as sa
+    from app import app, db
+    from app.controller import DistressAlert
+    from app.models import Mood_DB
+
+    today = datetime.now().date()
+    with app.app_context():
+        if not args.skip_seed:
+            started = time.perf_counter()
+            rows = seed_mood_history(args.users, args.days, today)
+            print(f"seeded {rows} rows in {time.perf_counter() - started:.1f}s")
+        rows = db.session.scalar(sa.select(sa.func.count()).select_from(Mood_DB))
+        db.session.commit()
+        peak_before = peak_rss_mib()
+
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            found = DistressAlert.scan_cohort(today)
+            timings.append(time.perf_counter() - started)
+
+    print(f"scan of {rows} rows: {found} users at risk; best {min(timings):.2f}s, worst {max(timings):.2f}s "
+          f"over {args.repeat} runs")
+    print(f"peak memory: {peak_before:.0f} MiB before scanning, {peak_rss_mib():.0f} MiB after")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Measures the cohort-wide mood history export at growing sizes, to show its memory use stays flat.
+For each size the database is seeded with that many entries and the full export is consumed (and thrown away);
+the time, throughput and peak memory allocated (tracemalloc) are reported:
+
+    python -m benchmarks.bench_export --rows 10 10000 1000000 --format ndjson --gzip
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import datetime
+from benchmarks.seed import use_database, seed_mood_history
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 10000, 1000000])
+    parser.add_argument("--format", default="csv", choices=["csv", "ndjson"])
+    parser.add_argument("--gzip", action="store_true")
+    args = parser.parse_args()
+
+    use_database()
+    import sqlalchemy as sa
+    from app import app, db
+    from app.models import Mood_DB
+    from app.export import export_moods
+
+    today = datetime.now().date()
+    print(f"{'rows':>9} {'seconds':>8} {'rows/s':>9} {'MiB out':>8} {'peak KiB':>9}")
+    with app.app_context():
+        for rows in args.rows:
+            db.session.execute(sa.delete(Mood_DB))
+            db.session.commit()
+            # a year per user, and fewer days when there are fewer rows
+            days = min(rows, 365)
+            seed_mood_history(rows // days, days, today)
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            size = sum(len(chunk) for chunk in export_moods(args.format, compress=args.gzip,
+                                                            batch_size=app.config['EXPORT_BATCH_SIZE']))
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            exported = rows // days * days
+            print(f"{exported:>9} {elapsed:>8.2f} {exported / elapsed:>9.0f} {size / 2**20:>8.1f} {peak / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
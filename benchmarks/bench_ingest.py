@@ -0,0 +1,88 @@
+"""
+Times bulk wearable uploads to /api/wearable/samples from many devices at once. Each simulated device is a user
+uploading a day of 5-minute samples (288) per request, from its own thread; every device uploads --days days:
+
+    python -m benchmarks.bench_ingest --devices 1000 --threads 16 --days 1
+
+Reports uploads and samples per second, the upload latency percentiles, and the size of the database file.
+"""
+import argparse
+import os
+import random
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta
+from benchmarks.seed import use_database
+
+
+def day_of_samples(day, rng):
+    start = datetime.combine(day, datetime.min.time())
+    return [{"recorded_at": (start + timedelta(minutes=5 * i)).isoformat(), "heart_rate": rng.randint(50, 120),
+             "steps": rng.randint(0, 800), "sleep_quality": round(rng.uniform(4, 10), 1) if i < 96 else None}
+            for i in range(288)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--days", type=int, default=1)
+    args = parser.parse_args()
+
+    path = use_database()
+    # the devices upload the last --days days, which must all be accepted
+    os.environ.setdefault('WEARABLE_MAX_AGE_DAYS', str(args.days + 1))
+    import sqlalchemy as sa
+    from app import app, db
+    from app.models import User
+
+    with app.app_context():
+        # the same (unused) password hash for everyone, as hashing thousands of passwords is slow
+        db.session.execute(sa.insert(User), [
+            {"username": f"device{i}", "email": f"device{i}@example.com", "password_hash": "x"}
+            for i in range(args.devices)
+        ])
+        db.session.commit()
+        user_ids = db.session.scalars(sa.select(User.id).where(User.username.like("device%"))).all()
+
+    today = datetime.now().date()
+    days = [today - timedelta(days=offset) for offset in range(args.days, 0, -1)]
+    # (user id, day) uploads shared out between the threads
+    uploads = [(user_id, day) for day in days for user_id in user_ids]
+    latencies, failures = [], []
+    lock = threading.Lock()
+
+    def device_thread(index):
+        rng = random.Random(index)
+        with app.test_client() as client:
+            for user_id, day in uploads[index::args.threads]:
+                body = {"samples": day_of_samples(day, rng)}
+                with client.session_transaction() as session:
+                    session['_user_id'] = str(user_id)
+                started = time.perf_counter()
+                response = client.post('/api/wearable/samples', json=body)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    if response.status_code != 200 or response.json["stored"] != 288:
+                        failures.append(response.status_code)
+
+    threads = [threading.Thread(target=device_thread, args=(i,)) for i in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f"{len(uploads)} uploads ({len(uploads) * 288} samples) from {args.devices} devices on {args.threads} threads "
+          f"in {elapsed:.1f}s: {len(uploads) / elapsed:.0f} uploads/s, {len(uploads) * 288 / elapsed:.0f} samples/s")
+    print(f"latency p50 {quantiles[49] * 1000:.1f}ms, p95 {quantiles[94] * 1000:.1f}ms, p99 {quantiles[98] * 1000:.1f}ms")
+    print(f"failed uploads: {len(failures)}; database file {os.path.getsize(path) / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Times PredictionModel end to end on a synthetic cohort: training on the history, then predicting today's mood for
+every user with one predict_many call (one query plus one vectorised computation).
+
+    python -m benchmarks.bench_prediction --users 100000 --days 7
+"""
+import argparse
+import time
+from datetime import datetime
+from benchmarks.seed import use_database, seed_mood_history
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=7, help="days of history per user, including today")
+    parser.add_argument("--database", help="SQLite file to create (default: a temporary file)")
+    args = parser.parse_args()
+
+    use_database(args.database)
+    from app import app
+    from app.controller import PredictionModel
+
+    today = datetime.now().date()
+    with app.app_context():
+        started = time.perf_counter()
+        rows = seed_mood_history(args.users, args.days, today)
+        print(f"seeded {rows} rows in {time.perf_counter() - started:.1f}s")
+
+        model = PredictionModel()
+        started = time.perf_counter()
+        trained = model.train(until=today)
+        train_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        predictions = model.predict_many(day=today)
+        predict_seconds = time.perf_counter() - started
+
+    print(f"train:   {trained} entries in {train_seconds:.2f}s ({trained / train_seconds:.0f} entries/s)")
+    print(f"predict: {len(predictions)} users in {predict_seconds:.2f}s "
+          f"({len(predictions) / predict_seconds:.0f} users/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Compares storing wearable samples as packed day blocks (WearableDay, app.timeseries) with a row per 5-minute sample.
+Both layouts are filled with the same synthetic samples, each in its own SQLite file, and for each the file size per
+sample and the rate at which all samples are read back are reported:
+
+    python -m benchmarks.bench_wearable_storage --users 200 --days 30
+
+Blocks are read back twice: decoded to arrays (how the daily summaries use them) and expanded to one dict per sample.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from benchmarks.seed import use_database
+
+
+def synthetic_day(day, rng):
+    """A day of samples, with heart rate drifting slowly, steps in bursts and sleep quality overnight only."""
+    start = datetime.combine(day, datetime.min.time())
+    heart_rate = rng.randint(55, 75)
+    samples = []
+    for slot in range(288):
+        heart_rate = min(180, max(40, heart_rate + rng.randint(-3, 3)))
+        samples.append({"recorded_at": start + timedelta(minutes=5 * slot), "heart_rate": heart_rate,
+                        "steps": rng.choice([0, 0, 0, rng.randint(10, 600)]),
+                        "sleep_quality": round(rng.uniform(5, 9), 1) if slot < 84 else None})
+    return samples
+
+
+def timed(label, n_samples, read):
+    started = time.perf_counter()
+    read()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<28} {elapsed:>7.2f}s {n_samples / elapsed:>12,.0f} samples/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--no-compress", action="store_true", help="store blocks uncompressed")
+    args = parser.parse_args()
+
+    use_database()
+    import sqlalchemy as sa
+    from app.models import WearableDay
+    from app.timeseries import empty_day, merge_samples, encode_day, decode_day, iter_samples
+
+    # the row-per-sample layout
+    metadata = sa.MetaData()
+    sample_table = sa.Table(
+        "wearable_sample", metadata,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("user_id", sa.Integer, nullable=False),
+        sa.Column("recorded_at", sa.DateTime, nullable=False),
+        sa.Column("heart_rate", sa.Integer),
+        sa.Column("steps", sa.Integer),
+        sa.Column("sleep_quality", sa.Float),
+        sa.UniqueConstraint("user_id", "recorded_at"),
+    )
+    directory = tempfile.mkdtemp(prefix="unimind-bench-")
+    row_path, block_path = os.path.join(directory, "rows.sqlite"), os.path.join(directory, "blocks.sqlite")
+    row_engine, block_engine = sa.create_engine("sqlite:///" + row_path), sa.create_engine("sqlite:///" + block_path)
+    metadata.create_all(row_engine)
+    WearableDay.__table__.create(block_engine)
+
+    rng = random.Random(0)
+    today = datetime.now().date()
+    n_samples, block_bytes = 0, 0
+    with row_engine.begin() as rows, block_engine.begin() as blocks:
+        for user_id in range(1, args.users + 1):
+            day_rows, day_blocks = [], []
+            for offset in range(args.days, 0, -1):
+                day = today - timedelta(days=offset)
+                samples = synthetic_day(day, rng)
+                day_rows.extend({"user_id": user_id, **sample} for sample in samples)
+                series = empty_day()
+                merge_samples(series, samples)
+                block = encode_day(series, compress=not args.no_compress)
+                block_bytes += len(block)
+                day_blocks.append({"user_id": user_id, "date": day, "samples": block})
+                n_samples += len(samples)
+            rows.execute(sample_table.insert(), day_rows)
+            blocks.execute(WearableDay.__table__.insert(), day_blocks)
+    for engine in (row_engine, block_engine):
+        with engine.connect() as connection:
+            connection.exec_driver_sql("VACUUM")
+
+    print(f"{n_samples:,} samples ({args.users} users x {args.days} days x 288)")
+    print(f"  {'row per sample':<28} {os.path.getsize(row_path) / n_samples:>7.1f} bytes/sample on disk")
+    print(f"  {'day blocks':<28} {os.path.getsize(block_path) / n_samples:>7.1f} bytes/sample on disk, "
+          f"{block_bytes / n_samples:.2f} bytes/sample of block data")
+
+    def read_rows():
+        with row_engine.connect() as connection:
+            connection.execute(sa.select(sample_table).order_by(sample_table.c.user_id, sample_table.c.recorded_at)).all()
+
+    def read_blocks(expand):
+        table = WearableDay.__table__
+        with block_engine.connect() as connection:
+            for row in connection.execute(sa.select(table.c.date, table.c.samples)
+                                          .order_by(table.c.user_id, table.c.date)):
+                series = decode_day(row.samples)
+                if expand:
+                    list(iter_samples(series, row.date))
+
+    print("read back:")
+    timed("row per sample", n_samples, read_rows)
+    timed("day blocks, to arrays", n_samples, lambda: read_blocks(expand=False))
+    timed("day blocks, to dicts", n_samples, lambda: read_blocks(expand=True))
+
+
+if __name__ == "__main__":
+    main()
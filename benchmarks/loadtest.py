@@ -0,0 +1,350 @@
+"""
+Load test of the daily cycle through the real routes, to see how many students one worker can serve.
+Synthetic users (with --history-days of past entries each) arrive in two spikes, spread over --ramp seconds:
+- 08:00: the prediction prompt. GET / (redirected), GET /predict, GET /data.
+- 18:00: the mood-logging prompt. GET /data (redirected), GET and POST /log_mood, GET and POST /journal, GET /distress
+  if redirected there, GET /data.
+Each user keeps their own session (cookies) across both spikes, and the app's clock is set to the spike's hour.
+--ramp 0 sends every user at once, to find the most a worker can take.
+Requests go through the Flask test client, or with --server through a local HTTP server started on a free port:
+
+    python -m benchmarks.loadtest --users 500 --threads 16 --output loadtest.json
+    python -m benchmarks.loadtest --users 500 --threads 16 --server --compare loadtest.json
+
+Reports, per spike and per route, throughput, p50/p95/p99 latency and database queries per request, and writes them
+to --output as JSON; --compare prints the change in each route's p95 and throughput against an earlier file. A route
+whose every request failed is listed as broken in the report and left out of comparisons.
+"""
+import argparse
+import http.client
+import json
+import logging
+import random
+import re
+import statistics
+import subprocess
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+from datetime import datetime, timedelta
+from http.cookies import SimpleCookie
+from unittest.mock import patch
+from benchmarks.seed import use_database, seed_mood_history
+
+CSRF_PATTERN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+JOURNAL_TEXTS = [
+    "Good lecture today and a nice walk afterwards.",
+    "Stressed about the deadline on Friday, did not sleep well.",
+    "Quiet day, mostly revision in the library.",
+    "Had a great time with friends at dinner!",
+    "Feeling tired and a bit lonely this week.",
+    "",
+]
+
+
+class TestClientDriver:
+    """One user's requests through the Flask test client, logged in by putting their id in the session."""
+    def __init__(self, app, user_id: int):
+        self.client = app.test_client()
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+
+    def request(self, method: str, path: str, data: dict = None):
+        response = self.client.open(path, method=method, data=data)
+        return (response.status_code, response.get_data(as_text=True), response.headers.get('Location'),
+                response.headers.get('X-Query-Count'))
+
+
+class HTTPDriver:
+    """One user's requests over HTTP, with their session cookie signed the way the app signs it."""
+    def __init__(self, app, user_id: int, host: str, port: int):
+        self.host, self.port = host, port
+        serializer = app.session_interface.get_signing_serializer(app)
+        self.cookies = {app.config['SESSION_COOKIE_NAME']: serializer.dumps({'_user_id': str(user_id),
+                                                                             '_fresh': True})}
+
+    def request(self, method: str, path: str, data: dict = None):
+        headers = {'Cookie': "; ".join(f"{name}={value}" for name, value in self.cookies.items())}
+        body = None
+        if data is not None:
+            body = urllib.parse.urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            text = response.read().decode()
+        finally:
+            connection.close()
+        for header in response.headers.get_all('Set-Cookie') or []:
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        return response.status, text, response.headers.get('Location'), response.headers.get('X-Query-Count')
+
+
+class Recorder:
+    """Collects (route, seconds, status, queries) for every request of a spike."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def call(self, driver, method: str, path: str, data: dict = None):
+        route = f"{method} {path}"
+        started = time.perf_counter()
+        try:
+            status, text, location, queries = driver.request(method, path, data)
+        except Exception:
+            with self.lock:
+                self.errors[route] += 1
+            raise
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.samples[route].append((elapsed, int(queries) if queries is not None else None))
+            if status >= 400:
+                self.errors[route] += 1
+        return status, text, location
+
+
+def csrf_token(text: str) -> str:
+    match = CSRF_PATTERN.search(text)
+    return match.group(1) if match else ""
+
+
+def morning_cycle(record, driver, rng):
+    record(driver, 'GET', '/')
+    record(driver, 'GET', '/predict')
+    record(driver, 'GET', '/data')
+
+
+def evening_cycle(record, driver, rng):
+    from app.features import MOOD_LIST
+    record(driver, 'GET', '/data')
+    _, text, _ = record(driver, 'GET', '/log_mood')
+    record(driver, 'POST', '/log_mood', {'csrf_token': csrf_token(text), 'choice': rng.choice(MOOD_LIST)})
+    _, text, _ = record(driver, 'GET', '/journal')
+    _, _, location = record(driver, 'POST', '/journal', {'csrf_token': csrf_token(text),
+                                                          'journal': rng.choice(JOURNAL_TEXTS),
+                                                          'submit': 'Submit Journal'})
+    if location and location.endswith('/distress'):
+        record(driver, 'GET', '/distress')
+    record(driver, 'GET', '/data')
+
+
+SPIKES = {"08:00": (8, morning_cycle), "18:00": (18, evening_cycle)}
+
+
+def run_spike(name, drivers, threads, ramp, rng):
+    """Runs one spike: each user's cycle starts at a time drawn from a distribution peaking at the start of the ramp."""
+    import app.views as views
+    hour, cycle = SPIKES[name]
+    spike_start = datetime.combine(datetime.now().date(), datetime.min.time()).replace(hour=hour)
+    arrivals = sorted((rng.triangular(0, ramp, 0), index) for index in range(len(drivers)))
+    recorder = Recorder()
+    failed_cycles = []
+    next_arrival = iter(arrivals)
+    arrival_lock = threading.Lock()
+    started = time.perf_counter()
+
+    class SpikeDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return spike_start + timedelta(seconds=time.perf_counter() - started)
+
+    def worker(seed):
+        worker_rng = random.Random(seed)
+        while True:
+            with arrival_lock:
+                arrival = next(next_arrival, None)
+            if arrival is None:
+                return
+            offset, index = arrival
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                cycle(recorder.call, drivers[index], worker_rng)
+            except Exception as error:
+                failed_cycles.append(repr(error))
+
+    with patch.object(views, 'datetime', SpikeDatetime):
+        workers = [threading.Thread(target=worker, args=(rng.random(),)) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+    elapsed = time.perf_counter() - started
+    return summarise_spike(recorder, elapsed, failed_cycles)
+
+
+def percentile(quantiles, p):
+    return round(quantiles[p - 1] * 1000, 2)
+
+
+def summarise_spike(recorder, elapsed, failed_cycles) -> dict:
+    routes = {}
+    for route, samples in sorted(recorder.samples.items()):
+        latencies = sorted(seconds for seconds, _ in samples)
+        queries = [count for _, count in samples if count is not None]
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        routes[route] = {
+            "requests": len(samples),
+            "errors": recorder.errors[route],
+            "throughput_rps": round(len(samples) / elapsed, 1),
+            "p50_ms": percentile(quantiles, 50),
+            "p95_ms": percentile(quantiles, 95),
+            "p99_ms": percentile(quantiles, 99),
+            "queries_mean": round(statistics.fmean(queries), 2) if queries else None,
+            "queries_max": max(queries) if queries else None,
+        }
+    requests = sum(route["requests"] for route in routes.values())
+    return {
+        "seconds": round(elapsed, 2),
+        "requests": requests,
+        "throughput_rps": round(requests / elapsed, 1),
+        "failed_cycles": len(failed_cycles),
+        "first_failures": failed_cycles[:5],
+        # routes whose every request failed: their timings are of error pages, so comparisons leave them out
+        "broken_routes": [route for route, stats in routes.items() if stats["errors"] == stats["requests"]],
+        "routes": routes,
+    }
+
+
+def count_queries(app, db):
+    """Adds an X-Query-Count header to every response: the statements its request sent to the database."""
+    from flask import request_started, request_finished
+    import sqlalchemy as sa
+    local = threading.local()
+
+    def on_execute(*args):
+        local.queries = getattr(local, 'queries', 0) + 1
+
+    def on_started(sender, **extra):
+        local.queries = 0
+
+    def on_finished(sender, response, **extra):
+        response.headers['X-Query-Count'] = str(getattr(local, 'queries', 0))
+
+    with app.app_context():
+        sa.event.listen(db.engine, "before_cursor_execute", on_execute)
+    request_started.connect(on_started, app, weak=False)
+    request_finished.connect(on_finished, app, weak=False)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results):
+    for name, spike in results["spikes"].items():
+        print(f"\n{name}: {spike['requests']} requests in {spike['seconds']}s, {spike['throughput_rps']} req/s, "
+              f"{spike['failed_cycles']} failed cycles")
+        print(f"  {'route':<16} {'requests':>8} {'errors':>6} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'queries':>7}")
+        for route, stats in spike["routes"].items():
+            queries = "-" if stats["queries_mean"] is None else f"{stats['queries_mean']:.1f}"
+            print(f"  {route:<16} {stats['requests']:>8} {stats['errors']:>6} {stats['throughput_rps']:>7} "
+                  f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8} {queries:>7}")
+        if spike["broken_routes"]:
+            print(f"  BROKEN (every request failed): {', '.join(spike['broken_routes'])}")
+
+
+def print_comparison(results, baseline):
+    print(f"\nagainst {baseline.get('commit') or 'baseline'}:")
+    for name, spike in results["spikes"].items():
+        for route, stats in spike["routes"].items():
+            before_spike = baseline.get("spikes", {}).get(name, {})
+            before = before_spike.get("routes", {}).get(route)
+            if not before:
+                continue
+            # files from before broken_routes was recorded: a route is broken if all its requests failed
+            broken_runs = []
+            if route in before_spike.get("broken_routes", []) or before["errors"] == before["requests"]:
+                broken_runs.append("earlier")
+            if route in spike["broken_routes"]:
+                broken_runs.append("this")
+            if broken_runs:
+                print(f"  {name} {route:<16} not compared: every request failed in the {' and '.join(broken_runs)} run")
+                continue
+            p95 = (stats["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0
+            rps = (stats["throughput_rps"] - before["throughput_rps"]) / before["throughput_rps"] * 100 \
+                if before["throughput_rps"] else 0
+            print(f"  {name} {route:<16} p95 {before['p95_ms']:>8} -> {stats['p95_ms']:>8} ms ({p95:+.0f}%), "
+                  f"req/s {before['throughput_rps']:>7} -> {stats['throughput_rps']:>7} ({rps:+.0f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=16, help="concurrent simulated users")
+    parser.add_argument("--history-days", type=int, default=30)
+    parser.add_argument("--ramp", type=float, default=10.0, help="seconds over which each spike's users arrive")
+    parser.add_argument("--spikes", nargs="+", default=list(SPIKES), choices=list(SPIKES))
+    parser.add_argument("--server", action="store_true", help="send requests over HTTP to a local server")
+    parser.add_argument("--database", help="SQLite file to create (default: a temporary file)")
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    use_database(args.database)
+    import sqlalchemy as sa
+    from app import app, db
+    from app.models import User
+    from app.controller import get_prediction_model
+
+    today = datetime.now().date()
+    with app.app_context():
+        existing = db.session.scalar(sa.select(sa.func.count(User.id)))
+        # the same (unused) password hash for everyone, as hashing thousands of passwords is slow
+        db.session.execute(sa.insert(User), [
+            {"username": f"student{i}", "email": f"student{i}@example.com", "password_hash": "x"}
+            for i in range(existing, args.users)
+        ])
+        db.session.commit()
+        user_ids = db.session.scalars(sa.select(User.id).order_by(User.id).limit(args.users)).all()
+        seed_mood_history(len(user_ids), args.history_days, today - timedelta(days=1), seed=args.seed)
+        get_prediction_model()
+    count_queries(app, db)
+
+    server = None
+    if args.server:
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        drivers = [HTTPDriver(app, user_id, '127.0.0.1', server.server_port) for user_id in user_ids]
+    else:
+        drivers = [TestClientDriver(app, user_id) for user_id in user_ids]
+
+    rng = random.Random(args.seed)
+    results = {
+        "commit": git_commit(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "settings": {"users": len(user_ids), "threads": args.threads, "history_days": args.history_days,
+                     "ramp": args.ramp, "transport": "http" if args.server else "test_client",
+                     "database": app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+                     "profile": app.config['DATABASE_PROFILE']},
+        "spikes": {name: run_spike(name, drivers, args.threads, args.ramp, rng) for name in args.spikes},
+    }
+    if server:
+        server.shutdown()
+
+    print_report(results)
+    if args.compare:
+        with open(args.compare) as file:
+            print_comparison(results, json.load(file))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"\nresults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Micro-benchmarks of the controller and domain functions each request relies on, with saved baselines to catch
+regressions before they ship. Every benchmark runs against seeded SQLite databases, in memory and on disk, at each
+size (users x days of history), each combination in its own process:
+
+    python -m benchmarks.micro --save-baseline          # measure and keep the results as this machine's baseline
+    python -m benchmarks.micro                          # measure and fail (exit 1) on a regression
+    python -m benchmarks.micro --sizes small --databases memory --threshold 0.5 --only process_log_mood
+
+A benchmark regresses when its median time per call is more than --threshold (default 25%) above the baseline.
+Baselines depend on the machine, so they are kept in benchmarks/baselines/ (ignored by git) unless --baseline says
+otherwise.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# name -> (users, days of history)
+SIZES = {
+    "small": (100, 30),
+    "medium": (1000, 180),
+    "large": (5000, 365),
+}
+DATABASES = ("memory", "file")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "micro.json")
+WORDS = ("good bad happy sad tired great awful calm stressed lonely excited worried relaxed angry fine lovely "
+         "terrible productive boring fun exam lecture friends sleep deadline walk library coffee rain").split()
+
+# name -> function(context) returning the zero-argument callable to time, in the order they run
+BENCHMARKS = {}
+
+
+def benchmark(function):
+    BENCHMARKS[function.__name__] = function
+    return function
+
+
+class Context:
+    """What the benchmarks share: the seeded users, a random generator and fresh journal texts."""
+    def __init__(self, user_ids, seed=0):
+        self.user_ids = user_ids
+        self.rng = random.Random(seed)
+        self.counter = 0
+
+    def user(self):
+        from app import db
+        from app.models import User
+        return db.session.get(User, self.rng.choice(self.user_ids))
+
+    def text(self):
+        # a new text each time, so the sentiment cache does not hide the analysis
+        self.counter += 1
+        return " ".join(self.rng.choices(WORDS, k=12)) + f" day {self.counter}"
+
+
+@benchmark
+def process_log_mood(context):
+    from app.controller import process_log_mood
+    from app.features import MOOD_LIST
+    return lambda: process_log_mood(context.rng.choice(MOOD_LIST), context.user())
+
+
+@benchmark
+def process_journal(context):
+    from app.controller import process_log_mood, process_journal
+    entries = [(user, process_log_mood("Calm", user).id) for user in (context.user() for _ in range(50))]
+
+    def run():
+        user, mood_id = context.rng.choice(entries)
+        process_journal(mood_id, context.text(), user)
+    return run
+
+
+@benchmark
+def process_prediction(context):
+    from app.controller import process_prediction
+    return lambda: process_prediction(context.user())
+
+
+@benchmark
+def process_recommendation(context):
+    from app.controller import process_recommendation
+    from app.features import MOOD_LIST
+    return lambda: process_recommendation(context.user(), context.rng.choice(MOOD_LIST))
+
+
+@benchmark
+def trigger_alert(context):
+    from app.controller import DistressAlert
+    from app.models import Mood_DB
+    records = [Mood_DB.query.filter_by(user_id=user_id).order_by(Mood_DB.date.desc()).first()
+               for user_id in context.rng.sample(context.user_ids, min(50, len(context.user_ids)))]
+
+    def run():
+        record = context.rng.choice(records)
+        DistressAlert(user_id=record.user_id).triggerAlert(record)
+    return run
+
+
+@benchmark
+def store_entry(context):
+    from app.domain import MoodEntry
+    from app.features import MOOD_LIST
+    today = datetime.now().date()
+    return lambda: MoodEntry(user_id=context.rng.choice(context.user_ids), date=today,
+                             mood=context.rng.choice(MOOD_LIST), heart_rate=context.rng.randint(60, 100)).storeEntry()
+
+
+@benchmark
+def perform_analysis(context):
+    from app.domain import SentimentAnalysis
+    return lambda: SentimentAnalysis(moodEntryID=1, text=context.text()).performAnalysis()
+
+
+def time_calls(function, rounds: int, min_round_seconds: float) -> dict:
+    """Times function in rounds of as many calls as fill min_round_seconds; returns per-call times in microseconds."""
+    function()  # warm up
+    calls = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(calls):
+            function()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_round_seconds:
+            break
+        calls = max(calls * 2, int(calls * min_round_seconds / max(elapsed, 1e-9)))
+    per_call = [elapsed / calls]
+    for _ in range(rounds - 1):
+        started = time.perf_counter()
+        for _ in range(calls):
+            function()
+        per_call.append((time.perf_counter() - started) / calls)
+    return {
+        "median_us": round(statistics.median(per_call) * 1e6, 2),
+        "min_us": round(min(per_call) * 1e6, 2),
+        "calls_per_round": calls,
+        "rounds": rounds,
+    }
+
+
+def run_in_this_process(database: str, size: str, names, rounds: int, min_round_seconds: float) -> dict:
+    """Seeds one database and runs the benchmarks against it. Must run in a fresh process (the app binds its database)."""
+    directory = tempfile.mkdtemp(prefix="unimind-micro-")
+    if database == "memory":
+        os.environ['DATABASE_URL'] = 'sqlite://'
+        os.environ['PREDICTION_MODEL_PATH'] = os.path.join(directory, 'prediction_model.json')
+    else:
+        from benchmarks.seed import use_database
+        use_database(os.path.join(directory, "micro.sqlite"))
+    import sqlalchemy as sa
+    from app import app, db
+    from app.models import User
+    from app.domain import rebuild_all_negative_streaks
+    from app.controller import get_prediction_model
+    from benchmarks.seed import seed_mood_history
+
+    n_users, n_days = SIZES[size]
+    results = {}
+    with app.app_context():
+        existing = db.session.scalar(sa.select(sa.func.count(User.id)))
+        db.session.execute(sa.insert(User), [
+            {"username": f"student{i}", "email": f"student{i}@example.com", "password_hash": "x"}
+            for i in range(existing, n_users)
+        ])
+        db.session.commit()
+        user_ids = db.session.scalars(sa.select(User.id).order_by(User.id)).all()
+        seed_mood_history(n_users, n_days, datetime.now().date() - timedelta(days=1))
+        rebuild_all_negative_streaks()
+        get_prediction_model()
+        context = Context(user_ids)
+        for name in names:
+            results[name] = time_calls(BENCHMARKS[name](context), rounds, min_round_seconds)
+            db.session.rollback()
+    return results
+
+
+def run_all(databases, sizes, names, rounds, min_round_seconds) -> dict:
+    """Runs each database/size combination in a child process; returns {"database/size/name": timings}."""
+    results = {}
+    for size in sizes:
+        for database in databases:
+            command = [sys.executable, "-m", "benchmarks.micro", "--child", database, size,
+                       "--rounds", str(rounds), "--min-round-seconds", str(min_round_seconds), "--only", *names]
+            print(f"running {database}/{size} ({SIZES[size][0]} users x {SIZES[size][1]} days)...", file=sys.stderr)
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            # the result is the last line; anything before it is the app's own output
+            for name, timings in json.loads(output.strip().splitlines()[-1]).items():
+                results[f"{database}/{size}/{name}"] = timings
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Prints each result against the baseline and returns the keys that regressed by more than threshold."""
+    regressions = []
+    print(f"{'benchmark':<44} {'median us':>11} {'baseline':>11} {'change':>8}")
+    for key, timings in results.items():
+        before = baseline.get(key)
+        if before is None:
+            print(f"{key:<44} {timings['median_us']:>11} {'-':>11} {'':>8}")
+            continue
+        change = timings["median_us"] / before["median_us"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(f"{key:<44} {timings['median_us']:>11} {before['median_us']:>11} {change:>+8.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["small", "medium"], choices=list(SIZES))
+    parser.add_argument("--databases", nargs="+", default=list(DATABASES), choices=DATABASES)
+    parser.add_argument("--only", nargs="+", default=list(BENCHMARKS), choices=list(BENCHMARKS), metavar="BENCHMARK")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--min-round-seconds", type=float, default=0.2)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, as a fraction")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--child", nargs=2, metavar=("DATABASE", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        database, size = args.child
+        results = run_in_this_process(database, size, args.only, args.rounds, args.min_round_seconds)
+        print(json.dumps(results))
+        return
+
+    results = run_all(args.databases, args.sizes, args.only, args.rounds, args.min_round_seconds)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as file:
+            json.dump({"saved_at": datetime.now().isoformat(timespec="seconds"),
+                       "results": {**baseline, **results}}, file, indent=2)
+        print(f"baseline saved to {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} benchmark(s) more than {args.threshold:.0%} slower than the baseline")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Helpers shared by the benchmarks: pointing the app at a throwaway database and filling it with synthetic history.
+use_database must be called before anything from app is imported.
+"""
+import os
+import random
+import tempfile
+from datetime import timedelta
+
+# the development database the app uses by default, which benchmarks must never seed, analyse or delete
+DEV_DATABASE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app', 'data', 'data.sqlite')
+
+
+def use_database(path: str = None, fresh: bool = True) -> str:
+    """
+    Points the app at a SQLite file (a temporary one by default) and returns its path.
+    The file is deleted first unless fresh is False, so a previously seeded database can be reused.
+    Raises ValueError for the development database.
+    """
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="unimind-bench-"), "bench.sqlite")
+    if os.path.abspath(path) == DEV_DATABASE:
+        raise ValueError(f"{path} is the development database; benchmark on another file")
+    if fresh and os.path.exists(path):
+        os.remove(path)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    os.environ.setdefault('PREDICTION_MODEL_PATH', os.path.join(os.path.dirname(path), 'prediction_model.json'))
+    return path
+
+
+def synthetic_rows(n_users: int, n_days: int, last_day, seed: int = 0):
+    """Yields Mood_DB-shaped dicts: n_days of history for each of n_users, ending on last_day."""
+    from app.adapter import WEATHER_OPTIONS
+    from app.features import MOOD_LIST
+    rng = random.Random(seed)
+    for user_id in range(1, n_users + 1):
+        for offset in range(n_days - 1, -1, -1):
+            yield {
+                "user_id": user_id,
+                "date": last_day - timedelta(days=offset),
+                "mood": rng.choice(MOOD_LIST),
+                "sentiment_score": round(rng.uniform(-1, 1), 3),
+                "heart_rate": rng.randint(60, 100),
+                "step_count": rng.randint(0, 20000),
+                "sleep_quality": round(rng.uniform(4, 10), 1),
+                "weather": rng.choice(WEATHER_OPTIONS),
+                "exercise_hours": rng.randint(0, 30),
+                "lecture_hours": rng.randint(0, 50),
+                "work_hours": rng.randint(0, 160),
+                "deadlines": rng.randint(0, 10),
+            }
+
+
+def seed_mood_history(n_users: int, n_days: int, last_day, batch_size: int = 50000, seed: int = 0) -> int:
+    """
+    Bulk-inserts synthetic Mood_DB history for users 1 to n_users, creating those that do not exist yet (Mood_DB.user_id
+    is a foreign key), and returns the number of rows written. Needs an app context.
+    """
+    import sqlalchemy as sa
+    from app import db
+    from app.models import Mood_DB, User
+    existing = db.session.scalar(sa.select(sa.func.coalesce(sa.func.max(User.id), 0)))
+    for start in range(existing + 1, n_users + 1, batch_size):
+        db.session.execute(sa.insert(User), [
+            {"id": user_id, "username": f"seeded{user_id}", "email": f"seeded{user_id}@example.com",
+             "password_hash": "x"} for user_id in range(start, min(start + batch_size, n_users + 1))
+        ])
+    batch, total = [], 0
+    for row in synthetic_rows(n_users, n_days, last_day, seed):
+        batch.append(row)
+        if len(batch) == batch_size:
+            db.session.execute(sa.insert(Mood_DB), batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(sa.insert(Mood_DB), batch)
+        total += len(batch)
+    db.session.commit()
+    return total
@@ -7,5 +7,85 @@ class Config:
     UPLOAD_FOLDER = os.path.join(basedir, 'app', 'data', 'uploads')
     MAX_CONTENT_LENGTH = 1 * 1024 * 1024
 
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'app', 'data', 'data.sqlite')
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
+        'sqlite:///' + os.path.join(basedir, 'app', 'data', 'data.sqlite')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Engine profile (see app/database.py): 'sqlite' tunes a shared SQLite file for several workers, 'server' pools
+    # connections to PostgreSQL/MySQL, 'default' leaves SQLAlchemy's settings. Follows the database URL unless set.
+    DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE') or \
+        ('sqlite' if SQLALCHEMY_DATABASE_URI.startswith('sqlite') else 'server')
+    # sqlite profile: how long a writer waits for the lock, page cache size and memory-mapped size
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_CACHE_SIZE_KIB = int(os.environ.get('SQLITE_CACHE_SIZE_KIB', 64 * 1024))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 2**20))
+    # server profile: connections kept open per worker, extra ones allowed under load, seconds to wait for one,
+    # and seconds before a connection is replaced
+    DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', 10))
+    DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW', 20))
+    DATABASE_POOL_TIMEOUT = float(os.environ.get('DATABASE_POOL_TIMEOUT', 30))
+    DATABASE_POOL_RECYCLE = int(os.environ.get('DATABASE_POOL_RECYCLE', 1800))
+
+    # Sentiment analysis reads the VADER lexicon from disk instead of downloading it through NLTK
+    VADER_LEXICON_PATH = os.environ.get('VADER_LEXICON_PATH') or os.path.join(basedir, 'app', 'data', 'vader_lexicon.txt')
+    # Load the lexicon at start-up rather than on the first journal entry
+    SENTIMENT_WARMUP = os.environ.get('SENTIMENT_WARMUP', '').lower() in ('1', 'true', 'yes')
+    # Most recently used sentiment scores kept in memory, and an optional file to keep them across restarts
+    SENTIMENT_CACHE_SIZE = int(os.environ.get('SENTIMENT_CACHE_SIZE', 10000))
+    SENTIMENT_CACHE_PATH = os.environ.get('SENTIMENT_CACHE_PATH')
+
+    # flask backfill-sentiment records its progress here so an interrupted run can resume
+    SENTIMENT_BACKFILL_WATERMARK = os.path.join(basedir, 'app', 'data', 'sentiment_backfill.watermark')
+
+    # Trained PredictionModel state, updated incrementally by `flask train-model`
+    PREDICTION_MODEL_PATH = os.environ.get('PREDICTION_MODEL_PATH') or os.path.join(basedir, 'app', 'data', 'prediction_model.json')
+
+    # Mood history entries shown per page on /data
+    DATA_PAGE_SIZE = int(os.environ.get('DATA_PAGE_SIZE', 30))
+
+    # Rows fetched from the database and formatted at a time by mood history exports
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+    # Description, tips and links shown for each predicted mood; reloaded when the file changes
+    RECOMMENDATIONS_PATH = os.environ.get('RECOMMENDATIONS_PATH') or os.path.join(basedir, 'app', 'data', 'recommendations.json')
+
+    # External data providers used by /predict. Without URLs the simulated ExternalAPI is used.
+    WEATHER_API_URL = os.environ.get('WEATHER_API_URL')
+    WEARABLE_API_URL = os.environ.get('WEARABLE_API_URL')
+    # Seconds to wait for each provider before falling back to its last known value (the user's, or the location's)
+    WEATHER_API_TIMEOUT = float(os.environ.get('WEATHER_API_TIMEOUT', 2.0))
+    WEARABLE_API_TIMEOUT = float(os.environ.get('WEARABLE_API_TIMEOUT', 2.0))
+    # Weather is fetched once per location per WEATHER_CACHE_TTL seconds and shared by all users there
+    WEATHER_LOCATION = os.environ.get('WEATHER_LOCATION', 'Birmingham')
+    WEATHER_CACHE_TTL = float(os.environ.get('WEATHER_CACHE_TTL', 600))
+    # Last known values kept for the fallback: at most this many (one per user, plus one per weather location), each
+    # used for at most this many seconds
+    EXTERNAL_API_LAST_KNOWN_SIZE = int(os.environ.get('EXTERNAL_API_LAST_KNOWN_SIZE', 10000))
+    EXTERNAL_API_LAST_KNOWN_MAX_AGE = float(os.environ.get('EXTERNAL_API_LAST_KNOWN_MAX_AGE', 3 * 3600))
+    # Threads shared by all requests for calling the providers
+    EXTERNAL_API_WORKERS = int(os.environ.get('EXTERNAL_API_WORKERS', 8))
+
+    # Largest number of wearable samples accepted in one upload (a day of 5-minute samples is 288)
+    WEARABLE_MAX_SAMPLES = int(os.environ.get('WEARABLE_MAX_SAMPLES', 10000))
+    # Wearable samples recorded more than this many days ago are rejected, so old days cannot be filled in afterwards
+    WEARABLE_MAX_AGE_DAYS = int(os.environ.get('WEARABLE_MAX_AGE_DAYS', 7))
+    # Store each day's packed wearable samples zlib-compressed (when that makes them smaller)
+    WEARABLE_COMPRESS_BLOCKS = os.environ.get('WEARABLE_COMPRESS_BLOCKS', '1').lower() not in ('0', 'false', 'no')
+
+    # Record request, SQL and section timings and serve them at /metrics in Prometheus format (see app/metrics.py),
+    # only to scrapers sending this bearer token (without one, /metrics refuses everyone)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # Check the SQL each request sends against its route's @query_budget, and log repeated statements and lazy loads
+    # (see app/query_budget.py): 'warn' logs, 'raise' fails the request (for tests). Slow, so 'off' in production.
+    QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE', 'off').lower()
+
+    # Profile single requests with cProfile (see app/profiling.py): those carrying a token from `flask profile-token`
+    # (signed with PROFILING_SECRET, refused while it is unset, valid for PROFILING_TOKEN_MAX_AGE seconds) and a random
+    # PROFILING_SAMPLE_RATE of the rest, keeping the newest PROFILING_MAX_FILES profiles. Off: no cost at all.
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+    PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+    PROFILING_SECRET = os.environ.get('PROFILING_SECRET')
+    PROFILING_TOKEN_MAX_AGE = int(os.environ.get('PROFILING_TOKEN_MAX_AGE', 3600))
+    PROFILING_MAX_FILES = int(os.environ.get('PROFILING_MAX_FILES', 200))
+    PROFILING_DIRECTORY = os.environ.get('PROFILING_DIRECTORY') or os.path.join(basedir, 'app', 'data', 'profiles')
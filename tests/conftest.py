@@ -0,0 +1,51 @@
+import os
+
+# Tests run against their own database (in-memory unless TEST_DATABASE_URL says otherwise)
+# so they never modify app/data/data.sqlite. This must be set before the app is imported.
+os.environ['DATABASE_URL'] = os.environ.get('TEST_DATABASE_URL', 'sqlite://')
+from benchmarks.seed import DEV_DATABASE
+assert os.path.abspath(os.environ['DATABASE_URL'].removeprefix('sqlite:///')) != DEV_DATABASE, \
+    "TEST_DATABASE_URL must not be the development database, which the tests would fill with their own rows"
+# The suite runs with the /metrics instrumentation on, as production may
+os.environ.setdefault('METRICS_ENABLED', '1')
+# and fails any request that sends more SQL statements than its route's @query_budget
+os.environ.setdefault('QUERY_BUDGET_MODE', 'raise')
+
+import pytest
+import sqlalchemy as sa
+from app import app, db
+from app.controller import logged_mood_days
+from app.models import User
+
+# Tests store entries for other students as well as the sample user (id 1). Mood_DB.user_id is a foreign key, so these
+# users must exist; like the sample user, they are created once and kept.
+OTHER_TEST_USERS = (2, 3, 4)
+
+with app.app_context():
+    for number in OTHER_TEST_USERS:
+        if User.query.filter_by(username=f"student{number}").first() is None:
+            user = User(full_name=f"Student {number}", username=f"student{number}",
+                        email=f"student{number}@university.edu")
+            user.set_password("password123")
+            db.session.add(user)
+            db.session.commit()
+    assert [user.id for user in User.query.order_by(User.id)][:4] == [1, *OTHER_TEST_USERS], \
+        "the test database must start empty, so the test users get ids 1 to 4"
+
+
+"""
+database provides an application context for tests that read or write real rows. Everything except the sample user
+created at start-up and OTHER_TEST_USERS is deleted afterwards so tests do not see each other's data, along with the
+days the 6pm gate remembers users as having logged.
+"""
+@pytest.fixture
+def database():
+    with app.app_context():
+        yield db
+        db.session.rollback()
+        for table in reversed(db.metadata.sorted_tables):
+            if table.name not in ('user', 'emergency_contact'):
+                db.session.execute(table.delete())
+        db.session.execute(sa.delete(User).where(User.id.not_in([1, *OTHER_TEST_USERS])))
+        db.session.commit()
+        logged_mood_days.clear()
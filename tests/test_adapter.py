@@ -0,0 +1,262 @@
+import json
+import threading
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import pytest
+from app.adapter import HTTPExternalAPI, ConcurrentAPIAdapter, DataSource, LatencyHistogram, external_api_sources, \
+    source_latency, LastKnownValues, WeatherCache, CachedWeatherAPI, ExternalAPI
+
+
+"""
+stub_server runs a local HTTP server standing in for the weather and wearable providers. Each path's response
+can be delayed, or made to fail, through the returned settings dict.
+"""
+@pytest.fixture
+def stub_server():
+    settings = {"/weather": {"delay": 0, "status": 200}, "/wearable": {"delay": 0, "status": 200}}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            setting = settings[url.path]
+            time.sleep(setting["delay"])
+            if url.path == "/weather":
+                body = {"weather": "Rainy"}
+            else:
+                body = {"heart_rate": 72, "step_count": 9000, "sleep_quality": 7.5,
+                        "user_id": int(parse_qs(url.query)["user_id"][0])}
+            data = json.dumps(body).encode()
+            self.send_response(setting["status"])
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    settings["url"] = f"http://127.0.0.1:{server.server_port}"
+    yield settings
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    source_latency.clear()
+
+
+def make_adapter(stub_server, timeout=1.0, user_id=7, last_known=None):
+    api = HTTPExternalAPI(api_id=2, api_name="Stub", api_key="test", weather_url=stub_server["url"] + "/weather",
+                          wearable_url=stub_server["url"] + "/wearable", timeout=5)
+    return ConcurrentAPIAdapter(external_api_sources(api, timeout, timeout, location="Birmingham"), user_id,
+                                executor=ThreadPoolExecutor(max_workers=4), last_known=last_known)
+
+
+"""
+test_fetch_from_http_providers checks a MoodEntry is built from both stub providers' JSON.
+"""
+def test_fetch_from_http_providers(stub_server):
+    entry = make_adapter(stub_server).fetch_mood_entry()
+    assert (entry.user_id, entry.weather, entry.heart_rate, entry.step_count, entry.sleep_quality) == \
+        (7, "Rainy", 72, 9000, 7.5)
+    assert source_latency["weather"].count == 1 and source_latency["wearable"].count == 1
+
+
+"""
+test_sources_fetched_concurrently checks two providers that each take 0.3s are waited on together, not one after the
+other.
+"""
+def test_sources_fetched_concurrently(stub_server):
+    stub_server["/weather"]["delay"] = stub_server["/wearable"]["delay"] = 0.3
+    started = time.perf_counter()
+    make_adapter(stub_server).fetch_mood_entry()
+    assert time.perf_counter() - started < 0.55
+
+
+"""
+test_timeout_falls_back_to_last_known checks a provider slower than its timeout is abandoned at the timeout, and the
+value it last returned for the user is used instead (or None if it never returned one), with the timeout counted.
+"""
+def test_timeout_falls_back_to_last_known(stub_server):
+    last_known = LastKnownValues()
+    adapter = make_adapter(stub_server, timeout=0.2, last_known=last_known)
+    adapter.fetch_mood_entry()
+
+    stub_server["/wearable"]["delay"] = 1.0
+    started = time.perf_counter()
+    entry = adapter.fetch_mood_entry()
+    assert time.perf_counter() - started < 0.6
+    assert entry.heart_rate == 72 and entry.weather == "Rainy"
+    assert source_latency["wearable"].timeouts == 1
+
+    # weather is kept by location, so another user falls back to it too, but not to user 7's wearable data
+    stub_server["/weather"]["delay"] = 1.0
+    entry = make_adapter(stub_server, timeout=0.2, user_id=8, last_known=last_known).fetch_mood_entry()
+    assert entry.heart_rate is None and entry.weather == "Rainy"
+    assert len(last_known) == 2
+
+
+"""
+test_last_known_values_bounded checks last known values are dropped once older than max_age, and that only the
+maxsize most recently used keys are kept.
+"""
+def test_last_known_values_bounded():
+    now = [0.0]
+    last_known = LastKnownValues(maxsize=2, max_age=60, clock=lambda: now[0])
+    last_known.put(("wearable", 1), "one")
+    last_known.put(("wearable", 2), "two")
+    assert last_known.get(("wearable", 1)) == "one"
+    last_known.put(("wearable", 3), "three")
+    assert len(last_known) == 2
+    assert last_known.get(("wearable", 2)) is None and last_known.get(("wearable", 1)) == "one"
+
+    now[0] = 61
+    assert last_known.get(("wearable", 1)) is None and last_known.get(("wearable", 3)) is None
+
+
+"""
+test_error_falls_back_to_last_known checks a provider answering with an HTTP error is counted as an error and replaced
+by its last known value.
+"""
+def test_error_falls_back_to_last_known(stub_server):
+    adapter = make_adapter(stub_server)
+    adapter.fetch_mood_entry()
+    stub_server["/weather"]["status"] = 503
+    entry = adapter.fetch_mood_entry()
+    assert entry.weather == "Rainy"
+    assert source_latency["weather"].errors == 1
+
+
+"""
+test_timeout_keeps_stored_readings checks a prediction made while every source times out, with no last known values
+(as after a restart), leaves the readings already stored in today's Mood_DB row as they were.
+"""
+def test_timeout_keeps_stored_readings(stub_server, database, monkeypatch):
+    import app.controller as controller
+    from app.models import Mood_DB, User
+    today = datetime.now().date()
+    database.session.add(Mood_DB(user_id=1, date=today, mood="Calm", weather="Sunny", heart_rate=65, step_count=4000,
+                                 sleep_quality=7.5))
+    database.session.commit()
+    stub_server["/weather"]["delay"] = stub_server["/wearable"]["delay"] = 1.0
+    monkeypatch.setattr(controller, 'make_external_adapter', lambda user_id: make_adapter(stub_server, 0.2, user_id))
+    controller.process_prediction(database.session.get(User, 1))
+    record = Mood_DB.query.filter_by(user_id=1, date=today).one()
+    assert (record.weather, record.heart_rate, record.step_count, record.sleep_quality) == ("Sunny", 65, 4000, 7.5)
+    assert record.work_hours is not None
+
+
+"""
+test_simulated_sources checks the adapter also works over the simulated ExternalAPI-style callables.
+"""
+def test_simulated_sources():
+    sources = [DataSource("weather", lambda user_id: "Sunny", 1.0),
+               DataSource("wearable", lambda user_id: {"heart_rate": 60}, 1.0)]
+    entry = ConcurrentAPIAdapter(sources, 3, executor=ThreadPoolExecutor(max_workers=2)).fetch_mood_entry()
+    assert entry.weather == "Sunny" and entry.heart_rate == 60 and entry.step_count is None
+
+
+"""
+test_latency_histogram checks observations land in the right cumulative buckets and quantiles read from them.
+"""
+def test_latency_histogram():
+    histogram = LatencyHistogram()
+    for seconds in (0.004, 0.02, 0.02, 0.3, 20):
+        histogram.observe(seconds)
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 5
+    assert snapshot["buckets"][0.005] == 1 and snapshot["buckets"][0.025] == 3 and snapshot["buckets"][float("inf")] == 5
+    assert histogram.quantile(0.5) == 0.025
+    assert histogram.quantile(0.99) == float("inf")
+    assert LatencyHistogram().quantile(0.5) is None
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+"""
+test_weather_cache_ttl checks weather is fetched once per location per time bucket, and again once the bucket moves on.
+"""
+def test_weather_cache_ttl():
+    clock = FakeClock()
+    cache = WeatherCache(ttl=600, clock=clock)
+    calls = []
+
+    def fetch():
+        calls.append(clock.now)
+        return f"weather {len(calls)}"
+
+    assert cache.get("Birmingham", fetch) == "weather 1"
+    clock.now += 100
+    assert cache.get("Birmingham", fetch) == "weather 1"
+    assert cache.get("London", fetch) == "weather 2"
+    clock.now += 600
+    assert cache.get("Birmingham", fetch) == "weather 3"
+    assert len(calls) == 3
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 3
+    assert cache.hit_rate == 0.25
+
+
+"""
+test_weather_cache_single_flight checks that many concurrent misses for the same key make exactly one provider call
+and all get its result.
+"""
+def test_weather_cache_single_flight():
+    cache = WeatherCache(ttl=600)
+    calls = []
+    release = threading.Event()
+
+    def slow_fetch():
+        calls.append(1)
+        release.wait(2)
+        return "Sunny"
+
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        results = [pool.submit(cache.get, "Birmingham", slow_fetch) for _ in range(20)]
+        while cache.coalesced < 19:
+            time.sleep(0.01)
+        release.set()
+        assert [result.result(timeout=2) for result in results] == ["Sunny"] * 20
+    assert len(calls) == 1
+    assert cache.stats()["misses"] == 1 and cache.stats()["coalesced"] == 19
+
+
+"""
+test_weather_cache_errors checks a failed fetch reaches the caller, is counted, and is not cached.
+"""
+def test_weather_cache_errors():
+    cache = WeatherCache(ttl=600)
+
+    def failing_fetch():
+        raise OSError("provider down")
+
+    with pytest.raises(OSError):
+        cache.get("Birmingham", failing_fetch)
+    assert cache.get("Birmingham", lambda: "Cloudy") == "Cloudy"
+    assert cache.stats()["errors"] == 1
+
+
+"""
+test_cached_weather_api checks CachedWeatherAPI shares weather between users but passes wearable data straight through.
+"""
+def test_cached_weather_api():
+    cache = WeatherCache(ttl=600)
+    api = CachedWeatherAPI(ExternalAPI(api_id=2, api_name="Sim", api_key="test"), cache, "Birmingham")
+    sources = external_api_sources(api, 1.0, 1.0)
+    entries = [ConcurrentAPIAdapter(sources, user_id, executor=ThreadPoolExecutor(max_workers=2)).fetch_mood_entry()
+               for user_id in range(1, 6)]
+    assert len({entry.weather for entry in entries}) == 1
+    assert all(entry.heart_rate is not None for entry in entries)
+    assert cache.stats()["misses"] == 1 and cache.stats()["hits"] == 4
@@ -0,0 +1,58 @@
+import pytest
+import sqlalchemy as sa
+from app import app, db
+from app.database import engine_options, configure_engine
+
+
+"""
+test_engine_options checks each profile's engine options, and that an unknown profile is refused.
+"""
+def test_engine_options():
+    config = dict(app.config)
+    config['DATABASE_PROFILE'] = 'server'
+    options = engine_options(config)
+    assert options['pool_pre_ping'] is True
+    assert (options['pool_size'], options['max_overflow']) == (config['DATABASE_POOL_SIZE'],
+                                                               config['DATABASE_MAX_OVERFLOW'])
+    config['DATABASE_PROFILE'] = 'sqlite'
+    assert engine_options(config) == {}
+    config['DATABASE_PROFILE'] = 'oracle'
+    with pytest.raises(ValueError):
+        engine_options(config)
+
+
+"""
+test_sqlite_profile_pragmas checks the sqlite profile puts every new connection to a SQLite file in WAL mode with the
+configured busy timeout, cache and synchronous settings, and that other profiles leave the connection alone.
+"""
+def test_sqlite_profile_pragmas(tmp_path):
+    config = dict(app.config, DATABASE_PROFILE='sqlite', SQLITE_BUSY_TIMEOUT_MS=1234)
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'wal.sqlite'}", **engine_options(config))
+    configure_engine(engine, config)
+    with engine.connect() as connection:
+        pragma = lambda name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+        assert pragma("journal_mode") == "wal"
+        assert pragma("busy_timeout") == 1234
+        assert pragma("synchronous") == 1  # NORMAL
+        assert pragma("cache_size") == -config['SQLITE_CACHE_SIZE_KIB']
+    engine.dispose()
+
+    config['DATABASE_PROFILE'] = 'default'
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'plain.sqlite'}")
+    configure_engine(engine, config)
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "delete"
+    engine.dispose()
+
+
+"""
+test_app_engine_profile checks the app's own engine was set up for the configured profile.
+"""
+def test_app_engine_profile():
+    with app.app_context():
+        if app.config['DATABASE_PROFILE'] == 'server':
+            assert db.engine.pool._pre_ping
+        elif app.config['DATABASE_PROFILE'] == 'sqlite' and db.engine.dialect.name == 'sqlite':
+            with db.engine.connect() as connection:
+                busy_timeout = connection.exec_driver_sql("PRAGMA busy_timeout").scalar()
+            assert busy_timeout == app.config['SQLITE_BUSY_TIMEOUT_MS']
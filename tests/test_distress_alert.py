@@ -1,5 +1,7 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from app.controller import DistressAlert
+from app.domain import MoodEntry, rebuild_all_negative_streaks
+from app.models import Mood_DB, MoodStreak
 import pytest
 from unittest.mock import patch, Mock
 
@@ -35,7 +37,8 @@ negative mood entries.
 def test_triggerAlert_positive():
     instance = DistressAlert(user_id=1)
 
-    with patch.object(DistressAlert, 'retrieve_previous_7_entries') as mock_retrieve, \
+    with patch.object(DistressAlert, 'negative_streak_before', return_value=None), \
+        patch.object(DistressAlert, 'retrieve_previous_7_entries') as mock_retrieve, \
         patch.object(DistressAlert, 'check_for_negative_entries') as mock_check:
 
         mock_retrieve.return_value = create_test_mood_entries(7, negative=True)
@@ -83,4 +86,78 @@ def test_check_for_negative_entries_negative():
 """
 retrieve_previous_7_entries() function is not tested here as it relies heavily on database interactions. Therefore, it 
 should be tested during integration tests rather than unit tests. 
-"""
\ No newline at end of file
+"""
+
+
+"""
+test_check_for_negative_entries_by_mood checks that a negative mood on its own counts as a negative entry, even without
+a journal sentiment score.
+"""
+def test_check_for_negative_entries_by_mood():
+    test_entries = [FakeMoodEntry(datetime.now() - timedelta(days=i + 1), "Stressed", None) for i in range(7)]
+
+    assert DistressAlert(user_id=1).check_for_negative_entries(test_entries) is True
+
+
+def store_moods(moods, first_day=date(2025, 1, 1)):
+    for i, mood in enumerate(moods):
+        MoodEntry(user_id=1, date=first_day + timedelta(days=i), mood=mood).storeEntry()
+
+
+"""
+test_streak_tracks_stored_entries checks MoodEntry.storeEntry keeps the user's MoodStreak up to date, including when the
+newest entry changes, and that triggerAlert answers from it without the 7-entry query.
+"""
+def test_streak_tracks_stored_entries(database):
+    store_moods(["Happy"] + ["Sad"] * 7 + ["Calm"])
+    today = Mood_DB.query.filter_by(user_id=1, date=date(2025, 1, 9)).first()
+    streak = database.session.get(MoodStreak, 1)
+    assert (streak.last_entry_date, streak.negative_days_before, streak.negative_days) == (date(2025, 1, 9), 7, 0)
+
+    with patch.object(DistressAlert, 'retrieve_previous_7_entries') as mock_retrieve:
+        assert DistressAlert(user_id=1).triggerAlert(today) is True
+        mock_retrieve.assert_not_called()
+
+    MoodEntry(user_id=1, date=date(2025, 1, 9), mood="Angry").storeEntry()
+    assert streak.negative_days == 8
+
+
+"""
+test_streak_recounts_when_older_entry_changes checks editing an older entry falls back to recounting from history, and
+that rebuild_all_negative_streaks gives the same result as the incremental updates.
+"""
+def test_streak_recounts_when_older_entry_changes(database):
+    store_moods(["Sad"] * 5)
+    MoodEntry(user_id=1, date=date(2025, 1, 3), mood="Happy").storeEntry()
+    streak = database.session.get(MoodStreak, 1)
+    assert (streak.negative_days_before, streak.negative_days) == (1, 2)
+
+    assert rebuild_all_negative_streaks() == 1
+    streak = database.session.get(MoodStreak, 1)
+    assert (streak.last_entry_date, streak.negative_days) == (date(2025, 1, 5), 2)
+
+
+"""
+test_scan_cohort_finds_at_risk_users checks the cohort scan flags only users whose last 7 entries up to the scan date are
+all negative, by mood or by sentiment, and that re-running a scan replaces its earlier results.
+"""
+def test_scan_cohort_finds_at_risk_users(database):
+    from app.models import CohortAlert
+    first_day = date(2025, 1, 1)
+    history = {
+        1: [("Sad", None)] * 4 + [("Happy", -0.5)] * 3,   # negative by mood, then by sentiment
+        2: [("Sad", None)] * 6,                             # only 6 entries
+        3: [("Happy", None)] + [("Sad", None)] * 6,         # one positive entry among the last 7
+        4: [("Happy", None)] + [("Angry", None)] * 7,       # positive entry is older than the last 7
+    }
+    for user_id, entries in history.items():
+        for i, (mood, score) in enumerate(entries):
+            database.session.add(Mood_DB(user_id=user_id, date=first_day + timedelta(days=i), mood=mood,
+                                         sentiment_score=score))
+    database.session.add(Mood_DB(user_id=1, date=date(2025, 2, 1), mood="Happy"))
+    database.session.commit()
+
+    assert DistressAlert.scan_cohort(date(2025, 1, 31)) == 2
+    assert DistressAlert.scan_cohort(date(2025, 1, 31)) == 2
+    alerts = CohortAlert.query.order_by(CohortAlert.user_id).all()
+    assert [(alert.user_id, alert.last_entry_date) for alert in alerts] == [(1, date(2025, 1, 7)), (4, date(2025, 1, 8))]
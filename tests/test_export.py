@@ -0,0 +1,119 @@
+import csv
+import gzip
+import io
+import json
+from datetime import date, timedelta
+import pytest
+import sqlalchemy as sa
+from app import app
+from app.export import EXPORT_COLUMNS, export_moods
+from app.models import Mood_DB
+
+
+"""
+history gives users 1 and 2 five entries each, the first one with journal text that needs quoting in CSV.
+"""
+@pytest.fixture
+def history(database):
+    start = date(2025, 3, 1)
+    database.session.execute(sa.insert(Mood_DB), [
+        {"user_id": user_id, "date": start + timedelta(days=day), "mood": "Calm", "sentiment_score": 0.25,
+         "heart_rate": 70 + day, "journal_text": 'Tired, but "fine"\nreally' if day == 0 else None}
+        for user_id in (1, 2) for day in range(5)
+    ])
+    database.session.commit()
+    return start
+
+
+"""
+test_export_csv checks the CSV export has a header and one row per entry of that user, in date order, with text
+containing commas, quotes and newlines kept intact. A batch size of 2 makes the rows arrive in several chunks.
+"""
+def test_export_csv(history):
+    chunks = list(export_moods("csv", user_id=1, batch_size=2))
+    assert len(chunks) == 3
+    rows = list(csv.DictReader(io.StringIO("".join(chunks))))
+    assert list(rows[0]) == EXPORT_COLUMNS
+    assert [row["date"] for row in rows] == [str(history + timedelta(days=day)) for day in range(5)]
+    assert {row["user_id"] for row in rows} == {"1"}
+    assert rows[0]["journal_text"] == 'Tired, but "fine"\nreally'
+    assert rows[1]["heart_rate"] == "71" and rows[1]["journal_text"] == ""
+
+
+"""
+test_export_csv_formulas checks journal text a spreadsheet would run as a formula is exported in CSV behind a ', so it
+is shown as text, while NDJSON and numbers (negative sentiment scores) are exported unchanged.
+"""
+def test_export_csv_formulas(database):
+    texts = ['=HYPERLINK("http://example.com","click")', "+1 day", "-ish", "@SUM(A1)", "fine = ok"]
+    database.session.execute(sa.insert(Mood_DB), [
+        {"user_id": 1, "date": date(2025, 3, 1) + timedelta(days=day), "mood": "Sad", "sentiment_score": -0.5,
+         "journal_text": text} for day, text in enumerate(texts)
+    ])
+    database.session.commit()
+    rows = list(csv.DictReader(io.StringIO("".join(export_moods("csv", user_id=1)))))
+    assert [row["journal_text"] for row in rows] == ["'" + text for text in texts[:4]] + ["fine = ok"]
+    assert {row["sentiment_score"] for row in rows} == {"-0.5"}
+    records = [json.loads(line) for line in "".join(export_moods("ndjson", user_id=1)).splitlines()]
+    assert [record["journal_text"] for record in records] == texts
+
+
+"""
+test_export_ndjson_all_users checks the NDJSON export of every user is one JSON object per line, grouped by user.
+"""
+def test_export_ndjson_all_users(history):
+    lines = "".join(export_moods("ndjson", batch_size=3)).splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [record["user_id"] for record in records] == [1] * 5 + [2] * 5
+    assert records[0]["date"] == history.isoformat()
+    assert records[0]["sentiment_score"] == 0.25 and records[1]["journal_text"] is None
+
+
+"""
+test_export_gzip checks gzipped output decompresses to the same export.
+"""
+def test_export_gzip(history):
+    compressed = b"".join(export_moods("ndjson", user_id=2, compress=True))
+    assert gzip.decompress(compressed).decode() == "".join(export_moods("ndjson", user_id=2))
+
+
+"""
+test_export_empty checks a user with no entries gets just the CSV header, and an unknown format is refused.
+"""
+def test_export_empty(database):
+    assert "".join(export_moods("csv", user_id=1)) == ",".join(EXPORT_COLUMNS) + "\r\n"
+    with pytest.raises(ValueError):
+        export_moods("xml")
+
+
+"""
+test_export_view checks /export streams the logged-in user's history as a download, and rejects unknown formats.
+"""
+def test_export_view(history, database):
+    # logged today, so the 6pm gate lets the request through
+    database.session.add(Mood_DB(user_id=1, date=date.today(), mood="Happy"))
+    database.session.commit()
+    with app.test_client() as client:
+        with client.session_transaction() as session:
+            session['prediction_shown'] = str(date.today())
+        response = client.get('/export?format=csv&gzip=1')
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.headers['Content-Disposition'] == 'attachment; filename="mood_history.csv.gz"'
+        rows = list(csv.reader(io.StringIO(gzip.decompress(response.data).decode())))
+        assert len(rows) == 7 and all(row[0] == "1" for row in rows[1:])
+
+        assert client.get('/export?format=xml').status_code == 400
+
+
+"""
+test_export_command checks `flask export-moods` writes the cohort dump to a file and insists on a user or --all-users.
+"""
+def test_export_command(history, tmp_path):
+    output = tmp_path / "moods.ndjson.gz"
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['export-moods', str(output), '--format', 'ndjson', '--gzip', '--all-users'])
+    assert result.exit_code == 0, result.output
+    assert len(gzip.decompress(output.read_bytes()).splitlines()) == 10
+
+    assert runner.invoke(args=['export-moods', str(output)]).exit_code != 0
@@ -0,0 +1,195 @@
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+import pytest
+import app.ingest as ingest
+import app.views as views
+from app import app
+from app.ingest import validate_samples, ingest_samples
+from app.models import Mood_DB, WearableDay, MoodStreak
+from app.timeseries import decode_day, empty_day, encode_day, filled_slots
+
+
+class FakeDatetime(datetime):
+    """datetime whose now() is 7pm today, past the 6pm mood-logging cutoff."""
+    @classmethod
+    def now(cls, tz=None):
+        return datetime.combine(datetime.now().date(), datetime.min.time()).replace(hour=19)
+
+
+def day_of_samples(day, count=288, heart_rate=70, steps=10):
+    start = datetime.combine(day, datetime.min.time())
+    return [{"recorded_at": (start + timedelta(minutes=5 * i)).isoformat(), "heart_rate": heart_rate, "steps": steps}
+            for i in range(count)]
+
+
+"""
+test_validate_samples checks each kind of bad sample (including ones from the future or older than the maximum age) is
+rejected with its index, that times are snapped to their 5-minute slot, and that a slot sent twice in one upload is
+kept once.
+"""
+def test_validate_samples():
+    now = datetime(2025, 3, 1, 12, 0)
+    rows, rejected = validate_samples([
+        {"recorded_at": "2025-03-01T09:03:27", "heart_rate": 71},
+        {"recorded_at": "2025-03-01T09:04:00", "heart_rate": 72, "steps": 40},
+        {"recorded_at": "yesterday", "heart_rate": 70},
+        {"heart_rate": 70},
+        {"recorded_at": "2025-03-01T09:10:00", "heart_rate": 400},
+        {"recorded_at": "2025-03-01T09:10:00", "steps": 1.5},
+        {"recorded_at": "2025-03-01T09:10:00", "sleep_quality": True},
+        {"recorded_at": "2025-03-01T09:10:00"},
+        {"recorded_at": "2025-03-02T09:10:00", "steps": 3},
+        "not a sample",
+        {"recorded_at": "2025-03-01T09:15:00", "sleep_quality": 8},
+        {"recorded_at": "2025-02-20T09:15:00", "sleep_quality": 8},
+    ], now=now, max_age_days=7)
+    assert [item["index"] for item in rejected] == [2, 3, 4, 5, 6, 7, 8, 9, 11]
+    assert rejected[0]["error"] == "recorded_at must be an ISO 8601 date and time"
+    assert rejected[2]["error"] == "heart_rate must be between 20 and 250"
+    assert rejected[6]["error"] == "recorded_at is in the future"
+    assert rejected[8]["error"] == "recorded_at is more than 7 days ago"
+    assert rows == [
+        {"recorded_at": datetime(2025, 3, 1, 9, 0), "heart_rate": 72, "steps": 40, "sleep_quality": None},
+        {"recorded_at": datetime(2025, 3, 1, 9, 15), "heart_rate": None, "steps": None, "sleep_quality": 8},
+    ]
+
+
+"""
+test_validate_samples_timezone checks times with an offset are stored in server local time.
+"""
+def test_validate_samples_timezone():
+    utc = datetime(2025, 3, 1, 9, 0, tzinfo=timezone.utc)
+    rows, _ = validate_samples([{"recorded_at": utc.isoformat(), "heart_rate": 60}], now=datetime(2025, 3, 2))
+    assert rows[0]["recorded_at"] == utc.astimezone().replace(tzinfo=None)
+
+
+"""
+test_ingest_summarises_day checks an upload is stored, re-uploads are counted as duplicates and not stored twice, and
+the day's Mood_DB row (created if needed) gets the average heart rate and total steps.
+"""
+def test_ingest_summarises_day(database):
+    day = datetime.now().date() - timedelta(days=1)
+    result = ingest_samples(1, day_of_samples(day, count=100))
+    assert (result["accepted"], result["stored"], result["duplicates"]) == (100, 100, 0)
+    assert result["days"] == [day.isoformat()]
+
+    result = ingest_samples(1, day_of_samples(day, count=200, heart_rate=80))
+    assert (result["stored"], result["duplicates"]) == (100, 100)
+    block = WearableDay.query.filter_by(user_id=1, date=day).one()
+    series = decode_day(block.samples)
+    assert filled_slots(series).sum() == 200
+    assert series["heart_rate"][99] == 70 and series["heart_rate"][100] == 80
+
+    record = Mood_DB.query.filter_by(user_id=1, date=day).one()
+    assert (record.heart_rate, record.step_count, record.sleep_quality) == (75, 2000, None)
+    assert database.session.get(MoodStreak, 1).last_entry_date == day
+
+
+"""
+test_upload_endpoint checks the upload API accepts a full day in one request, reports rejected samples, refuses
+malformed bodies and oversized uploads, stores nothing for days past WEARABLE_MAX_AGE_DAYS, and is not redirected by
+the 6pm/8am prompts.
+"""
+def test_upload_endpoint(database, monkeypatch):
+    day = datetime.now().date() - timedelta(days=1)
+    samples = day_of_samples(day) + [{"recorded_at": day.isoformat() + "T10:00:00", "heart_rate": -1}]
+    with app.test_client() as client, patch.object(views, 'datetime', FakeDatetime):
+        response = client.post('/api/wearable/samples', json={"samples": samples})
+        assert response.status_code == 200
+        assert response.json["stored"] == 288
+        assert response.json["rejected"] == [{"index": 288, "error": "heart_rate must be between 20 and 250"}]
+
+        assert client.post('/api/wearable/samples', data="not json").status_code == 400
+        assert client.post('/api/wearable/samples', json=samples).status_code == 400
+        monkeypatch.setitem(app.config, 'WEARABLE_MAX_SAMPLES', 100)
+        assert client.post('/api/wearable/samples', json={"samples": samples}).status_code == 413
+
+        # a day older than WEARABLE_MAX_AGE_DAYS is refused without creating any rows for it
+        old_day = day - timedelta(days=app.config['WEARABLE_MAX_AGE_DAYS'])
+        response = client.post('/api/wearable/samples', json={"samples": day_of_samples(old_day, count=10)})
+        assert response.json["stored"] == 0 and len(response.json["rejected"]) == 10
+    assert Mood_DB.query.filter_by(user_id=1, date=day).one().step_count == 2880
+    assert Mood_DB.query.filter_by(user_id=1, date=old_day).first() is None
+    assert WearableDay.query.filter_by(user_id=1, date=old_day).first() is None
+
+
+# Two uploads for the same new day, in threads with their own connections to a SQLite file (the in-memory test
+# database has only one connection). Each waits in merge_samples for the other to read the day too, as long as the
+# other is not held back by the write lock, so without the lock one upload overwrites the other's block.
+CONCURRENT_UPLOADS = """
+import json, sys, threading
+from datetime import datetime, timedelta
+import app.ingest as ingest
+from app import app
+from app.ingest import ingest_samples
+from app.models import WearableDay
+from app.timeseries import decode_day, filled_slots
+
+day = datetime.now().date() - timedelta(days=1)
+both_read = threading.Barrier(2)
+merge_samples = ingest.merge_samples
+
+def merge_when_both_read(series, rows):
+    try:
+        both_read.wait(timeout=1)
+    except threading.BrokenBarrierError:
+        pass
+    return merge_samples(series, rows)
+
+ingest.merge_samples = merge_when_both_read
+results = []
+
+def upload(hour):
+    with app.app_context():
+        samples = [{"recorded_at": f"{day.isoformat()}T{hour:02d}:00:00", "heart_rate": 70}]
+        results.append(ingest_samples(1, samples)["stored"])
+
+threads = [threading.Thread(target=upload, args=(hour,)) for hour in (9, 10)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+with app.app_context():
+    block = WearableDay.query.filter_by(user_id=1, date=day).one()
+    print(json.dumps({"stored": results, "slots": int(filled_slots(decode_day(block.samples)).sum())}))
+"""
+
+
+"""
+test_concurrent_uploads checks two uploads for the same user and day at once both end up in the day's block, on a
+SQLite file as deployed with the sqlite profile.
+"""
+def test_concurrent_uploads(tmp_path):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'concurrent.sqlite'}", DATABASE_PROFILE='sqlite',
+               PREDICTION_MODEL_PATH=str(tmp_path / 'prediction_model.json'), QUERY_BUDGET_MODE='off')
+    output = subprocess.run([sys.executable, "-c", CONCURRENT_UPLOADS], env=env, check=True, capture_output=True,
+                            text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    assert result == {"stored": [1, 1], "slots": 2}
+
+
+"""
+test_ingest_retries_lost_race checks an upload that finds another upload created its day first (a unique constraint
+error at commit) is merged again rather than failing.
+"""
+def test_ingest_retries_lost_race(database, monkeypatch):
+    day = datetime.now().date() - timedelta(days=1)
+    store_samples = ingest.store_samples
+    calls = []
+
+    def store_after_other_upload(user_id, rows):
+        stored = store_samples(user_id, rows)
+        if not calls:
+            # as if another upload had inserted the same day's block in between
+            database.session.add(WearableDay(user_id=user_id, date=day, samples=encode_day(empty_day())))
+        calls.append(user_id)
+        return stored
+
+    monkeypatch.setattr(ingest, 'store_samples', store_after_other_upload)
+    assert ingest_samples(1, day_of_samples(day, count=10))["stored"] == 10
+    assert len(calls) == 2
+    assert filled_slots(decode_day(WearableDay.query.filter_by(user_id=1, date=day).one().samples)).sum() == 10
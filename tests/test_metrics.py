@@ -0,0 +1,78 @@
+import re
+from unittest.mock import patch
+import pytest
+import app.views as views
+import app.metrics as metrics_module
+from app import app
+from app.metrics import metrics, timer, render_metrics, PROMETHEUS_CONTENT_TYPE
+from tests.test_views import FakeDatetime
+
+# a sample line of the Prometheus text format: name, optional {labels}, value
+SAMPLE_LINE = re.compile(r'^[a-z_]+(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? -?[0-9.e+-]+$|^[a-z_]+\{.*\} \d+$')
+
+
+@pytest.fixture
+def recorded(database):
+    metrics.clear()
+    yield metrics
+    metrics.clear()
+
+
+def sample_value(text: str, prefix: str) -> float:
+    line = next(line for line in text.splitlines() if line.startswith(prefix))
+    return float(line.rsplit(" ", 1)[1])
+
+
+"""
+test_metrics_endpoint checks requests are counted and timed by endpoint along with the SQL they send, and that
+/metrics answers in Prometheus text format without being held back by the 6pm/8am prompts.
+"""
+def test_metrics_endpoint(recorded, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 'secret')
+    with app.test_client() as client, patch.object(views, 'datetime', FakeDatetime):
+        client.get('/log_mood')
+        client.get('/log_mood')
+        response = client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+    assert response.status_code == 200
+    assert response.content_type == PROMETHEUS_CONTENT_TYPE
+    text = response.get_data(as_text=True)
+    # both are redirected to the day's prediction first
+    assert sample_value(text, 'unimind_requests_total{endpoint="log_mood",method="GET",status="302"}') == 2
+    assert sample_value(text, 'unimind_request_duration_seconds_count{endpoint="log_mood",method="GET"}') == 2
+    assert sample_value(text, 'unimind_request_duration_seconds_bucket{endpoint="log_mood",method="GET",le="+Inf"}') == 2
+    # the first request logs the sample user in
+    assert sample_value(text, 'unimind_sql_statements_total{endpoint="log_mood",operation="SELECT"}') >= 1
+    assert sample_value(text, 'unimind_sql_duration_seconds_count{operation="SELECT"}') >= 1
+    assert 'unimind_cache_lookups_total{cache="sentiment",result="hit"}' in text
+    for line in text.splitlines():
+        assert line.startswith("# ") or SAMPLE_LINE.match(line), line
+
+
+"""
+test_metrics_token checks /metrics is refused without the bearer token, and to everyone while no METRICS_TOKEN is
+configured.
+"""
+def test_metrics_token(recorded, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 'secret')
+    with app.test_client() as client:
+        assert client.get('/metrics').status_code == 403
+        assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+        assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
+        monkeypatch.setitem(app.config, 'METRICS_TOKEN', None)
+        assert client.get('/metrics').status_code == 403
+        assert client.get('/metrics', headers={'Authorization': 'Bearer None'}).status_code == 403
+
+
+"""
+test_section_timer checks timed sections are recorded as histograms, and that timing is a no-op when disabled.
+"""
+def test_section_timer(recorded, monkeypatch):
+    with timer("example"):
+        pass
+    assert metrics.sections["example"].count == 1
+    assert sample_value(render_metrics(), 'unimind_section_duration_seconds_count{section="example"}') == 1
+
+    monkeypatch.setattr(metrics_module, 'enabled', False)
+    with timer("example"):
+        pass
+    assert metrics.sections["example"].count == 1
@@ -0,0 +1,30 @@
+from datetime import date
+import pytest
+from app import app
+from app.migrations import parse_legacy_text_columns
+from app.models import Mood_DB
+
+
+"""
+test_parse_legacy_text_columns checks rows written with the old "HR: x, Steps: y,SQ: z" and timetable strings get their
+typed columns filled in, and rows without those strings are left alone. The old timetable strings are longer than
+their VARCHAR(50) column, which only SQLite accepted, so legacy rows (and this test) only exist on SQLite.
+"""
+@pytest.mark.skipif(not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'),
+                    reason="legacy timetable strings do not fit their column on other databases")
+def test_parse_legacy_text_columns(database):
+    legacy = Mood_DB(user_id=1, date=date(2025, 1, 1), smartwatch_data="HR: 72, Steps: 8500,SQ: 6.5",
+                     timetable="Exercise H: 3, Lecture H: 20,Work H: 12, Num Deadlines: 2")
+    wearable_only = Mood_DB(user_id=1, date=date(2025, 1, 2), smartwatch_data="HR: 90, Steps: 0,SQ: 4.0")
+    new_style = Mood_DB(user_id=1, date=date(2025, 1, 3), heart_rate=65)
+    database.session.add_all([legacy, wearable_only, new_style])
+    database.session.commit()
+
+    with database.engine.begin() as connection:
+        assert parse_legacy_text_columns(connection, chunk_size=1) == 2
+
+    database.session.expire_all()
+    assert (legacy.heart_rate, legacy.step_count, legacy.sleep_quality) == (72, 8500, 6.5)
+    assert (legacy.exercise_hours, legacy.lecture_hours, legacy.work_hours, legacy.deadlines) == (3, 20, 12, 2)
+    assert (wearable_only.step_count, wearable_only.exercise_hours) == (0, None)
+    assert new_style.heart_rate == 65
@@ -0,0 +1,91 @@
+from datetime import date
+from unittest.mock import patch
+import numpy as np
+import app.controller as controller
+from app.controller import PredictionModel, MOOD_LIST
+from app.features import FEATURE_NAMES
+from app.models import Mood_DB
+
+
+def add_entries(database, moods, start_day=1, user_id=1, weather=None):
+    for i, mood in enumerate(moods):
+        database.session.add(Mood_DB(user_id=user_id, date=date(2025, 1, start_day + i), mood=mood, weather=weather))
+    database.session.commit()
+
+
+"""
+test_train_is_incremental checks a second training run only folds in the days after the saved high-water mark.
+"""
+def test_train_is_incremental(database, tmp_path):
+    path = str(tmp_path / "model.json")
+    add_entries(database, ["Sad", "Happy"])
+    model = PredictionModel(path)
+    assert model.train(until=date(2025, 1, 3)) == 2
+
+    add_entries(database, ["Sad"], start_day=3)
+    reloaded = PredictionModel.load(path)
+    assert reloaded.is_trained
+    assert reloaded.high_water_mark == date(2025, 1, 2)
+    assert reloaded.train(until=date(2025, 1, 4)) == 1
+    assert reloaded.entry_count == 3
+    assert reloaded.mood_counts == {"Sad": 2, "Happy": 1}
+    assert reloaded.train(until=date(2025, 1, 4)) == 0
+
+
+"""
+test_load_missing_model_is_untrained checks loading before any training gives an untrained model rather than an error.
+"""
+def test_load_missing_model_is_untrained(tmp_path):
+    model = PredictionModel.load(str(tmp_path / "missing.json"))
+    assert model.is_trained is False
+    assert model.high_water_mark is None
+
+
+"""
+test_get_prediction_model_does_not_retrain checks requests reuse the saved model and only train when none exists.
+"""
+def test_get_prediction_model_does_not_retrain(database, tmp_path, monkeypatch):
+    monkeypatch.setitem(controller.app.config, 'PREDICTION_MODEL_PATH', str(tmp_path / "model.json"))
+    monkeypatch.setattr(controller, "_prediction_model", None)
+    add_entries(database, ["Calm"])
+
+    first = controller.get_prediction_model()
+    assert first.is_trained
+    with patch.object(PredictionModel, 'train') as mock_train:
+        assert controller.get_prediction_model() is first
+        mock_train.assert_not_called()
+
+
+"""
+test_predict_features_learns_separable_moods checks the classifier recovers moods that depend on a feature, and that
+missing (NaN) features are ignored rather than breaking the prediction.
+"""
+def test_predict_features_learns_separable_moods(tmp_path):
+    rng = np.random.default_rng(0)
+    steps = FEATURE_NAMES.index("step_count")
+    features = np.full((200, len(FEATURE_NAMES)), np.nan)
+    labels = np.repeat([MOOD_LIST.index("Energetic"), MOOD_LIST.index("Bored")], 100)
+    features[:100, steps] = rng.normal(15000, 1000, 100)
+    features[100:, steps] = rng.normal(2000, 1000, 100)
+
+    model = PredictionModel(str(tmp_path / "model.json"))
+    model.fold(features, labels)
+    predicted = model.predict_features(features)
+
+    assert (predicted == labels).mean() > 0.95
+
+
+"""
+test_predict_many_uses_previous_entry checks predictions for a whole day are made from the database in one call,
+using each user's previous mood.
+"""
+def test_predict_many_uses_previous_entry(database, tmp_path):
+    for user_id, mood in ((1, "Happy"), (2, "Sad")):
+        add_entries(database, [mood] * 6, user_id=user_id)
+    model = PredictionModel(str(tmp_path / "model.json"))
+    model.train(until=date(2025, 1, 6))
+    for user_id in (1, 2):
+        database.session.add(Mood_DB(user_id=user_id, date=date(2025, 1, 7), weather="Sunny"))
+    database.session.commit()
+
+    assert model.predict_many(day=date(2025, 1, 7)) == {1: "Happy", 2: "Sad"}
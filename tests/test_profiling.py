@@ -0,0 +1,88 @@
+import os
+import re
+import pstats
+import pytest
+from flask import request_finished, request_started, request_tearing_down
+from itsdangerous import URLSafeTimedSerializer
+from app import app
+from app.profiling import (PROFILE_HEADER, TOKEN_SALT, init_profiling, make_profile_token, on_request_finished,
+                           on_request_started, on_request_tearing_down)
+
+
+"""
+profiles turns profiling on for the test's requests, writing to a temporary directory, and off again afterwards
+(the suite otherwise runs with it disabled, as production does by default).
+"""
+@pytest.fixture
+def profiles(database, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'PROFILING_DIRECTORY', str(tmp_path))
+    monkeypatch.setitem(app.config, 'PROFILING_SAMPLE_RATE', 0)
+    monkeypatch.setitem(app.config, 'PROFILING_SECRET', 'profiling secret')
+    init_profiling(app)
+    yield tmp_path
+    request_started.disconnect(on_request_started, app)
+    request_finished.disconnect(on_request_finished, app)
+    request_tearing_down.disconnect(on_request_tearing_down, app)
+
+
+"""
+test_token_profiles_request checks a request carrying a valid token, as a header or query parameter, is profiled to
+a file tagged with its endpoint, method, status and duration, and that requests without one are not.
+"""
+def test_token_profiles_request(profiles):
+    token = make_profile_token(app)
+    with app.test_client() as client:
+        client.get('/')
+        assert os.listdir(profiles) == []
+        client.get('/', headers={PROFILE_HEADER: token})
+        client.get('/?profile=' + token)
+    names = sorted(os.listdir(profiles))
+    assert len(names) == 2
+    # depending on the time of day, home redirects to the prediction or mood-logging prompt
+    assert all(re.search(r"-home-GET-\d{3}-\d+ms\.prof$", name) for name in names)
+    # profiling starts before the login and prompt checks
+    stats = pstats.Stats(str(profiles / names[0]))
+    assert any(function_name == "preprocess_request" for _, _, function_name in stats.stats)
+
+
+"""
+test_token_rejected checks tokens that are forged, expired, limited to another endpoint or signed with the SECRET_KEY
+profile nothing, and that no token is accepted or made without PROFILING_SECRET.
+"""
+def test_token_rejected(profiles, monkeypatch):
+    token = make_profile_token(app)
+    with app.test_client() as client:
+        client.get('/', headers={PROFILE_HEADER: token + "x"})
+        client.get('/', headers={PROFILE_HEADER: make_profile_token(app, endpoint='predict')})
+        client.get('/', headers={PROFILE_HEADER: URLSafeTimedSerializer(app.config['SECRET_KEY'], salt=TOKEN_SALT)
+                                 .dumps({"endpoint": None})})
+        monkeypatch.setitem(app.config, 'PROFILING_SECRET', None)
+        client.get('/', headers={PROFILE_HEADER: token})
+        with pytest.raises(ValueError):
+            make_profile_token(app)
+        assert app.test_cli_runner().invoke(args=['profile-token']).exit_code != 0
+        monkeypatch.setitem(app.config, 'PROFILING_SECRET', 'profiling secret')
+        monkeypatch.setitem(app.config, 'PROFILING_TOKEN_MAX_AGE', -1)
+        client.get('/', headers={PROFILE_HEADER: token})
+    assert os.listdir(profiles) == []
+
+
+"""
+test_sampled_requests checks requests are profiled at random at PROFILING_SAMPLE_RATE, keeping only the newest
+PROFILING_MAX_FILES profiles, and that the profile-token command only makes tokens for endpoints that exist.
+"""
+def test_sampled_requests(profiles, monkeypatch):
+    monkeypatch.setitem(app.config, 'PROFILING_SAMPLE_RATE', 1.0)
+    monkeypatch.setitem(app.config, 'PROFILING_MAX_FILES', 3)
+    with app.test_client() as client:
+        client.get('/')
+        first = os.listdir(profiles)
+        for _ in range(4):
+            client.get('/')
+    # only the newest PROFILING_MAX_FILES are kept
+    names = os.listdir(profiles)
+    assert len(names) == 3 and first[0] not in names
+
+    runner = app.test_cli_runner()
+    assert runner.invoke(args=['profile-token', '--endpoint', 'predict']).exit_code == 0
+    assert runner.invoke(args=['profile-token', '--endpoint', 'nowhere']).exit_code != 0
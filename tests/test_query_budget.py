@@ -0,0 +1,57 @@
+import pytest
+from flask import g
+from app import app, db
+from app.controller import SupportService
+from app.models import User
+from app.query_budget import QueryBudgetExceeded, on_request_started, request_report
+
+
+"""
+test_request_report checks a request is reported when it sends more statements than its budget, when it sends the
+same statement twice with the same parameters, and when it loads a relationship lazily, and not otherwise.
+"""
+def test_request_report():
+    select_user = ("SELECT * FROM user WHERE id = ?", "(1,)", "app/views.py:31 in auto_login_sample_user")
+    select_mood = ("SELECT * FROM mood_db WHERE user_id = ?", "(1,)", "app/controller.py:10 in process_journal")
+    assert request_report([select_user, select_mood], [], 2) == []
+    assert request_report([select_user, select_mood], [], None) == []
+
+    over_budget = request_report([select_user, select_mood], [], 1)
+    assert over_budget[0] == "2 SQL statements, over the budget of 1:"
+    assert "app/controller.py:10 in process_journal" in over_budget[2]
+
+    repeated = request_report([select_user, select_mood, select_mood], [], None)
+    assert len(repeated) == 1 and repeated[0].startswith("repeated 2 times: SELECT * FROM mood_db")
+    # the same statement for another user is not a repeat
+    assert request_report([select_mood, (select_mood[0], "(2,)", select_mood[2])], [], None) == []
+
+    lazy = request_report([], [("User.emergency_contact", "app/controller.py:20 in getSupportContacts")], None)
+    assert lazy == ["lazy load of User.emergency_contact from app/controller.py:20 in getSupportContacts"]
+
+
+"""
+test_route_over_budget checks that, with QUERY_BUDGET_MODE=raise (as the suite runs), a request sending more
+statements than its route allows fails with the statements and the app code that sent them.
+"""
+def test_route_over_budget(database, monkeypatch):
+    # the first request of a new client logs the sample user in, which takes a query
+    monkeypatch.setattr(app.view_functions['home'], 'query_budget', 0)
+    with app.test_client() as client:
+        with pytest.raises(QueryBudgetExceeded, match=r"over the budget of 0:\n  app/views.py:\d+ in auto_login"):
+            client.get('/')
+
+
+"""
+test_support_contacts_loaded_eagerly checks the emergency contact is loaded along with the user rather than lazily,
+which the detector would report.
+"""
+def test_support_contacts_loaded_eagerly(database):
+    with app.test_request_context('/distress'):
+        on_request_started(app)
+        db.session.expunge_all()
+        assert SupportService(1, "University Wellbeing", 1).getSupportContacts().startswith("Consider contacting")
+        assert g.lazy_loads == []
+
+        db.session.expunge_all()
+        db.session.get(User, 1).emergency_contact
+        assert [relationship for relationship, _ in g.lazy_loads] == ["User.emergency_contact"]
@@ -0,0 +1,168 @@
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+import random
+from unittest.mock import patch
+import pytest
+import sqlalchemy as sa
+import app.views as views
+from app import app
+from app.controller import process_log_mood, process_prediction, DistressAlert
+from app.domain import MoodEntry
+from app.models import User, Mood_DB
+
+
+"""
+These tests run the hot Mood_DB code paths against a seeded database, capture the SQL they actually send, and check
+SQLite's EXPLAIN QUERY PLAN for each statement that touches mood_db. A full table scan ("SCAN mood_db") or a temporary
+B-tree for sorting/grouping means the query no longer uses the unique_user_date (or date) index, and the test fails.
+They are skipped when the suite runs against another database (TEST_DATABASE_URL).
+"""
+pytestmark = pytest.mark.skipif(not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'),
+                                reason="EXPLAIN QUERY PLAN is SQLite's")
+
+USERS = 100
+DAYS = 100
+
+
+@pytest.fixture
+def seeded(database, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'PREDICTION_MODEL_PATH', str(tmp_path / "model.json"))
+    rng = random.Random(0)
+    first_day = datetime.now().date() - timedelta(days=DAYS)
+    # the students beyond those conftest keeps, removed again by the database fixture
+    existing = database.session.scalar(sa.select(sa.func.max(User.id)))
+    database.session.execute(sa.insert(User), [
+        {"id": user_id, "username": f"student{user_id}", "email": f"student{user_id}@university.edu",
+         "password_hash": "x"} for user_id in range(existing + 1, USERS + 1)
+    ])
+    database.session.execute(sa.insert(Mood_DB), [
+        {"user_id": user_id, "date": first_day + timedelta(days=day), "mood": rng.choice(["Happy", "Sad", "Calm"]),
+         "sentiment_score": rng.uniform(-1, 1), "heart_rate": rng.randint(60, 100)}
+        for user_id in range(1, USERS + 1) for day in range(DAYS)
+    ])
+    database.session.commit()
+    # give the planner the statistics a long-running production database would have
+    database.session.execute(sa.text("ANALYZE"))
+    return database
+
+
+@contextmanager
+def captured_statements():
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and "mood_db" in statement.lower():
+            statements.append((statement, parameters))
+
+    sa.event.listen(views.db.engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        sa.event.remove(views.db.engine, "before_cursor_execute", capture)
+
+
+def assert_indexed(database, statements):
+    assert statements, "no mood_db statements were captured"
+    for statement, parameters in statements:
+        plan = database.session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+        details = [row[-1] for row in plan]
+        problems = [detail for detail in details
+                    if detail.startswith("SCAN ") and not detail.startswith("SCAN (") or "TEMP B-TREE" in detail]
+        assert not problems, f"{statement}\n{parameters}\nplan: {details}"
+
+
+def sample_user():
+    return User.query.order_by(User.id).first()
+
+
+class FakeDatetime(datetime):
+    """datetime whose now() is 7pm today, past the 6pm mood-logging cutoff."""
+    @classmethod
+    def now(cls, tz=None):
+        return datetime.combine(datetime.now().date(), datetime.min.time()).replace(hour=19)
+
+
+"""
+test_plan_require_mood_logging checks the after-6pm "logged today?" check in the before_request gate.
+"""
+def test_plan_require_mood_logging(seeded):
+    with captured_statements() as statements, patch.object(views, 'datetime', FakeDatetime):
+        with app.test_client() as client:
+            client.get('/')
+    assert_indexed(seeded, statements)
+
+
+"""
+test_plan_process_log_mood checks logging a mood, both for a new day and when today's row already exists.
+"""
+def test_plan_process_log_mood(seeded):
+    with captured_statements() as statements:
+        process_log_mood("Sad", sample_user())
+        process_log_mood("Calm", sample_user())
+    assert_indexed(seeded, statements)
+
+
+"""
+test_plan_store_entry checks MoodEntry.storeEntry, including the streak update it makes.
+"""
+def test_plan_store_entry(seeded):
+    with captured_statements() as statements:
+        MoodEntry(user_id=2, date=datetime.now().date(), mood="Happy").storeEntry()
+    assert_indexed(seeded, statements)
+
+
+"""
+test_plan_process_prediction checks the prediction flow, including first-time model training and the feature query.
+"""
+def test_plan_process_prediction(seeded):
+    with captured_statements() as statements, app.test_request_context():
+        process_prediction(sample_user())
+    assert_indexed(seeded, statements)
+
+
+"""
+test_plan_retrieve_previous_7_entries checks the ordered range scan used when no streak is stored.
+"""
+def test_plan_retrieve_previous_7_entries(seeded):
+    record = Mood_DB.query.filter_by(user_id=3, date=datetime.now().date() - timedelta(days=1)).first()
+    with captured_statements() as statements:
+        assert len(DistressAlert(user_id=3).retrieve_previous_7_entries(record)) == 7
+    assert_indexed(seeded, statements)
+
+
+"""
+test_plan_data_listing checks the /data history listing for a user, ordered newest first.
+"""
+def test_plan_data_listing(seeded):
+    with app.test_client() as client:
+        with client.session_transaction() as session:
+            session['prediction_shown'] = str(datetime.now().date())
+        with captured_statements() as statements, patch.object(views, 'datetime', FakeDatetime):
+            MoodEntry(user_id=1, date=datetime.now().date(), mood="Happy").storeEntry()
+            statements.clear()
+            assert client.get('/data').status_code == 200
+    assert_indexed(seeded, statements)
+
+
+"""
+test_plan_data_pages checks the older and newer /data pages reached through the keyset cursors.
+"""
+def test_plan_data_pages(seeded):
+    cursor = (datetime.now().date() - timedelta(days=DAYS // 2)).isoformat()
+    with app.test_client() as client:
+        with client.session_transaction() as session:
+            session['prediction_shown'] = str(datetime.now().date())
+        with captured_statements() as statements, patch.object(views, 'datetime', FakeDatetime):
+            MoodEntry(user_id=1, date=datetime.now().date(), mood="Happy").storeEntry()
+            statements.clear()
+            assert client.get('/data?before=' + cursor).status_code == 200
+            assert client.get('/data?after=' + cursor).status_code == 200
+    assert_indexed(seeded, statements)
+
+
+"""
+test_plan_detects_full_scan checks the plan check itself fails for a query that cannot use an index.
+"""
+def test_plan_detects_full_scan(seeded):
+    with pytest.raises(AssertionError):
+        assert_indexed(seeded, [("SELECT * FROM mood_db WHERE weather = ?", ("Sunny",))])
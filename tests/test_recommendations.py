@@ -1,6 +1,10 @@
+import json
+import os
 from unittest.mock import patch, MagicMock
 import pytest
-from app.controller import is_positive_mood, create_message, retrieve_support, process_recommendation
+from app import app
+from app.controller import is_positive_mood, create_message, retrieve_support, process_recommendation, \
+    RecommendationSystem, get_recommendation_catalog, render_recommendation_fragment
 
 """
 test_process_recommendation_positive tests the process_recommendation function to check that the correct output is returned
@@ -120,3 +124,82 @@ def test_retrieve_support_negative():
     with patch('app.controller.SupportService') as mockSupportService:
         with pytest.raises(ValueError):
             retrieve_support(mock_user)
+
+
+"""
+catalog_file points RECOMMENDATIONS_PATH at a small catalog in a temporary file and returns a function that rewrites
+it, bumping the modification time so the change is always seen.
+"""
+@pytest.fixture
+def catalog_file(tmp_path, monkeypatch):
+    path = tmp_path / "recommendations.json"
+    monkeypatch.setitem(app.config, 'RECOMMENDATIONS_PATH', str(path))
+
+    def write(description):
+        path.write_text(json.dumps({
+            "moods": {"Calm": {"description": description, "tips": ["Breathe <slowly>"],
+                               "links": [{"name": "Calm App", "url": "https://www.calm.com/"}]}},
+            "fallback": {"description": "Nothing for this mood.", "tips": [], "links": []},
+        }))
+        write.calls += 1
+        os.utime(path, ns=(write.calls * 10**9, write.calls * 10**9))
+    write.calls = 0
+    write("Stay calm.")
+    return write
+
+
+"""
+test_catalog_shared_and_read_only checks every RecommendationSystem shares the one loaded catalog, that it cannot be
+modified, and that an unknown mood gets the fallback.
+"""
+def test_catalog_shared_and_read_only(catalog_file):
+    first, second = RecommendationSystem(user_id=1), RecommendationSystem(user_id=2)
+    assert first.suggestions is second.suggestions
+    assert first.generate_recommendations("Calm")["tips"] == ("Breathe <slowly>",)
+    assert first.generate_recommendations("Sleepy")["description"] == "Nothing for this mood."
+    with pytest.raises(TypeError):
+        first.suggestions["Calm"]["description"] = "Changed"
+
+
+"""
+test_catalog_hot_reload checks a changed catalog file is picked up without a restart, and the cached HTML fragment for a
+mood is rendered again for the new version (and escaped).
+"""
+def test_catalog_hot_reload(catalog_file):
+    version = get_recommendation_catalog().version
+    fragment = render_recommendation_fragment("Calm")
+    assert "Stay calm." in fragment and "Breathe &lt;slowly&gt;" in fragment
+    assert render_recommendation_fragment("Calm") is fragment
+
+    catalog_file("Keep calm and carry on.")
+    assert get_recommendation_catalog().version != version
+    assert "Keep calm and carry on." in render_recommendation_fragment("Calm")
+    assert RecommendationSystem(user_id=1).generate_recommendations("Calm")["description"] == "Keep calm and carry on."
+
+
+"""
+test_catalog_reload_failure checks a catalog file caught half written, or missing while it is being swapped, leaves the
+loaded catalog in use, and that the file is picked up once it is whole again.
+"""
+def test_catalog_reload_failure(catalog_file, tmp_path):
+    path = tmp_path / "recommendations.json"
+    version = get_recommendation_catalog().version
+    content = path.read_text()
+    path.write_text(content[:len(content) // 2])
+    os.utime(path, ns=(10**12, 10**12))
+    assert get_recommendation_catalog().version == version
+    assert "Stay calm." in render_recommendation_fragment("Calm")
+
+    path.unlink()
+    assert get_recommendation_catalog().version == version
+
+    catalog_file("Back again.")
+    assert "Back again." in render_recommendation_fragment("Calm")
+
+
+"""
+test_shipped_catalog checks app/data/recommendations.json has recommendations for all twelve moods.
+"""
+def test_shipped_catalog():
+    from app.features import MOOD_LIST
+    assert set(get_recommendation_catalog().moods) == set(MOOD_LIST)
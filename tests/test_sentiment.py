@@ -0,0 +1,159 @@
+import pytest
+from nltk.sentiment.vader import SentimentIntensityAnalyzer
+import app.domain as domain
+from app.domain import SentimentAnalysis, SentimentCache, get_analyzer
+
+
+"""
+The score cache is shared by the whole process, so it is emptied before each test to stop scores from one lexicon
+leaking into another test.
+"""
+@pytest.fixture(autouse=True)
+def empty_cache():
+    domain.sentiment_cache.clear()
+    yield
+    domain.sentiment_cache.clear()
+
+
+"""
+small_analyzer replaces the shared VADER analyzer with one built from a tiny lexicon file, so these tests do not rely on
+the full NLTK lexicon being installed.
+"""
+@pytest.fixture
+def small_analyzer(tmp_path, monkeypatch):
+    lexicon = tmp_path / "lexicon.txt"
+    lexicon.write_text("good\t1.9\t0.9\t[2, 2, 2]\nsad\t-2.1\t0.9\t[-2, -2, -2]")
+    analyzer = SentimentIntensityAnalyzer(lexicon_file=str(lexicon))
+    monkeypatch.setattr(domain, "_analyzer", analyzer)
+    return analyzer
+
+
+"""
+test_get_analyzer_shared checks that every caller receives the same analyzer instance.
+"""
+def test_get_analyzer_shared(small_analyzer):
+    assert get_analyzer() is small_analyzer
+    assert get_analyzer() is get_analyzer()
+
+
+"""
+test_score_many_matches_performAnalysis checks the batch API returns the same scores as scoring each text on its own,
+in the same order, with None for empty text.
+"""
+def test_score_many_matches_performAnalysis(small_analyzer):
+    texts = ["a good day", "", "so sad"]
+    scores = SentimentAnalysis.score_many(texts)
+
+    single = []
+    for text in texts:
+        analysis = SentimentAnalysis(moodEntryID=0, text=text)
+        analysis.performAnalysis()
+        single.append(analysis.getScore())
+
+    assert scores == single
+    assert scores[0] > 0 and scores[1] is None and scores[2] < 0
+
+
+"""
+test_score_many_empty_batch checks a batch with no text does not need the analyzer at all.
+"""
+def test_score_many_empty_batch(monkeypatch):
+    monkeypatch.setattr(domain, "get_analyzer", lambda: pytest.fail("analyzer should not be loaded"))
+    assert SentimentAnalysis.score_many(["", None]) == [None, None]
+
+
+"""
+test_shipped_lexicon_loads checks the lexicon bundled in app/data passes the start-up self-test and is loaded lazily
+from the configured path, without any NLTK download.
+"""
+def test_shipped_lexicon_loads(monkeypatch):
+    assert domain.check_lexicon(domain.app.config['VADER_LEXICON_PATH']) is None
+    monkeypatch.setattr(domain, "_analyzer", None)
+    scores = SentimentAnalysis.score_many(["I feel happy and calm", "I am stressed and sad"])
+    assert domain._analyzer is not None
+    assert scores[0] > 0 and scores[1] < 0
+
+
+"""
+test_check_lexicon_missing_or_malformed checks the self-test reports a missing file or a file in the wrong format.
+"""
+def test_check_lexicon_missing_or_malformed(tmp_path):
+    assert "not readable" in domain.check_lexicon(str(tmp_path / "missing.txt"))
+    bad = tmp_path / "bad.txt"
+    bad.write_text("just words\n")
+    assert "expected" in domain.check_lexicon(str(bad))
+
+
+"""
+test_backfill_sentiment_resumes checks the backfill command rescores only rows with journal text, starts after a saved
+watermark, and removes the watermark once it finishes.
+"""
+def test_backfill_sentiment_resumes(database, small_analyzer, tmp_path, monkeypatch):
+    from datetime import date
+    from app.models import Mood_DB
+    watermark = tmp_path / "backfill.watermark"
+    monkeypatch.setitem(domain.app.config, 'SENTIMENT_BACKFILL_WATERMARK', str(watermark))
+    rows = [
+        Mood_DB(user_id=1, date=date(2025, 1, 1), journal_text="so sad", sentiment_score=0.5),
+        Mood_DB(user_id=1, date=date(2025, 1, 2), journal_text="a good day", sentiment_score=0.0),
+        Mood_DB(user_id=1, date=date(2025, 1, 3), journal_text=None, sentiment_score=0.3),
+    ]
+    database.session.add_all(rows)
+    database.session.commit()
+    watermark.write_text(str(rows[0].id))
+
+    result = domain.app.test_cli_runner().invoke(args=['backfill-sentiment', '--workers', '1', '--chunk-size', '1'])
+
+    assert result.exit_code == 0, result.output
+    database.session.expire_all()
+    assert rows[0].sentiment_score == 0.5
+    assert rows[1].sentiment_score > 0
+    assert rows[2].sentiment_score == 0.3
+    assert not watermark.exists()
+
+
+"""
+test_score_many_uses_cache checks repeated texts, including ones that only differ in whitespace, are scored once: a
+repeat within a batch is not counted as another miss, and later batches are served from the cache and counted as hits.
+"""
+def test_score_many_uses_cache(small_analyzer):
+    first = SentimentAnalysis.score_many(["so sad", "so  sad ", "so sad"])
+    assert first[0] == first[1] == first[2]
+    assert domain.sentiment_cache.stats()["misses"] == 1
+    assert domain.sentiment_cache.stats()["size"] == 1
+
+    assert SentimentAnalysis.score_many(["so sad"]) == [first[0]]
+    assert domain.sentiment_cache.stats()["hits"] == 1
+
+
+"""
+test_sentiment_cache_evicts_least_recently_used checks the cache stays within its size limit.
+"""
+def test_sentiment_cache_evicts_least_recently_used():
+    cache = SentimentCache(maxsize=2)
+    cache.put(cache.key("a"), 0.1)
+    cache.put(cache.key("b"), 0.2)
+    cache.get(cache.key("a"))
+    cache.put(cache.key("c"), 0.3)
+
+    assert cache.get(cache.key("a")) == (True, 0.1)
+    assert cache.get(cache.key("b")) == (False, None)
+
+
+"""
+test_sentiment_cache_persists_per_version checks a saved cache is reloaded by the same analyzer version and ignored
+after the version is bumped.
+"""
+def test_sentiment_cache_persists_per_version(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = SentimentCache(path=path, version="v1")
+    cache.get(cache.key("tired"))
+    cache.put(cache.key("tired"), -0.4)
+    cache.save()
+
+    reloaded = SentimentCache(path=path, version="v1")
+    assert reloaded.get(reloaded.key("tired")) == (True, -0.4)
+
+    bumped = SentimentCache(path=path, version="v2")
+    assert bumped.get(bumped.key("tired")) == (False, None)
+    assert bumped.stats()["size"] == 0
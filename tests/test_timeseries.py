@@ -0,0 +1,58 @@
+from datetime import date, datetime
+import numpy as np
+from app.timeseries import SLOTS_PER_DAY, empty_day, encode_day, decode_day, merge_samples, filled_slots, \
+    summarise_series, iter_samples, slot_of
+
+
+def sample(hour, minute, heart_rate=None, steps=None, sleep_quality=None):
+    return {"recorded_at": datetime(2025, 3, 1, hour, minute), "heart_rate": heart_rate, "steps": steps,
+            "sleep_quality": sleep_quality}
+
+
+"""
+test_block_round_trip checks a day with gaps and values at the ends of each type's range decodes to the same arrays,
+compressed or not, and that a compressed day of steady readings is much smaller than a row per sample.
+"""
+def test_block_round_trip():
+    series = empty_day()
+    merge_samples(series, [sample(0, 0, heart_rate=250, steps=5000, sleep_quality=10.0),
+                           sample(0, 5, heart_rate=20, steps=0, sleep_quality=0.0),
+                           sample(12, 0, steps=1),
+                           sample(23, 55, heart_rate=61, sleep_quality=7.3)])
+    for compress in (False, True):
+        decoded = decode_day(encode_day(series, compress=compress))
+        for field in series:
+            assert np.array_equal(decoded[field], series[field])
+
+    steady = empty_day()
+    merge_samples(steady, [{**sample(0, 0, heart_rate=70, steps=12), "recorded_at": datetime(2025, 3, 1) +
+                            (datetime(2025, 3, 1, 0, 5) - datetime(2025, 3, 1)) * slot} for slot in range(SLOTS_PER_DAY)])
+    assert len(encode_day(steady, compress=False)) == 2 + 4 * SLOTS_PER_DAY
+    assert len(encode_day(steady)) < 100
+
+
+"""
+test_merge_keeps_stored_slots checks merging only fills empty slots and counts what it filled.
+"""
+def test_merge_keeps_stored_slots():
+    series = empty_day()
+    assert merge_samples(series, [sample(9, 0, heart_rate=70), sample(9, 5, steps=30)]) == 2
+    assert merge_samples(series, [sample(9, 0, heart_rate=90), sample(9, 10, heart_rate=80)]) == 1
+    assert series["heart_rate"][slot_of(datetime(2025, 3, 1, 9, 0))] == 70
+    assert filled_slots(series).sum() == 3
+
+
+"""
+test_summary_and_samples checks the daily summary ignores empty slots, and the day reads back as uploaded samples.
+"""
+def test_summary_and_samples():
+    series = empty_day()
+    assert summarise_series(series) == (None, None, None)
+    merge_samples(series, [sample(1, 0, heart_rate=60, sleep_quality=8.2), sample(1, 5, heart_rate=71, steps=5),
+                           sample(1, 10, steps=7, sleep_quality=6.6)])
+    assert summarise_series(series) == (66, 12, 7.4)
+    assert list(iter_samples(series, date(2025, 3, 1))) == [
+        sample(1, 0, heart_rate=60, sleep_quality=8.2),
+        sample(1, 5, heart_rate=71, steps=5),
+        sample(1, 10, steps=7, sleep_quality=6.6),
+    ]
@@ -0,0 +1,243 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from flask import g
+import sqlalchemy as sa
+import app.views as views
+from app import app, db
+from app.controller import get_history_page, process_log_mood
+from app.models import Mood_DB, User
+import pytest
+
+
+class FakeDatetime(datetime):
+    """datetime whose now() is 7pm today, past the 6pm mood-logging cutoff."""
+    @classmethod
+    def now(cls, tz=None):
+        return datetime.combine(datetime.now().date(), datetime.min.time()).replace(hour=19)
+
+
+@contextmanager
+def captured_statements():
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sa.event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        sa.event.remove(db.engine, "before_cursor_execute", capture)
+
+
+"""
+history gives user 1 forty-five days of entries ending today, one per day, and returns their dates newest first.
+"""
+@pytest.fixture
+def history(database):
+    today = datetime.now().date()
+    dates = [today - timedelta(days=offset) for offset in range(45)]
+    database.session.execute(sa.insert(Mood_DB), [
+        {"user_id": 1, "date": day, "mood": "Happy", "sentiment_score": 0.5} for day in dates
+    ])
+    database.session.execute(sa.insert(Mood_DB), [{"user_id": 2, "date": dates[0], "mood": "Sad"}])
+    database.session.commit()
+    return dates
+
+
+"""
+test_history_first_page checks the first page is the newest entries, with an older cursor and no newer one.
+"""
+def test_history_first_page(history):
+    entries, older, newer = get_history_page(1, page_size=20)
+    assert [entry.date for entry in entries] == history[:20]
+    assert older == history[19]
+    assert newer is None
+
+
+"""
+test_history_walks_older_and_back checks following the older cursors reaches every entry exactly once, and that the
+newer cursor of a page leads back to the page before it.
+"""
+def test_history_walks_older_and_back(history):
+    pages, before = [], None
+    while True:
+        entries, older, newer = get_history_page(1, before=before, page_size=20)
+        pages.append((entries, newer))
+        if older is None:
+            break
+        before = older
+    assert [entry.date for entries, _ in pages for entry in entries] == history
+    assert [len(entries) for entries, _ in pages] == [20, 20, 5]
+
+    entries, older, newer = get_history_page(1, after=pages[2][1], page_size=20)
+    assert [entry.date for entry in entries] == history[20:40]
+    assert older == history[39]
+    assert newer == history[20]
+
+    entries, older, newer = get_history_page(1, after=newer, page_size=20)
+    assert [entry.date for entry in entries] == history[:20]
+    assert newer is None
+
+
+"""
+test_history_empty checks a user with no entries gets an empty page and no cursors.
+"""
+def test_history_empty(database):
+    assert get_history_page(1, page_size=20) == ([], None, None)
+
+
+"""
+test_data_view_pages checks /data shows one page of DATA_PAGE_SIZE entries and links to the next, and ignores a
+malformed cursor instead of failing.
+"""
+def test_data_view_pages(history, monkeypatch):
+    monkeypatch.setitem(app.config, 'DATA_PAGE_SIZE', 10)
+    with app.test_client() as client:
+        with client.session_transaction() as session:
+            session['prediction_shown'] = str(history[0])
+        page = client.get('/data').get_data(as_text=True)
+        assert page.count("<tr>") == 11
+        assert f"/data?before={history[9].isoformat()}" in page
+        assert "after=" not in page
+
+        page = client.get(f'/data?before={history[9].isoformat()}').get_data(as_text=True)
+        assert history[10].isoformat() in page and history[9].isoformat() + "</td>" not in page
+        assert f"/data?after={history[10].isoformat()}" in page
+
+        assert client.get('/data?before=yesterday').status_code == 200
+
+
+"""
+test_gates_skip_static_and_errors checks requests for static files and unknown URLs, even from a new session after 6pm,
+neither look up the sample user nor query Mood_DB. The error page's navbar may still load current_user.
+"""
+def test_gates_skip_static_and_errors(database):
+    with app.test_client() as client, patch.object(views, 'datetime', FakeDatetime):
+        for url in ('/static/style.css', '/no-such-page'):
+            g.pop('_login_user', None)
+            with captured_statements() as statements:
+                client.get(url).close()
+            assert not any("mood_db" in statement or "LIMIT" in statement for statement in statements), url
+        with client.session_transaction() as session:
+            assert '_user_id' not in session
+
+
+"""
+test_gate_remembers_logged_mood checks the 6pm gate redirects to log_mood until the mood is logged, and afterwards
+lets requests through without querying Mood_DB or looking up the sample user again.
+"""
+def test_gate_remembers_logged_mood(database):
+    with app.test_client() as client, patch.object(views, 'datetime', FakeDatetime):
+        assert client.get('/').headers['Location'] == '/log_mood'
+        with client.session_transaction() as session:
+            session['prediction_shown'] = str(datetime.now().date())
+        process_log_mood("Happy", database.session.get(User, 1))
+
+        # requests share the fixture's app context, and with it Flask-Login's cached user
+        g.pop('_login_user', None)
+        database.session.expunge_all()
+        with captured_statements() as statements:
+            assert client.get('/').status_code == 200
+        # the only query left is the navbar's current_user, made while rendering the page
+        assert not any("mood_db" in statement for statement in statements)
+        assert len(statements) == 1
+
+
+"""
+test_bulk_statements_bump_their_users checks bulk UPDATEs of Mood_DB (by primary key, as the sentiment backfill sends,
+or by a WHERE clause) only bump the data versions of the users whose rows they change, and only a statement that
+does not say which rows it changes bumps every user.
+"""
+def test_bulk_statements_bump_their_users(database):
+    record = Mood_DB(user_id=1, date=datetime.now().date(), mood="Happy")
+    database.session.add(record)
+    database.session.commit()
+    version = database.session.get(User, 1).data_version
+    with captured_statements() as statements:
+        database.session.execute(sa.update(Mood_DB), [{"id": record.id, "sentiment_score": 0.2}])
+        database.session.execute(sa.update(Mood_DB).where(Mood_DB.user_id == 1).values(mood="Calm"))
+        database.session.execute(sa.update(Mood_DB).where(Mood_DB.user_id == 99).values(mood="Calm"))
+        database.session.execute(sa.update(Mood_DB).values(mood="Sad"))
+    database.session.commit()
+    # PostgreSQL quotes the user table's name
+    unquoted = [statement.replace('"', '') for statement in statements]
+    bumps = [statement for statement in unquoted if statement.startswith("UPDATE user")]
+    assert len(bumps) == 3
+    assert all("WHERE user.id IN" in bump for bump in bumps[:2]) and "WHERE" not in bumps[2]
+    assert database.session.get(User, 1).data_version == version + 3
+
+
+"""
+test_data_conditional_get checks /data answers a request with a current ETag or Last-Modified with 304 without
+querying Mood_DB, and serves a new page with a new ETag once an entry changes.
+"""
+def test_data_conditional_get(history):
+    with app.test_client() as client:
+        with client.session_transaction() as session:
+            session['prediction_shown'] = str(history[0])
+        first = client.get('/data')
+        etag = first.headers['ETag']
+        assert first.status_code == 200 and first.last_modified is not None
+
+        with captured_statements() as statements:
+            response = client.get('/data', headers={'If-None-Match': etag})
+        assert response.status_code == 304 and response.headers['ETag'] == etag
+        assert not any("mood_db" in statement for statement in statements)
+        assert client.get('/data', headers={'If-Modified-Since': first.headers['Last-Modified']}).status_code == 304
+        # a different page of the same data is a different resource
+        assert client.get(f'/data?before={history[5]}', headers={'If-None-Match': etag}).status_code == 200
+
+        entry = Mood_DB.query.filter_by(user_id=1, date=history[3]).first()
+        entry.mood = "Sad"
+        db.session.commit()
+        response = client.get('/data', headers={'If-None-Match': etag})
+        assert response.status_code == 200 and response.headers['ETag'] != etag
+
+
+"""
+test_predict_conditional_get checks a repeat /predict with the ETag it was given is answered 304 without predicting
+again, and still counts as the prediction having been shown today.
+"""
+def test_predict_conditional_get(database, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'PREDICTION_MODEL_PATH', str(tmp_path / "model.json"))
+    # logged today, so the 6pm gate lets the requests through
+    database.session.add(Mood_DB(user_id=1, date=datetime.now().date(), mood="Happy"))
+    database.session.commit()
+    with app.test_client() as client:
+        # the first prediction trains and saves the model, which changes the page's version
+        client.get('/predict')
+        etag = client.get('/predict').headers['ETag']
+        with client.session_transaction() as session:
+            del session['prediction_shown']
+
+        with patch('app.views.process_prediction') as process_prediction:
+            response = client.get('/predict', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        process_prediction.assert_not_called()
+        with client.session_transaction() as session:
+            assert session['prediction_shown'] == str(datetime.now().date())
+
+
+"""
+test_negative_week_shows_distress_page checks that closing the journal after a seventh negative mood in a row redirects
+to the distress page, and that the page renders with the user's emergency contact.
+"""
+def test_negative_week_shows_distress_page(database):
+    today = datetime.now().date()
+    database.session.execute(sa.insert(Mood_DB), [
+        {"user_id": 1, "date": today - timedelta(days=offset), "mood": "Sad"} for offset in range(1, 8)
+    ])
+    database.session.commit()
+    with app.test_client() as client, patch.object(views, 'datetime', FakeDatetime):
+        mood_record = process_log_mood("Sad", database.session.get(User, 1))
+        with client.session_transaction() as session:
+            session['prediction_shown'] = str(today)
+            session['mood_id'] = mood_record.id
+        response = client.post('/journal', data={'cancel': 'Close Form'})
+        assert response.headers['Location'] == '/distress'
+        response = client.get('/distress')
+    assert response.status_code == 200
+    assert "Samaritans" in response.get_data(as_text=True)
+    assert "Bob Smith" in response.get_data(as_text=True)